@@ -0,0 +1,329 @@
+"""Async versions of the user, token, opportunity and prompt handlers.
+
+These are used instead of the sync handlers in ``main`` when ``DATABASE_URL``
+names an async driver (for example ``sqlite+aiosqlite:///./test.db`` or
+``postgresql+asyncpg://...``). Requests then wait on the database without
+holding a threadpool thread. Helpers that only exist for sync sessions, such
+as keyset pagination, are reused through ``AsyncSession.run_sync``.
+"""
+
+from typing import List, Literal, Optional, Union
+import asyncio
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.security import OAuth2PasswordRequestForm
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm.exc import StaleDataError
+
+import database
+import fieldsets
+import models
+import user_listing
+from etags import not_modified, opportunity_etag, set_validators
+from main import (
+    CONCURRENT_UPDATE,
+    OpportunityCreate,
+    OpportunityPage,
+    OpportunitySchema,
+    OpportunityUpdate,
+    SINGLE_FLIGHT_CALLS,
+    SortKey,
+    Token,
+    UserCreate,
+    UserInclude,
+    UserListing,
+    UserSchema,
+    auth_cache,
+    change_feed,
+    create_access_token,
+    get_template,
+    group_writer,
+    list_opportunities,
+    oauth2_scheme,
+    opportunity_event,
+    parse_fields_param,
+    prompt_cache,
+    prompt_context,
+    read_opportunity_conditional,
+    user_listing_response,
+)
+from filters import OpportunityFilters
+from pagination import InvalidCursor
+from settings import SINGLE_FLIGHT_TIMEOUT
+from single_flight import AsyncSingleFlight
+from sql_metrics import query_budget
+
+router = APIRouter()
+opportunity_flights = AsyncSingleFlight("opportunity", SINGLE_FLIGHT_CALLS, SINGLE_FLIGHT_TIMEOUT)
+prompt_flights = AsyncSingleFlight("prompt", SINGLE_FLIGHT_CALLS, SINGLE_FLIGHT_TIMEOUT)
+
+
+async def get_async_db():
+    async with database.AsyncSessionLocal() as db:
+        yield db
+
+
+async def get_current_user(
+    token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_async_db)
+):
+    cached = auth_cache.get(token)
+    if cached is not None:
+        return await db.merge(cached, load=False)
+    user = await db.scalar(select(models.User).where(models.User.token == token))
+    if user is None:
+        raise HTTPException(status_code=401, detail="Invalid authentication credentials")
+    db.expunge(user)
+    auth_cache.put(token, user)
+    return await db.merge(user, load=False)
+
+
+async def _get_opportunity(db: AsyncSession, opportunity_id: int) -> models.Opportunity:
+    opportunity = await db.get(models.Opportunity, opportunity_id)
+    if opportunity is None:
+        raise HTTPException(status_code=404, detail="Opportunity not found")
+    return opportunity
+
+
+@router.post("/users/", response_model=UserSchema)
+@query_budget(3)
+async def create_user(user: UserCreate, db: AsyncSession = Depends(get_async_db)):
+    db_user = models.User(name=user.name)
+    db.add(db_user)
+    await db.commit()
+    await db.refresh(db_user)
+    return db_user
+
+
+@router.get("/users/", response_model=UserListing)
+@query_budget(2)
+async def read_users(
+    include: Optional[UserInclude] = None,
+    skip: int = Query(default=0, ge=0),
+    limit: Optional[int] = Query(default=None, ge=1, le=1000),
+    opportunity_limit: int = Query(default=10, ge=1, le=100),
+    db: AsyncSession = Depends(get_async_db),
+):
+    if include == "opportunities":
+        users = await db.run_sync(
+            lambda sync_db: user_listing.with_opportunities(sync_db, skip, limit, opportunity_limit)
+        )
+    elif include == "counts":
+        users = await db.run_sync(lambda sync_db: user_listing.with_counts(sync_db, skip, limit))
+    else:
+        users = await db.run_sync(lambda sync_db: user_listing.plain(sync_db, skip, limit))
+    return user_listing_response(include, users)
+
+
+@router.post("/token", response_model=Token)
+@query_budget(3)
+async def login_for_access_token(
+    form_data: OAuth2PasswordRequestForm = Depends(),
+    db: AsyncSession = Depends(get_async_db),
+):
+    user = await db.scalar(
+        select(models.User).where(models.User.name == form_data.username)
+    )
+    if not user:
+        raise HTTPException(status_code=401, detail="Incorrect username or password")
+    access_token = create_access_token({"sub": user.name})
+    old_token, user.token = user.token, access_token
+    await db.commit()
+    # Only after the commit, or a concurrent request could cache the old
+    # token again before the new one is stored.
+    auth_cache.invalidate(old_token)
+    return {"access_token": access_token, "token_type": "bearer"}
+
+
+@router.post("/opportunities/", response_model=OpportunitySchema)
+@query_budget(5)
+async def create_opportunity(
+    opportunity: OpportunityCreate,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: models.User = Depends(get_current_user),
+):
+    if group_writer is not None:
+        created = await asyncio.wrap_future(group_writer.submit(opportunity.model_dump()))
+        change_feed.publish("created", {**created, "version": 1})
+        return created
+    if await db.get(models.User, opportunity.user_id) is None:
+        raise HTTPException(status_code=404, detail="User not found")
+    db_opportunity = models.Opportunity(**opportunity.model_dump())
+    db.add(db_opportunity)
+    await db.commit()
+    await db.refresh(db_opportunity)
+    change_feed.publish("created", opportunity_event(db_opportunity))
+    return db_opportunity
+
+
+@router.get(
+    "/opportunities/",
+    response_model=Union[List[OpportunitySchema], OpportunityPage],
+)
+@query_budget(6)
+async def read_opportunities(
+    request: Request,
+    response: Response,
+    skip: int = 0,
+    limit: int = 10,
+    paginate_by: Literal["offset", "cursor"] = Query(default="offset", alias="paginate"),
+    cursor: Optional[str] = None,
+    sort: SortKey = "id",
+    include_total: bool = False,
+    user_id: Optional[int] = None,
+    min_tam: Optional[float] = None,
+    max_tam: Optional[float] = None,
+    min_growth: Optional[float] = None,
+    max_growth: Optional[float] = None,
+    fields: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: models.User = Depends(get_current_user),
+):
+    filters = OpportunityFilters(user_id, min_tam, max_tam, min_growth, max_growth)
+    selected = parse_fields_param(fields)
+    cursor_mode = paginate_by == "cursor" or cursor is not None
+    if cursor_mode and limit < 1:
+        raise HTTPException(status_code=400, detail="limit must be positive")
+    if_none_match = request.headers.get("if-none-match")
+    try:
+        body, etag = await db.run_sync(
+            lambda sync_db: list_opportunities(
+                sync_db,
+                if_none_match,
+                skip,
+                limit,
+                cursor_mode,
+                cursor,
+                sort,
+                include_total,
+                filters,
+                selected,
+            )
+        )
+    except InvalidCursor as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    if body is None:
+        return not_modified(etag)
+    if selected:
+        return fieldsets.json_response(body, {"ETag": etag})
+    response.headers["ETag"] = etag
+    return body
+
+
+@router.get("/opportunities/{opportunity_id}", response_model=OpportunitySchema)
+@query_budget(2)
+async def read_opportunity(
+    opportunity_id: int,
+    request: Request,
+    response: Response,
+    fields: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db),
+):
+    selected = parse_fields_param(fields)
+    if_none_match = request.headers.get("if-none-match")
+    if_modified_since = request.headers.get("if-modified-since")
+    opportunity, etag, last_modified = await opportunity_flights.do(
+        (opportunity_id, selected, if_none_match, if_modified_since),
+        lambda: db.run_sync(
+            lambda sync_db: read_opportunity_conditional(
+                sync_db, opportunity_id, if_none_match, if_modified_since, selected
+            )
+        ),
+    )
+    if opportunity is None:
+        return not_modified(etag, last_modified)
+    if selected:
+        response = fieldsets.json_response(opportunity)
+        set_validators(response, etag, last_modified)
+        return response
+    set_validators(response, etag, last_modified)
+    return opportunity
+
+
+@router.put("/opportunities/{opportunity_id}", response_model=OpportunitySchema)
+@router.patch("/opportunities/{opportunity_id}", response_model=OpportunitySchema)
+@query_budget(5)
+async def update_opportunity(
+    opportunity_id: int,
+    opportunity: OpportunityUpdate,
+    response: Response,
+    db: AsyncSession = Depends(get_async_db),
+):
+    db_opportunity = await _get_opportunity(db, opportunity_id)
+    update_data = opportunity.model_dump(exclude_unset=True)
+    for key, value in update_data.items():
+        setattr(db_opportunity, key, value)
+    db_opportunity.version += 1
+    try:
+        await db.commit()
+    except StaleDataError:
+        await db.rollback()
+        raise HTTPException(status_code=409, detail=CONCURRENT_UPDATE)
+    prompt_cache.invalidate(opportunity_id)
+    opportunity_flights.invalidate(opportunity_id)
+    prompt_flights.invalidate(opportunity_id)
+    await db.refresh(db_opportunity)
+    change_feed.publish("updated", opportunity_event(db_opportunity))
+    set_validators(
+        response,
+        opportunity_etag(db_opportunity.id, db_opportunity.version),
+        db_opportunity.updated_at,
+    )
+    return db_opportunity
+
+
+@router.delete("/opportunities/{opportunity_id}", status_code=204)
+@query_budget(4)
+async def delete_opportunity(opportunity_id: int, db: AsyncSession = Depends(get_async_db)):
+    db_opportunity = await _get_opportunity(db, opportunity_id)
+    await db.delete(db_opportunity)
+    try:
+        await db.commit()
+    except StaleDataError:
+        await db.rollback()
+        raise HTTPException(status_code=409, detail=CONCURRENT_UPDATE)
+    prompt_cache.invalidate(opportunity_id)
+    opportunity_flights.invalidate(opportunity_id)
+    prompt_flights.invalidate(opportunity_id)
+    change_feed.publish("deleted", {"id": opportunity_id})
+    return Response(status_code=204)
+
+
+@router.get("/prompt/{opportunity_id}")
+@query_budget(1)
+async def generate_prompt(
+    opportunity_id: int,
+    response: Response,
+    template_name: str = "default",
+    db: AsyncSession = Depends(get_async_db),
+):
+    template, version = get_template(template_name)
+    response.headers["X-Template-Version"] = version
+    prompt = prompt_cache.get(opportunity_id, template_name, version)
+    if prompt is not None:
+        return {"prompt": prompt, "template_version": version}
+
+    async def render() -> str:
+        generation = prompt_cache.generation()
+        opportunity = await _get_opportunity(db, opportunity_id)
+        prompt = template.render(**prompt_context(opportunity))
+        prompt_cache.put(opportunity_id, template_name, version, prompt, generation)
+        return prompt
+
+    prompt = await prompt_flights.do((opportunity_id, template_name, version), render)
+    return {"prompt": prompt, "template_version": version}
+
+
+def install(app) -> None:
+    """Swap the app's sync handlers for the async ones in this module.
+
+    Routes are replaced in place so their matching order is unchanged; sync
+    routes without an async counterpart keep using the sync engine.
+    """
+    replacements = {
+        (route.path, frozenset(route.methods)): route for route in router.routes
+    }
+    app.router.routes = [
+        replacements.get((route.path, frozenset(getattr(route, "methods", None) or ())), route)
+        for route in app.router.routes
+    ]
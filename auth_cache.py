@@ -0,0 +1,85 @@
+"""Bounded LRU + TTL cache mapping bearer tokens to users.
+
+Entries are detached ``models.User`` instances. ``get_current_user`` merges
+them into the request session with ``load=False`` so a cache hit costs no
+database round-trip. Each worker process has its own cache, so a revoked token
+may remain valid in other workers for up to ``ttl`` seconds.
+"""
+
+from collections import OrderedDict
+from threading import Lock
+from typing import Optional
+import time
+
+from prometheus_client import CollectorRegistry, Counter, Gauge
+
+import models
+
+
+class TokenCache:
+    def __init__(
+        self,
+        maxsize: int,
+        ttl: float,
+        registry: Optional[CollectorRegistry] = None,
+    ) -> None:
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = Lock()
+        self.hits = Counter(
+            "auth_cache_hits_total", "Token cache hits", registry=registry
+        )
+        self.misses = Counter(
+            "auth_cache_misses_total", "Token cache misses", registry=registry
+        )
+        self.evictions = Counter(
+            "auth_cache_evictions_total",
+            "Token cache entries evicted because the cache was full",
+            registry=registry,
+        )
+        # Set on every change rather than read at scrape time, so the value
+        # also reaches the shared files in multiprocess mode.
+        self.size = Gauge(
+            "auth_cache_size",
+            "Entries currently in the token cache",
+            registry=registry,
+            multiprocess_mode="livesum",
+        )
+
+    def get(self, token: str) -> Optional[models.User]:
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is not None:
+                user, expires_at = entry
+                if expires_at > time.monotonic():
+                    self._entries.move_to_end(token)
+                    self.hits.inc()
+                    return user
+                del self._entries[token]
+                self.size.set(len(self._entries))
+        self.misses.inc()
+        return None
+
+    def put(self, token: str, user: models.User) -> None:
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._entries[token] = (user, time.monotonic() + self.ttl)
+            self._entries.move_to_end(token)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions.inc()
+            self.size.set(len(self._entries))
+
+    def invalidate(self, token: Optional[str]) -> None:
+        if token is None:
+            return
+        with self._lock:
+            self._entries.pop(token, None)
+            self.size.set(len(self._entries))
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.size.set(0)
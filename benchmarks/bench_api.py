@@ -0,0 +1,384 @@
+"""Load and latency benchmark for the API.
+
+Seeds a dedicated SQLite database, drives every endpoint either in-process
+(through ``TestClient``) or over a local uvicorn server, and writes p50/p95/p99
+latency, requests per second and per-request allocation figures to JSON.
+
+Examples::
+
+    python benchmarks/bench_api.py --opportunities 10000 --output bench.json
+    python benchmarks/bench_api.py --mode uvicorn --concurrency 8
+    python benchmarks/bench_api.py --baseline bench.json --max-regression 0.2
+
+Run from the repository root. The target database is rebuilt for every run
+unless ``--reuse-db`` is given and it already holds the requested row counts.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+import argparse
+import json
+import os
+import platform
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+SCENARIOS = (
+    "healthcheck",
+    "token",
+    "list",
+    "list_cursor",
+    "list_fields",
+    "get",
+    "prompt",
+    "create",
+    "patch",
+    "delete",
+)
+
+
+def percentile(values: List[float], pct: float) -> float:
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def seed(database_url: str, users: int, opportunities: int, rng_seed: int, reuse: bool) -> bool:
+    """Create the schema and insert ``users`` and ``opportunities`` rows.
+
+    Returns ``False`` if an existing database with matching counts was reused.
+    """
+    from sqlalchemy import create_engine, func, insert, select
+
+    import models
+    import portfolio_stats
+
+    engine = create_engine(database_url)
+    models.sync_schema(engine)
+    with engine.begin() as conn:
+        have_users = conn.scalar(select(func.count()).select_from(models.User))
+        have_opps = conn.scalar(select(func.count()).select_from(models.Opportunity))
+        if reuse and have_users == users and have_opps == opportunities:
+            return False
+        conn.execute(models.Opportunity.__table__.delete())
+        conn.execute(models.User.__table__.delete())
+
+        conn.execute(
+            insert(models.User),
+            [{"id": i + 1, "name": f"bench-user-{i}"} for i in range(users)],
+        )
+        rng = random.Random(rng_seed)
+        chunk = 10_000
+        for start in range(0, opportunities, chunk):
+            rows = [
+                {
+                    "id": i + 1,
+                    "title": f"Bench opportunity {i}",
+                    "user_id": rng.randint(1, users),
+                    "market_description": f"Market description {i} " * 4,
+                    "tam_estimate": round(rng.lognormvariate(14, 1.5), 2),
+                    "growth_rate": round(rng.uniform(0, 30), 2),
+                    "consumer_insight": f"Consumer insight {i}",
+                    "hypothesis": f"Hypothesis {i}",
+                }
+                for i in range(start, min(start + chunk, opportunities))
+            ]
+            conn.execute(insert(models.Opportunity), rows)
+        # The Core deletes and inserts above bypass the ORM flush hook.
+        portfolio_stats.rebuild(conn)
+    engine.dispose()
+    return True
+
+
+class Driver:
+    """Issue one scenario request against an httpx-compatible client."""
+
+    def __init__(self, opportunities: int, rng_seed: int) -> None:
+        self.opportunities = opportunities
+        self.rng = random.Random(rng_seed)
+        self.created: List[int] = []
+        self.headers: Dict[str, str] = {}
+        self.run_id = f"{int(time.time())}-{os.getpid()}"
+        self.counter = 0
+
+    def login(self, client) -> None:
+        resp = client.post("/token", data={"username": "bench-user-0", "password": "x"})
+        resp.raise_for_status()
+        self.headers = {"Authorization": f"Bearer {resp.json()['access_token']}"}
+
+    def random_id(self) -> int:
+        return self.rng.randint(1, self.opportunities)
+
+    def request(self, client, scenario: str):
+        if scenario == "healthcheck":
+            return client.get("/healthcheck")
+        if scenario == "token":
+            resp = client.post("/token", data={"username": "bench-user-1", "password": "x"})
+            return resp
+        if scenario == "list":
+            skip = self.rng.randint(0, max(0, self.opportunities - 10))
+            return client.get(f"/opportunities/?skip={skip}&limit=10", headers=self.headers)
+        if scenario == "list_cursor":
+            return client.get("/opportunities/?paginate=cursor&limit=10", headers=self.headers)
+        if scenario == "list_fields":
+            skip = self.rng.randint(0, max(0, self.opportunities - 10))
+            return client.get(
+                f"/opportunities/?skip={skip}&limit=10&fields=id,title,tam_estimate",
+                headers=self.headers,
+            )
+        if scenario == "get":
+            return client.get(f"/opportunities/{self.random_id()}")
+        if scenario == "prompt":
+            return client.get(f"/prompt/{self.random_id()}")
+        if scenario == "create":
+            self.counter += 1
+            resp = client.post(
+                "/opportunities/",
+                json={"title": f"bench-new-{self.run_id}-{self.counter}", "user_id": 1},
+                headers=self.headers,
+            )
+            if resp.status_code == 200:
+                self.created.append(resp.json()["id"])
+            return resp
+        if scenario == "patch":
+            return client.patch(
+                f"/opportunities/{self.random_id()}",
+                json={"growth_rate": round(self.rng.uniform(0, 30), 2)},
+            )
+        if scenario == "delete":
+            if not self.created:
+                return None
+            return client.delete(f"/opportunities/{self.created.pop()}")
+        raise ValueError(f"Unknown scenario: {scenario}")
+
+
+def measure_allocations(client, driver: Driver, scenario: str, requests: int) -> float:
+    """Return the median peak of traced allocations per request, in KiB.
+
+    Runs as a separate pass because tracing slows every allocation down and
+    would distort the latency figures.
+    """
+    peaks: List[int] = []
+    tracemalloc.start()
+    try:
+        for _ in range(requests):
+            tracemalloc.reset_peak()
+            base = tracemalloc.get_traced_memory()[0]
+            if driver.request(client, scenario) is not None:
+                peaks.append(tracemalloc.get_traced_memory()[1] - base)
+    finally:
+        tracemalloc.stop()
+    return percentile(peaks, 50) / 1024
+
+
+def run_scenario(
+    make_client: Callable,
+    driver: Driver,
+    scenario: str,
+    requests: int,
+    warmup: int,
+    concurrency: int,
+) -> Dict[str, float]:
+    client = make_client()
+    for _ in range(warmup):
+        driver.request(client, scenario)
+
+    latencies: List[float] = []
+    errors = 0
+
+    def one(c) -> None:
+        nonlocal errors
+        start = time.perf_counter()
+        resp = driver.request(c, scenario)
+        elapsed = time.perf_counter() - start
+        if resp is None:
+            return
+        if resp.status_code >= 400:
+            errors += 1
+        latencies.append(elapsed)
+
+    wall_start = time.perf_counter()
+    if concurrency <= 1:
+        for _ in range(requests):
+            one(client)
+    else:
+        clients = [make_client() for _ in range(concurrency)]
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            list(pool.map(lambda i: one(clients[i % concurrency]), range(requests)))
+    wall = time.perf_counter() - wall_start
+
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "rps": len(latencies) / wall if wall else 0.0,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "mean_ms": statistics.fmean(latencies) * 1000 if latencies else 0.0,
+    }
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_uvicorn(database_url: str, workers: int):
+    port = _free_port()
+    env = {**os.environ, "DATABASE_URL": database_url}
+    env.pop("ENVIRONMENT", None)
+    process = subprocess.Popen(
+        [
+            sys.executable, "-m", "uvicorn", "main:app",
+            "--port", str(port), "--workers", str(workers), "--log-level", "warning",
+        ],
+        cwd=ROOT,
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    import httpx
+
+    base_url = f"http://127.0.0.1:{port}"
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        try:
+            if httpx.get(f"{base_url}/healthcheck").status_code == 200:
+                return process, base_url
+        except httpx.HTTPError:
+            time.sleep(0.1)
+    process.terminate()
+    raise RuntimeError(f"uvicorn did not become ready; try: uvicorn main:app --port {port}")
+
+
+def compare(results: Dict, baseline: Dict, max_regression: float) -> List[str]:
+    """Return a description of every p95 regression beyond ``max_regression``."""
+    regressions = []
+    for mode, scenarios in results["results"].items():
+        for scenario, current in scenarios.items():
+            previous = baseline.get("results", {}).get(mode, {}).get(scenario)
+            if not previous or not previous.get("p95_ms"):
+                continue
+            change = current["p95_ms"] / previous["p95_ms"] - 1
+            line = (
+                f"{mode:9s} {scenario:12s} p95 {previous['p95_ms']:8.2f} -> "
+                f"{current['p95_ms']:8.2f} ms ({change:+.1%})"
+            )
+            print(line)
+            if change > max_regression:
+                regressions.append(line)
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--opportunities", type=int, default=10_000)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--db", default=os.path.join(tempfile.gettempdir(), "casecycle-bench.db"))
+    parser.add_argument("--reuse-db", action="store_true")
+    parser.add_argument("--mode", choices=("inprocess", "uvicorn", "both"), default="inprocess")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS))
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--warmup", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=1)
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn worker processes")
+    parser.add_argument("--no-alloc", action="store_true", help="skip allocation tracing")
+    parser.add_argument("--output", help="write results to this JSON file")
+    parser.add_argument("--baseline", help="compare against a previous results file")
+    parser.add_argument("--max-regression", type=float, default=0.2)
+    args = parser.parse_args(argv)
+
+    database_url = f"sqlite:///{args.db}"
+    os.environ["DATABASE_URL"] = database_url
+    os.environ.pop("ENVIRONMENT", None)
+
+    start = time.perf_counter()
+    if seed(database_url, args.users, args.opportunities, args.seed, args.reuse_db):
+        print(f"seeded {args.users} users / {args.opportunities} opportunities "
+              f"in {time.perf_counter() - start:.1f}s")
+
+    scenarios = [s for s in args.scenarios.split(",") if s]
+    modes = ("inprocess", "uvicorn") if args.mode == "both" else (args.mode,)
+    results: Dict = {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "users": args.users,
+            "opportunities": args.opportunities,
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "workers": args.workers,
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        },
+        "results": {},
+    }
+
+    for mode in modes:
+        driver = Driver(args.opportunities, args.seed)
+        if mode == "inprocess":
+            from fastapi.testclient import TestClient
+
+            import main as app_module
+
+            shared = TestClient(app_module.app)
+            make_client = lambda: shared  # noqa: E731
+            trace = not args.no_alloc
+            process = None
+        else:
+            import httpx
+
+            process, base_url = start_uvicorn(database_url, args.workers)
+            make_client = lambda: httpx.Client(base_url=base_url)  # noqa: E731
+            trace = False
+        try:
+            driver.login(make_client())
+            mode_results = {}
+            for scenario in scenarios:
+                mode_results[scenario] = r = run_scenario(
+                    make_client, driver, scenario, args.requests, args.warmup,
+                    args.concurrency,
+                )
+                if trace:
+                    r["alloc_peak_kib_p50"] = measure_allocations(
+                        make_client(), driver, scenario, min(args.requests, 50)
+                    )
+                print(
+                    f"{mode:9s} {scenario:12s} {r['rps']:9.1f} req/s  "
+                    f"p50 {r['p50_ms']:7.2f}  p95 {r['p95_ms']:7.2f}  p99 {r['p99_ms']:7.2f} ms"
+                    + (f"  alloc {r['alloc_peak_kib_p50']:7.1f} KiB" if trace else "")
+                    + (f"  errors {r['errors']}" if r["errors"] else "")
+                )
+            results["results"][mode] = mode_results
+        finally:
+            if process is not None:
+                process.terminate()
+                process.wait()
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.max_regression)
+        if regressions:
+            print(f"{len(regressions)} scenario(s) regressed by more than "
+                  f"{args.max_regression:.0%}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,166 @@
+"""Micro-benchmark of the per-request cost of the metrics middleware.
+
+Calls a trivial FastAPI route directly through ASGI, with no server and no
+database, so the only difference between variants is the middleware:
+
+- ``none``: no instrumentation.
+- ``base_http``: the previous ``@app.middleware("http")`` implementation,
+  including its INFO access log line (written to ``os.devnull``).
+- ``asgi``: ``request_metrics.MetricsMiddleware`` with access logging off.
+- ``asgi_log``: the same with every request logged.
+
+Example::
+
+    python benchmarks/bench_middleware.py --requests 20000
+"""
+
+from typing import Dict, List, Optional
+import argparse
+import asyncio
+import json
+import logging
+import os
+import statistics
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+VARIANTS = ("none", "base_http", "asgi", "asgi_log")
+
+
+def _metrics(registry):
+    from prometheus_client import Counter, Histogram
+
+    count = Counter("requests_total", "", ["method", "path", "status_code"], registry=registry)
+    latency = Histogram("request_latency_seconds", "", ["method", "path"], registry=registry)
+    return count, latency
+
+
+def build_app(variant: str):
+    from fastapi import FastAPI, Request
+    from prometheus_client import CollectorRegistry
+
+    from request_metrics import MetricsMiddleware
+
+    app = FastAPI()
+
+    @app.get("/items/{item_id}")
+    async def read_item(item_id: int) -> dict:
+        return {"id": item_id}
+
+    count, latency = _metrics(CollectorRegistry())
+    log = logging.getLogger("uvicorn")
+    if variant == "base_http":
+
+        @app.middleware("http")
+        async def log_requests(request: Request, call_next):
+            start_time = time.perf_counter()
+            response = await call_next(request)
+            process_time = time.perf_counter() - start_time
+            route = request.scope.get("route")
+            path_template = getattr(route, "path", request.url.path)
+            count.labels(request.method, path_template, str(response.status_code)).inc()
+            latency.labels(request.method, path_template).observe(process_time)
+            log.info(
+                "%s %s completed in %.4f seconds", request.method, request.url.path, process_time
+            )
+            return response
+
+    elif variant in ("asgi", "asgi_log"):
+        rate = 1.0 if variant == "asgi_log" else 0.0
+        app.add_middleware(
+            MetricsMiddleware,
+            request_count=count,
+            request_latency=latency,
+            access_log_sample_rate=rate,
+        )
+    return app
+
+
+def _scope(path: str) -> dict:
+    return {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "root_path": "",
+        "query_string": b"",
+        "headers": [(b"host", b"bench")],
+        "client": ("127.0.0.1", 1),
+        "server": ("bench", 80),
+    }
+
+
+async def _call(app, path: str) -> None:
+    async def receive() -> dict:
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message: dict) -> None:
+        pass
+
+    await app(_scope(path), receive, send)
+
+
+async def _run(app, requests: int, warmup: int) -> List[float]:
+    for i in range(warmup):
+        await _call(app, f"/items/{i}")
+    timings = []
+    for i in range(requests):
+        start = time.perf_counter()
+        await _call(app, f"/items/{i}")
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def run_variant(variant: str, requests: int, warmup: int) -> Dict[str, float]:
+    app = build_app(variant)
+    timings = asyncio.run(_run(app, requests, warmup))
+    timings.sort()
+    return {
+        "mean_us": statistics.fmean(timings) * 1e6,
+        "p50_us": timings[len(timings) // 2] * 1e6,
+        "p99_us": timings[int(len(timings) * 0.99) - 1] * 1e6,
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=10_000)
+    parser.add_argument("--warmup", type=int, default=500)
+    parser.add_argument("--variants", default=",".join(VARIANTS))
+    parser.add_argument("--output", help="write results to this JSON file")
+    args = parser.parse_args(argv)
+
+    # Make the access log do real formatting and I/O, as under uvicorn.
+    handler = logging.FileHandler(os.devnull)
+    handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(message)s"))
+    log = logging.getLogger("uvicorn")
+    log.addHandler(handler)
+    log.setLevel(logging.INFO)
+    log.propagate = False
+
+    results = {}
+    for variant in args.variants.split(","):
+        results[variant] = run_variant(variant, args.requests, args.warmup)
+
+    base = results.get("none", {}).get("mean_us")
+    print(f"{'variant':<10} {'mean us':>9} {'p50 us':>9} {'p99 us':>9} {'overhead us':>12}")
+    for variant, figures in results.items():
+        overhead = f"{figures['mean_us'] - base:12.1f}" if base is not None else f"{'-':>12}"
+        print(
+            f"{variant:<10} {figures['mean_us']:9.1f} {figures['p50_us']:9.1f} "
+            f"{figures['p99_us']:9.1f} {overhead}"
+        )
+    if args.output:
+        with open(args.output, "w") as fh:
+            json.dump({"requests": args.requests, "results": results}, fh, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
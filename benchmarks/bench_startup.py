@@ -0,0 +1,133 @@
+"""Cold-start benchmark for the API.
+
+Starts fresh interpreters that import ``main`` and run the app's lifespan
+startup, and reports how long the import, the startup and the whole process
+take until the app is ready, with and without ``SKIP_SCHEMA_SYNC``:
+
+    python benchmarks/bench_startup.py --runs 10 --output startup.json
+    python benchmarks/bench_startup.py --baseline startup.json --max-regression 0.2
+
+The database is created once before measuring, so every measured run sees an
+up-to-date schema, as a restarted worker would. Run from the repository root.
+"""
+
+from typing import Dict, List, Optional
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+VARIANTS = {
+    "schema_sync": {},
+    "skip_schema_sync": {"SKIP_SCHEMA_SYNC": "1"},
+}
+
+CHILD = """
+import asyncio, json, time
+start = time.perf_counter()
+import main
+imported = time.perf_counter()
+
+async def run():
+    async with main.app.router.lifespan_context(main.app):
+        return time.perf_counter()
+
+ready = asyncio.run(run())
+print(json.dumps({"import_ms": (imported - start) * 1000, "startup_ms": (ready - imported) * 1000}))
+"""
+
+
+def run_once(env: Dict[str, str]) -> Dict[str, float]:
+    start = time.perf_counter()
+    output = subprocess.run(
+        [sys.executable, "-c", CHILD], env=env, cwd=ROOT, check=True,
+        capture_output=True, text=True,
+    ).stdout
+    # The process exits right after the lifespan completes, so its wall time
+    # is interpreter start-up plus import plus startup plus shutdown.
+    timings = json.loads(output.strip().splitlines()[-1])
+    timings["total_ms"] = (time.perf_counter() - start) * 1000
+    return timings
+
+
+def measure(env: Dict[str, str], runs: int) -> Dict[str, float]:
+    samples = [run_once(env) for _ in range(runs)]
+    result = {}
+    for key in ("import_ms", "startup_ms", "total_ms"):
+        values = [sample[key] for sample in samples]
+        result[f"{key[:-3]}_p50_ms"] = statistics.median(values)
+        result[f"{key[:-3]}_min_ms"] = min(values)
+    return result
+
+
+def compare(results: Dict, baseline: Dict, max_regression: float) -> List[str]:
+    """Return a description of every median total-time regression beyond ``max_regression``."""
+    regressions = []
+    for variant, current in results["results"].items():
+        previous = baseline.get("results", {}).get(variant)
+        if not previous or not previous.get("total_p50_ms"):
+            continue
+        change = current["total_p50_ms"] / previous["total_p50_ms"] - 1
+        line = (
+            f"{variant:16s} total p50 {previous['total_p50_ms']:8.1f} -> "
+            f"{current['total_p50_ms']:8.1f} ms ({change:+.1%})"
+        )
+        print(line)
+        if change > max_regression:
+            regressions.append(line)
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--db", default=os.path.join(tempfile.gettempdir(), "casecycle-startup.db"))
+    parser.add_argument("--variants", default=",".join(VARIANTS))
+    parser.add_argument("--output", help="write results to this JSON file")
+    parser.add_argument("--baseline", help="compare against a previous results file")
+    parser.add_argument("--max-regression", type=float, default=0.2)
+    args = parser.parse_args(argv)
+
+    env = {**os.environ, "DATABASE_URL": f"sqlite:///{args.db}"}
+    env.pop("ENVIRONMENT", None)
+    env.pop("PROMETHEUS_MULTIPROC_DIR", None)
+    # Create the schema so measured runs only check it.
+    run_once(env)
+
+    results: Dict = {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "runs": args.runs,
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        },
+        "results": {},
+    }
+    for variant in [v for v in args.variants.split(",") if v]:
+        results["results"][variant] = r = measure({**env, **VARIANTS[variant]}, args.runs)
+        print(
+            f"{variant:16s} import p50 {r['import_p50_ms']:7.1f}  "
+            f"startup p50 {r['startup_p50_ms']:7.1f}  total p50 {r['total_p50_ms']:7.1f} ms"
+        )
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.max_regression)
+        if regressions:
+            print(f"{len(regressions)} variant(s) regressed by more than {args.max_regression:.0%}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,118 @@
+"""Batched opportunity inserts for ``POST /opportunities/bulk``.
+
+Rows are inserted a chunk at a time with a single multi-row ``INSERT`` and one
+commit per chunk. Referenced users and existing titles are checked with one
+``IN`` query per chunk, so bad rows are reported individually instead of
+aborting the whole batch. ``ingest_chunk`` returns the rows it created so
+the caller can publish them once the chunk has committed.
+"""
+
+from typing import Any, Dict, List, Set, Tuple
+
+from sqlalchemy import insert, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+import models
+from portfolio_stats import record_inserts
+
+Row = Tuple[int, Dict[str, Any]]
+Created = List[Dict[str, Any]]
+
+
+class BulkResult:
+    """Accumulate created ids and per-row errors across chunks."""
+
+    def __init__(self) -> None:
+        self.created: List[Dict[str, int]] = []
+        self.errors: List[Dict[str, Any]] = []
+        self.known_users: Set[int] = set()
+        self.seen_titles: Set[str] = set()
+
+    def error(self, index: int, detail: Any) -> None:
+        self.errors.append({"index": index, "detail": detail})
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "inserted": len(self.created),
+            "created": self.created,
+            "errors": sorted(self.errors, key=lambda e: e["index"]),
+        }
+
+
+def _check_users(db: Session, rows: List[Row], result: BulkResult) -> List[Row]:
+    wanted = {data["user_id"] for _, data in rows} - result.known_users
+    if wanted:
+        found = db.scalars(select(models.User.id).where(models.User.id.in_(wanted)))
+        result.known_users.update(found)
+    valid = []
+    for index, data in rows:
+        if data["user_id"] in result.known_users:
+            valid.append((index, data))
+        else:
+            result.error(index, "User not found")
+    return valid
+
+
+def _check_titles(db: Session, rows: List[Row], result: BulkResult) -> List[Row]:
+    titles = [data["title"] for _, data in rows]
+    existing = set(
+        db.scalars(
+            select(models.Opportunity.title).where(models.Opportunity.title.in_(titles))
+        )
+    )
+    valid = []
+    for index, data in rows:
+        title = data["title"]
+        if title in existing or title in result.seen_titles:
+            result.error(index, "Duplicate title")
+            continue
+        result.seen_titles.add(title)
+        valid.append((index, data))
+    return valid
+
+
+def _insert_one_by_one(db: Session, rows: List[Row], result: BulkResult) -> Created:
+    """Fallback used when a concurrent writer makes the chunk insert fail."""
+    created = []
+    for index, data in rows:
+        try:
+            with db.begin_nested():
+                new_id = db.scalar(
+                    insert(models.Opportunity).returning(models.Opportunity.id), data
+                )
+                record_inserts(db.connection(), [data])
+        except IntegrityError:
+            result.error(index, "Duplicate title")
+        else:
+            result.created.append({"index": index, "id": new_id})
+            created.append({"id": new_id, **data})
+    db.commit()
+    return created
+
+
+def ingest_chunk(db: Session, rows: List[Row], result: BulkResult) -> Created:
+    """Insert one chunk of validated rows in a single transaction.
+
+    Returns the committed rows, each with its new ``id``.
+    """
+    rows = _check_users(db, rows, result)
+    rows = _check_titles(db, rows, result) if rows else rows
+    if not rows:
+        db.rollback()
+        return []
+
+    statement = insert(models.Opportunity).returning(
+        models.Opportunity.id, sort_by_parameter_order=True
+    )
+    try:
+        ids = db.scalars(statement, [data for _, data in rows]).all()
+        record_inserts(db.connection(), [data for _, data in rows])
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        return _insert_one_by_one(db, rows, result)
+    result.created.extend(
+        {"index": index, "id": new_id} for (index, _), new_id in zip(rows, ids)
+    )
+    return [{"id": new_id, **data} for (_, data), new_id in zip(rows, ids)]
@@ -0,0 +1,180 @@
+"""In-process change feed behind ``GET /opportunities/stream``.
+
+Writes publish one event per created, updated or deleted opportunity once
+they have committed. ``publish`` may be called from any thread: under a lock
+it numbers the event, encodes its server-sent-events frame once and appends
+it to a bounded backlog, then hands it to the event loop, which appends the
+same bytes to every subscriber's buffer. A subscriber is a coroutine waiting
+on an ``asyncio.Event``, so an idle connection costs a task and an empty
+buffer; it holds no thread and no database connection.
+
+Each subscriber buffers at most ``buffer`` events. One that falls further
+behind is dropped: its stream ends after the events it already has, and the
+client reconnects with ``Last-Event-ID`` and catches up from the backlog.
+
+Event ids are ``<epoch>-<sequence>`` with a random epoch per process. An id
+from another process, or one older than the backlog, cannot be resumed; the
+client is sent a ``reset`` event instead, which is also the first event of a
+fresh connection, and should reload the list before applying later events.
+"""
+
+from collections import deque
+from typing import Any, AsyncIterator, Deque, Dict, List, Optional, Set, Tuple
+import asyncio
+import secrets
+import threading
+
+from prometheus_client import CollectorRegistry, Counter, Gauge
+
+import fieldsets
+
+Event = Tuple[int, bytes]
+
+KEEP_ALIVE = b": keep-alive\n\n"
+
+
+def frame(event_id: str, kind: str, data: bytes) -> bytes:
+    """Encode one server-sent event; ``data`` is compact JSON without newlines."""
+    return b"id: %s\nevent: %s\ndata: %s\n\n" % (event_id.encode(), kind.encode(), data)
+
+
+class Subscriber:
+    __slots__ = ("replay", "events", "ready", "dropped", "last_seq", "limit")
+
+    def __init__(self, limit: int) -> None:
+        self.replay: List[bytes] = []
+        self.events: Deque[bytes] = deque()
+        self.ready = asyncio.Event()
+        self.dropped = False
+        self.last_seq = 0
+        self.limit = limit
+
+
+class ChangeFeed:
+    def __init__(
+        self, backlog: int, buffer: int, registry: Optional[CollectorRegistry] = None
+    ) -> None:
+        self.epoch = secrets.token_hex(4)
+        self.buffer = buffer
+        self._backlog: Deque[Event] = deque(maxlen=backlog)
+        self._seq = 0
+        self._lock = threading.Lock()
+        self._subscribers: Set[Subscriber] = set()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self.published = Counter(
+            "change_feed_events_total",
+            "Opportunity change events published",
+            ["kind"],
+            registry=registry,
+        )
+        self.dropped = Counter(
+            "change_feed_dropped_total",
+            "Subscribers dropped because their buffer was full",
+            registry=registry,
+        )
+        self.subscribers = Gauge(
+            "change_feed_subscribers",
+            "Open change feed streams",
+            registry=registry,
+            multiprocess_mode="livesum",
+        )
+
+    def publish(self, kind: str, data: Dict[str, Any]) -> None:
+        """Publish one event to every subscriber and to the backlog."""
+        body = fieldsets.dumps(data)
+        with self._lock:
+            self._seq += 1
+            event = (self._seq, frame(f"{self.epoch}-{self._seq}", kind, body))
+            self._backlog.append(event)
+            # Scheduled under the lock so the loop sees events in sequence order.
+            if self._loop is not None:
+                try:
+                    self._loop.call_soon_threadsafe(self._fan_out, event)
+                except RuntimeError:  # the loop has been closed
+                    self._loop = None
+                    self.subscribers.dec(len(self._subscribers))
+                    self._subscribers.clear()
+        self.published.labels(kind).inc()
+
+    def subscribe(self, last_event_id: Optional[str] = None) -> Subscriber:
+        """Register a subscriber, queueing the backlog after ``last_event_id``.
+
+        Must be called on the event loop that will consume the stream.
+        """
+        subscriber = Subscriber(self.buffer)
+        with self._lock:
+            self._loop = asyncio.get_running_loop()
+            after = self._resume_point(last_event_id)
+            if after is None:
+                reset = frame(f"{self.epoch}-{self._seq}", "reset", b"{}")
+                subscriber.replay.append(reset)
+            else:
+                subscriber.replay.extend(data for seq, data in self._backlog if seq > after)
+            # Events published before this point are in the replay; skip them
+            # if their fan-out is still queued on the loop.
+            subscriber.last_seq = self._seq
+            self._subscribers.add(subscriber)
+        self.subscribers.inc()
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber) -> None:
+        if subscriber in self._subscribers:
+            self._subscribers.discard(subscriber)
+            self.subscribers.dec()
+
+    async def stream(self, last_event_id: Optional[str], heartbeat: float) -> AsyncIterator[bytes]:
+        """Subscribe and yield the events, with a keep-alive comment when idle.
+
+        Subscribing only once the response is being sent means a client that
+        disconnects earlier never leaves a subscriber behind.
+        """
+        subscriber = self.subscribe(last_event_id)
+        try:
+            if subscriber.replay:
+                yield b"".join(subscriber.replay)
+                subscriber.replay = []
+            while True:
+                if subscriber.events:
+                    chunk = b"".join(subscriber.events)
+                    subscriber.events.clear()
+                    yield chunk
+                    continue
+                if subscriber.dropped:
+                    return
+                subscriber.ready.clear()
+                try:
+                    # ``timeout`` rather than ``wait_for``: no extra task per wait.
+                    async with asyncio.timeout(heartbeat):
+                        await subscriber.ready.wait()
+                except TimeoutError:
+                    yield KEEP_ALIVE
+        finally:
+            self.unsubscribe(subscriber)
+
+    def _resume_point(self, last_event_id: Optional[str]) -> Optional[int]:
+        # Caller holds the lock. Returns the sequence number to replay after,
+        # or None if the client has to reload.
+        if not last_event_id:
+            return None
+        epoch, _, seq = last_event_id.partition("-")
+        if epoch != self.epoch or not seq.isdigit():
+            return None
+        after = int(seq)
+        oldest = self._backlog[0][0] if self._backlog else self._seq + 1
+        if after > self._seq or after < oldest - 1:
+            return None
+        return after
+
+    def _fan_out(self, event: Event) -> None:
+        seq, data = event
+        for subscriber in list(self._subscribers):
+            if seq <= subscriber.last_seq:
+                continue
+            if len(subscriber.events) >= subscriber.limit:
+                subscriber.dropped = True
+                self.dropped.inc()
+                self.unsubscribe(subscriber)
+            else:
+                subscriber.events.append(data)
+                subscriber.last_seq = seq
+            subscriber.ready.set()
@@ -1,16 +1,184 @@
 import os
-from sqlalchemy import create_engine
+from threading import Lock
+import time
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
 from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+from settings import (
+    DB_MAX_OVERFLOW,
+    DB_POOL_PRE_PING,
+    DB_POOL_RECYCLE,
+    DB_POOL_SIZE,
+    DB_POOL_TIMEOUT,
+    SQLITE_BUSY_TIMEOUT_MS,
+    SQLITE_CACHE_SIZE,
+    SQLITE_JOURNAL_MODE,
+    SQLITE_MMAP_SIZE,
+    SQLITE_SYNCHRONOUS,
+)
 
 SQLALCHEMY_DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./test.db")
 
+# Async drivers and the sync driver used for schema setup and scripts.
+ASYNC_DRIVERS = {
+    "sqlite+aiosqlite": "sqlite",
+    "postgresql+asyncpg": "postgresql",
+    "postgresql+psycopg_async": "postgresql+psycopg",
+    "mysql+aiomysql": "mysql+pymysql",
+    "mysql+asyncmy": "mysql+pymysql",
+}
+
+_url = make_url(SQLALCHEMY_DATABASE_URL)
+ASYNC_DATABASE = _url.drivername in ASYNC_DRIVERS
+SYNC_DATABASE_URL = (
+    _url.set(drivername=ASYNC_DRIVERS[_url.drivername])
+    if ASYNC_DATABASE
+    else _url
+)
+
 connect_args = (
     {"check_same_thread": False}
     if SQLALCHEMY_DATABASE_URL.startswith("sqlite")
     else {}
 )
 
-engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args=connect_args)
+SQLITE_PRAGMAS = {
+    "journal_mode": SQLITE_JOURNAL_MODE,
+    "synchronous": SQLITE_SYNCHRONOUS,
+    "mmap_size": SQLITE_MMAP_SIZE,
+    "cache_size": SQLITE_CACHE_SIZE,
+    "busy_timeout": SQLITE_BUSY_TIMEOUT_MS,
+}
+
+
+class _TimedCheckoutMixin:
+    """Record how long callers wait for a connection from the pool."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.checkout_wait_seconds = 0.0
+        self.checkouts = 0
+        self._stats_lock = Lock()
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            waited = time.perf_counter() - start
+            with self._stats_lock:
+                self.checkout_wait_seconds += waited
+                self.checkouts += 1
+
+
+class TimedQueuePool(_TimedCheckoutMixin, QueuePool):
+    pass
+
+
+class TimedAsyncQueuePool(_TimedCheckoutMixin, AsyncAdaptedQueuePool):
+    pass
+
+
+def _is_memory_sqlite(url) -> bool:
+    return url.get_backend_name() == "sqlite" and url.database in (None, "", ":memory:")
+
+
+def engine_options(url, pool_class=TimedQueuePool) -> dict:
+    """Return ``create_engine`` keyword arguments for ``url`` from settings."""
+    options = {"connect_args": connect_args}
+    if _is_memory_sqlite(url):
+        return options
+    options.update(
+        poolclass=pool_class,
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT,
+        pool_recycle=DB_POOL_RECYCLE,
+        pool_pre_ping=DB_POOL_PRE_PING,
+    )
+    return options
+
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record) -> None:
+    cursor = dbapi_connection.cursor()
+    try:
+        for name, value in SQLITE_PRAGMAS.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+    finally:
+        cursor.close()
+
+
+def configure_engine(sync_engine) -> None:
+    """Attach connect-time hooks, such as the SQLite PRAGMAs, to ``sync_engine``."""
+    if sync_engine.dialect.name == "sqlite":
+        event.listen(sync_engine, "connect", _set_sqlite_pragmas)
+
+
+def warm_pool(sync_engine, connections: int) -> None:
+    """Open ``connections`` pooled connections and return them to the pool."""
+    opened = []
+    try:
+        for _ in range(connections):
+            opened.append(sync_engine.connect())
+    finally:
+        for conn in opened:
+            conn.close()
+
+
+async def warm_async_pool(async_engine, connections: int) -> None:
+    """Async counterpart of ``warm_pool``."""
+    opened = []
+    try:
+        for _ in range(connections):
+            opened.append(await async_engine.connect())
+    finally:
+        for conn in opened:
+            await conn.close()
+
+
+# Dialects whose ``insert`` construct has ``on_conflict_do_update``.
+UPSERT_DIALECTS = ("sqlite", "postgresql")
+
+
+def dialect_insert(conn):
+    """Return the dialect's ``insert`` construct, which supports upserts.
+
+    Only ``UPSERT_DIALECTS`` are supported; hot write paths check that first.
+    """
+    dialect = conn.dialect.name
+    if dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    elif dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        raise NotImplementedError(f"Upserts are not supported for {dialect}")
+    return insert
+
+
+engine = create_engine(SYNC_DATABASE_URL, **engine_options(SYNC_DATABASE_URL))
+configure_engine(engine)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 Base = declarative_base()
+
+
+def create_async_session_factory(url):
+    """Return an ``async_sessionmaker`` bound to a new async engine for ``url``."""
+    from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+    url = make_url(url)
+    async_engine = create_async_engine(
+        url, **engine_options(url, pool_class=TimedAsyncQueuePool)
+    )
+    configure_engine(async_engine.sync_engine)
+    return async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+
+# Only created when DATABASE_URL names an async driver, so the async extras
+# are not required in the default sync mode.
+AsyncSessionLocal = (
+    create_async_session_factory(SQLALCHEMY_DATABASE_URL) if ASYNC_DATABASE else None
+)
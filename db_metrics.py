@@ -0,0 +1,58 @@
+"""Prometheus collectors for database connection pools."""
+
+from typing import Dict
+import os
+
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+
+
+class PoolCollector:
+    """Report connection pool usage for one or more engines at scrape time.
+
+    The engine's current pool is read on every scrape, so the figures stay
+    correct after ``engine.dispose()`` replaces the pool. Pools belong to one
+    process; with ``per_process`` every sample is labelled with the process
+    id, as the multiprocess collector does for per-process gauges.
+    """
+
+    def __init__(self, engines: Dict[str, object], per_process: bool = False) -> None:
+        self.engines = engines
+        self.per_process = per_process
+
+    def collect(self):
+        extra = [str(os.getpid())] if self.per_process else []
+        labels = ["engine"] + (["pid"] if extra else [])
+        size = GaugeMetricFamily(
+            "db_pool_size", "Configured number of pooled connections", labels=labels
+        )
+        checked_out = GaugeMetricFamily(
+            "db_pool_checked_out", "Connections currently checked out", labels=labels
+        )
+        checked_in = GaugeMetricFamily(
+            "db_pool_checked_in", "Idle connections held by the pool", labels=labels
+        )
+        overflow = GaugeMetricFamily(
+            "db_pool_overflow",
+            "Connections open beyond the pool size (negative while below it)",
+            labels=labels,
+        )
+        wait = CounterMetricFamily(
+            "db_pool_checkout_wait_seconds",
+            "Total time spent waiting for a pooled connection",
+            labels=labels,
+        )
+        checkouts = CounterMetricFamily(
+            "db_pool_checkouts", "Connections handed out by the pool", labels=labels
+        )
+        for label, engine in self.engines.items():
+            pool = engine.pool
+            if not hasattr(pool, "checkedout"):
+                continue
+            size.add_metric([label, *extra], pool.size())
+            checked_out.add_metric([label, *extra], pool.checkedout())
+            checked_in.add_metric([label, *extra], pool.checkedin())
+            overflow.add_metric([label, *extra], pool.overflow())
+            if hasattr(pool, "checkout_wait_seconds"):
+                wait.add_metric([label, *extra], pool.checkout_wait_seconds)
+                checkouts.add_metric([label, *extra], pool.checkouts)
+        yield from (size, checked_out, checked_in, overflow, wait, checkouts)
@@ -0,0 +1,75 @@
+"""ETag and ``Last-Modified`` helpers for conditional GETs.
+
+Opportunity ETags are derived from the row id and its ``version`` counter, so
+they can be checked with a query on those two columns instead of loading and
+serializing the full row.
+"""
+
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from hashlib import sha1
+from typing import Iterable, Optional, Sequence, Tuple
+
+from fastapi import Response
+
+
+def fieldset_tag(fields: Optional[Sequence[str]]) -> str:
+    """A short digest of a ``fields`` selection, in the order it is encoded."""
+    return sha1(",".join(fields).encode()).hexdigest()[:12] if fields else ""
+
+
+def opportunity_etag(opportunity_id: int, version: int, fields: Optional[Sequence[str]] = None) -> str:
+    """Return the ETag of an opportunity, or of just ``fields`` of it.
+
+    Sparse representations have different bytes, so they get their own tag.
+    """
+    if fields:
+        return f'"{opportunity_id}-{version}-{fieldset_tag(fields)}"'
+    return f'"{opportunity_id}-{version}"'
+
+
+def collection_etag(keys: Iterable[Tuple[int, int]], *extra) -> str:
+    """Return an ETag for a list of ``(id, version)`` pairs plus any extras."""
+    digest = sha1()
+    for opportunity_id, version in keys:
+        digest.update(f"{opportunity_id}:{version},".encode())
+    for value in extra:
+        digest.update(f"|{value}".encode())
+    return f'"{digest.hexdigest()}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = [candidate.strip() for candidate in if_none_match.split(",")]
+    # Weak comparison, as If-None-Match requires.
+    return "*" in candidates or any(
+        candidate.removeprefix("W/") == etag for candidate in candidates
+    )
+
+
+def http_date(value: datetime) -> str:
+    return format_datetime(value.replace(tzinfo=timezone.utc), usegmt=True)
+
+
+def not_modified_since(if_modified_since: Optional[str], updated_at: Optional[datetime]) -> bool:
+    if not if_modified_since or updated_at is None:
+        return False
+    try:
+        since = parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+        return False
+    return updated_at.replace(tzinfo=timezone.utc, microsecond=0) <= since
+
+
+def not_modified(etag: str, last_modified: Optional[datetime] = None) -> Response:
+    headers = {"ETag": etag}
+    if last_modified is not None:
+        headers["Last-Modified"] = http_date(last_modified)
+    return Response(status_code=304, headers=headers)
+
+
+def set_validators(response: Response, etag: str, last_modified: Optional[datetime] = None) -> None:
+    response.headers["ETag"] = etag
+    if last_modified is not None:
+        response.headers["Last-Modified"] = http_date(last_modified)
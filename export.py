@@ -0,0 +1,67 @@
+"""Streaming export of the opportunities table.
+
+Rows are read as plain column tuples through a server-side cursor
+(``yield_per``) and written out one batch at a time, so memory use does not
+grow with the size of the table and the first rows are sent immediately.
+"""
+
+from typing import Callable, Iterator, Sequence
+import csv
+import io
+import json
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+import models
+
+EXPORT_COLUMNS = (
+    "id",
+    "title",
+    "market_description",
+    "tam_estimate",
+    "growth_rate",
+    "consumer_insight",
+    "hypothesis",
+    "user_id",
+)
+
+
+def _iter_batches(
+    session_factory: Callable[[], Session], batch_size: int
+) -> Iterator[Sequence[tuple]]:
+    columns = [getattr(models.Opportunity, name) for name in EXPORT_COLUMNS]
+    statement = (
+        select(*columns)
+        .order_by(models.Opportunity.id)
+        .execution_options(yield_per=batch_size)
+    )
+    db = session_factory()
+    try:
+        result = db.execute(statement)
+        for batch in result.partitions():
+            yield batch
+    finally:
+        db.close()
+
+
+def iter_ndjson(
+    session_factory: Callable[[], Session], batch_size: int = 1000
+) -> Iterator[str]:
+    dumps = json.JSONEncoder(separators=(",", ":")).encode
+    for batch in _iter_batches(session_factory, batch_size):
+        yield "".join(dumps(dict(zip(EXPORT_COLUMNS, row))) + "\n" for row in batch)
+
+
+def iter_csv(
+    session_factory: Callable[[], Session], batch_size: int = 1000
+) -> Iterator[str]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_COLUMNS)
+    yield buffer.getvalue()
+    for batch in _iter_batches(session_factory, batch_size):
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows(batch)
+        yield buffer.getvalue()
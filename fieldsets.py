@@ -0,0 +1,69 @@
+"""Sparse fieldsets for the opportunity read endpoints.
+
+With ``fields=title,tam_estimate`` only the named columns (plus the id,
+version and sort-key columns pagination and ETags need) are selected, as
+plain row tuples. The rows are turned into dicts and encoded straight to JSON
+bytes, which skips the ORM identity map and the ``from_attributes``
+validation of ``response_model``. ``orjson`` is used when it is installed;
+the standard library encoder produces the same documents otherwise.
+"""
+
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Sequence, Tuple
+import json
+
+from fastapi import Response
+
+import models
+from export import EXPORT_COLUMNS
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional speed-up
+    orjson = None
+
+# Every field of ``OpportunitySchema``, in its order.
+FIELDS = EXPORT_COLUMNS
+
+_encode = json.JSONEncoder(separators=(",", ":"), ensure_ascii=False).encode
+
+
+class InvalidFields(ValueError):
+    """Raised when ``fields`` names something that is not an opportunity field."""
+
+
+def parse_fields(raw: str) -> Tuple[str, ...]:
+    """Parse a comma-separated ``fields`` value, keeping the given order."""
+    names = tuple(dict.fromkeys(name.strip() for name in raw.split(",") if name.strip()))
+    if not names:
+        raise InvalidFields("fields must name at least one field")
+    unknown = [name for name in names if name not in FIELDS]
+    if unknown:
+        raise InvalidFields(
+            f"Unknown fields: {', '.join(unknown)}; expected any of {', '.join(FIELDS)}"
+        )
+    return names
+
+
+def columns(fields: Sequence[str], keys: Iterable[Any]) -> List[Any]:
+    """Return ``keys`` followed by the columns of ``fields`` not among them."""
+    selected = list(keys)
+    names = {column.key for column in selected}
+    selected.extend(getattr(models.Opportunity, name) for name in fields if name not in names)
+    return selected
+
+
+def project(rows: Iterable[Any], fields: Sequence[str]) -> List[Dict[str, Any]]:
+    """Turn rows selected with ``columns`` into dicts holding only ``fields``."""
+    return [{name: getattr(row, name) for name in fields} for row in rows]
+
+
+def dumps(body: Any) -> bytes:
+    """Encode ``body`` as compact JSON."""
+    if orjson is not None:
+        return orjson.dumps(body)
+    return _encode(body).encode()
+
+
+def json_response(body: Any, headers: Optional[Mapping[str, str]] = None) -> Response:
+    """Return ``body`` as an ``application/json`` response without validation."""
+    return Response(dumps(body), media_type="application/json", headers=headers)
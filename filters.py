@@ -0,0 +1,71 @@
+"""Filters for ``GET /opportunities/``.
+
+Every filter is backed by an index on ``opportunities``: ``user_id`` alone and
+combined with each sort column, and ``tam_estimate`` and ``growth_rate`` each
+with ``id``. Without range statistics SQLite assumes a one-sided range matches
+a quarter of the table and will often walk the table in sort order instead of
+using the range index, so range conditions are marked as selective.
+"""
+
+from dataclasses import dataclass
+from typing import Optional
+
+from sqlalchemy import Boolean
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.orm import Query
+from sqlalchemy.sql.functions import FunctionElement
+
+import models
+
+
+class selective(FunctionElement):
+    """Wrap a condition the query planner should treat as highly selective.
+
+    Renders as SQLite's ``unlikely()`` planner hint and as the bare condition
+    on other databases.
+    """
+
+    type = Boolean()
+    inherit_cache = True
+    # Already a condition; keeps SQLAlchemy from appending ``= 1`` on
+    # databases without a native boolean type.
+    _is_implicitly_boolean = True
+
+
+@compiles(selective)
+def _compile_selective(element, compiler, **kw):
+    return compiler.process(element.clauses, **kw)
+
+
+@compiles(selective, "sqlite")
+def _compile_selective_sqlite(element, compiler, **kw):
+    return f"unlikely({compiler.process(element.clauses, **kw)})"
+
+
+@dataclass(frozen=True)
+class OpportunityFilters:
+    user_id: Optional[int] = None
+    min_tam: Optional[float] = None
+    max_tam: Optional[float] = None
+    min_growth: Optional[float] = None
+    max_growth: Optional[float] = None
+
+    @property
+    def active(self) -> bool:
+        return any(value is not None for value in vars(self).values())
+
+    def apply(self, query: Query) -> Query:
+        """Return ``query`` restricted to the rows matching these filters."""
+        opportunity = models.Opportunity
+        if self.user_id is not None:
+            query = query.filter(opportunity.user_id == self.user_id)
+        ranges = (
+            (opportunity.tam_estimate, self.min_tam, self.max_tam),
+            (opportunity.growth_rate, self.min_growth, self.max_growth),
+        )
+        for column, low, high in ranges:
+            if low is not None:
+                query = query.filter(selective(column >= low))
+            if high is not None:
+                query = query.filter(selective(column <= high))
+        return query
@@ -1,4 +1,4 @@
-import { useState, useEffect, useCallback } from 'react';
+import { useState, useEffect, useCallback, useRef } from 'react';
 import OpportunityInput from './OpportunityInput';
 import UserForm from './UserForm';
 import UserList from './UserList';
@@ -8,6 +8,8 @@ function App() {
   const [opportunities, setOpportunities] = useState([]);
   const [errorMessage, setErrorMessage] = useState(null);
   const [page, setPage] = useState(0);
+  const [cursor, setCursor] = useState(null);
+  const [cursors, setCursors] = useState({ next: null, prev: null });
   const [userRefresh, setUserRefresh] = useState(0);
   const [loading, setLoading] = useState(false);
   const { token } = useAuth();
@@ -19,8 +21,12 @@ function App() {
     try {
       setErrorMessage(null);
 
+      const params = new URLSearchParams({ paginate: 'cursor', limit: '10' });
+      if (cursor) {
+        params.set('cursor', cursor);
+      }
       const response = await fetch(
-        new URL(`/opportunities/?skip=${page * 10}&limit=10`, API_BASE_URL),
+        new URL(`/opportunities/?${params}`, API_BASE_URL),
         { headers: token ? { Authorization: `Bearer ${token}` } : {} }
       );
       if (!response.ok) {
@@ -28,26 +34,117 @@ function App() {
       }
 
       const data = await response.json();
-      setOpportunities(data);
+      setOpportunities(data.items);
+      setCursors({ next: data.next_cursor, prev: data.prev_cursor });
     } catch (error) {
       console.error('Error fetching opportunities:', error);
       setErrorMessage(`Unable to fetch opportunities: ${error.message}`);
     } finally {
       setLoading(false);
     }
-  }, [page, API_BASE_URL, token]);
+  }, [cursor, API_BASE_URL, token]);
 
   useEffect(() => {
     fetchOpportunities();
   }, [fetchOpportunities]);
 
+  // The stream handlers outlive renders; read the latest values through refs.
+  const fetchRef = useRef(fetchOpportunities);
+  const nextCursorRef = useRef(cursors.next);
+  const countRef = useRef(opportunities.length);
+  useEffect(() => {
+    fetchRef.current = fetchOpportunities;
+    nextCursorRef.current = cursors.next;
+    countRef.current = opportunities.length;
+  }, [fetchOpportunities, cursors.next, opportunities.length]);
+
+  // Apply changes from the server as they happen instead of refetching.
+  useEffect(() => {
+    if (!token) {
+      return undefined;
+    }
+    let source = null;
+    let retry = null;
+    let lastEventId = null;
+    let closed = false;
+
+    const track = (handler) => (event) => {
+      lastEventId = event.lastEventId;
+      handler(event);
+    };
+
+    // EventSource cannot send the Authorization header, and the API token
+    // must not go in the URL, so each connection uses a single-use ticket.
+    const connect = async () => {
+      try {
+        const response = await fetch(new URL('/opportunities/stream/ticket', API_BASE_URL), {
+          method: 'POST',
+          headers: { Authorization: `Bearer ${token}` },
+        });
+        if (!response.ok) {
+          throw new Error(await response.text());
+        }
+        const { ticket } = await response.json();
+        if (closed) {
+          return;
+        }
+        const params = new URLSearchParams({ ticket });
+        if (lastEventId) {
+          params.set('last_event_id', lastEventId);
+        }
+        source = new EventSource(new URL(`/opportunities/stream?${params}`, API_BASE_URL));
+      } catch (error) {
+        console.error('Error opening change stream:', error);
+        retry = setTimeout(connect, 5000);
+        return;
+      }
+      source.addEventListener('reset', track(() => fetchRef.current()));
+      source.addEventListener('created', track((event) => {
+        if (nextCursorRef.current) {
+          return; // lands on a later page
+        }
+        if (countRef.current >= 10) {
+          fetchRef.current(); // the last page is full; pick up the new next cursor
+          return;
+        }
+        const opp = JSON.parse(event.data);
+        setOpportunities((items) => [...items, opp]);
+      }));
+      source.addEventListener('updated', track((event) => {
+        const opp = JSON.parse(event.data);
+        setOpportunities((items) => items.map((item) => (item.id === opp.id ? opp : item)));
+      }));
+      source.addEventListener('deleted', track((event) => {
+        const { id } = JSON.parse(event.data);
+        setOpportunities((items) => items.filter((item) => item.id !== id));
+      }));
+      // The ticket is spent, so the browser's own reconnect would be refused;
+      // reconnect with a fresh one, resuming after the last event seen.
+      source.onerror = () => {
+        source.close();
+        if (!closed) {
+          retry = setTimeout(connect, 1000);
+        }
+      };
+    };
+
+    connect();
+    return () => {
+      closed = true;
+      clearTimeout(retry);
+      if (source) {
+        source.close();
+      }
+    };
+  }, [API_BASE_URL, token]);
+
   return (
     <>
       <header className="text-2xl font-semibold p-4 bg-white shadow">CaseCycle</header>
       <main className="max-w-3xl mx-auto p-4 space-y-8">
         <UserForm onUserCreated={() => setUserRefresh((u) => u + 1)} />
         <UserList refreshToken={userRefresh} />
-        <OpportunityInput onSaved={fetchOpportunities} />
+        <OpportunityInput />
         {loading && <p>Loading…</p>}
         {errorMessage && <div role="alert" className="text-red-600">{errorMessage}</div>}
         <ul className="space-y-4">
@@ -64,16 +161,22 @@ function App() {
         </ul>
         <div className="flex justify-center items-center gap-4 mt-8">
           <button
-            onClick={() => setPage((p) => Math.max(p - 1, 0))}
-            disabled={page === 0}
+            onClick={() => {
+              setCursor(cursors.prev);
+              setPage((p) => Math.max(p - 1, 0));
+            }}
+            disabled={!cursors.prev}
             className="px-3 py-1 bg-blue-500 text-white rounded disabled:opacity-50"
           >
             Prev
           </button>
           <span>Page {page + 1}</span>
           <button
-            onClick={() => setPage((p) => p + 1)}
-            disabled={opportunities.length < 10}
+            onClick={() => {
+              setCursor(cursors.next);
+              setPage((p) => p + 1);
+            }}
+            disabled={!cursors.next}
             className="px-3 py-1 bg-blue-500 text-white rounded disabled:opacity-50"
           >
             Next
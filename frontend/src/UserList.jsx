@@ -12,7 +12,7 @@ function UserList({ refreshToken }) {
       setLoading(true);
       try {
         setError(null);
-        const resp = await fetch(new URL('/users/', API_BASE_URL));
+        const resp = await fetch(new URL('/users/?include=counts', API_BASE_URL));
         if (!resp.ok) {
           throw new Error(await resp.text());
         }
@@ -36,7 +36,9 @@ function UserList({ refreshToken }) {
       {error && <div role="alert" className="text-red-600">{error}</div>}
       <ul className="list-disc pl-5">
         {users.map((u) => (
-          <li key={u.id}>{u.name}</li>
+          <li key={u.id}>
+            {u.name} ({u.opportunity_count} {u.opportunity_count === 1 ? 'opportunity' : 'opportunities'})
+          </li>
         ))}
       </ul>
     </div>
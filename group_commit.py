@@ -0,0 +1,125 @@
+"""Group commit for ``POST /opportunities/``.
+
+With ``GROUP_COMMIT`` enabled, create requests hand their row to a single
+writer thread instead of each running its own transaction. The writer waits
+up to ``max_delay`` seconds after the first queued row, or until ``max_rows``
+rows are queued, and inserts the whole group with ``ingest_chunk``: one user
+check, one title check, one multi-row ``INSERT`` and one commit. Under bursts
+SQLite then takes its write lock once per group rather than once per request.
+
+Every request still gets its own id or its own error, and only after the
+commit has returned, so a successful response means the row is durable as
+before. A group that fails to commit fails each of its requests with a 503
+(or a 500 for errors other than database ones).
+"""
+
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import logging
+import queue
+import threading
+import time
+
+from fastapi import HTTPException
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+
+from bulk_ingest import BulkResult, ingest_chunk
+
+logger = logging.getLogger("uvicorn")
+
+# HTTP status for each per-row error reported by ``ingest_chunk``.
+ERROR_STATUS = {"User not found": 404, "Duplicate title": 409}
+
+Item = Tuple[Dict[str, Any], Future]
+
+_STOP = object()
+
+
+class GroupCommitWriter:
+    def __init__(
+        self, session_factory: Callable[[], Session], max_rows: int, max_delay: float
+    ) -> None:
+        self.session_factory = session_factory
+        self.max_rows = max_rows
+        self.max_delay = max_delay
+        self._queue: "queue.Queue" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._stopping = False
+        self._lock = threading.Lock()
+
+    def submit(self, data: Dict[str, Any]) -> Future:
+        """Queue one opportunity row; the future resolves to the row with its id.
+
+        Rejected rows resolve to an ``HTTPException``. Once ``stop`` has been
+        called the row is written on the caller's thread instead, so requests
+        that arrive during shutdown still succeed.
+        """
+        future: Future = Future()
+        with self._lock:
+            if not self._stopping:
+                if self._thread is None:
+                    self._thread = threading.Thread(
+                        target=self._run, name="group-commit", daemon=True
+                    )
+                    self._thread.start()
+                # Under the lock, so every accepted row is queued before ``_STOP``.
+                self._queue.put((data, future))
+                return future
+        self._write([(data, future)])
+        return future
+
+    def stop(self) -> None:
+        """Write everything queued so far and stop the writer thread."""
+        with self._lock:
+            if not self._stopping:
+                self._stopping = True
+                if self._thread is not None:
+                    self._queue.put(_STOP)
+            thread = self._thread
+        if thread is not None:
+            thread.join()
+
+    def _run(self) -> None:
+        stopping = False
+        while not stopping:
+            item = self._queue.get()
+            if item is _STOP:
+                return
+            group = [item]
+            deadline = time.monotonic() + self.max_delay
+            while len(group) < self.max_rows:
+                remaining = deadline - time.monotonic()
+                try:
+                    item = self._queue.get(timeout=max(remaining, 0))
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stopping = True
+                    break
+                group.append(item)
+            self._write(group)
+
+    def _write(self, group: List[Item]) -> None:
+        result = BulkResult()
+        db = self.session_factory()
+        try:
+            ingest_chunk(db, [(index, data) for index, (data, _) in enumerate(group)], result)
+        except Exception as exc:
+            logger.exception("Group commit of %d rows failed", len(group))
+            if isinstance(exc, SQLAlchemyError):
+                status, detail = 503, "Database unavailable"
+            else:
+                status, detail = 500, "Could not save opportunity"
+            for _, future in group:
+                future.set_exception(HTTPException(status_code=status, detail=detail))
+            return
+        finally:
+            db.close()
+        for created in result.created:
+            data, future = group[created["index"]]
+            future.set_result({**data, "id": created["id"]})
+        for error in result.errors:
+            _, future = group[error["index"]]
+            status = ERROR_STATUS.get(error["detail"], 400)
+            future.set_exception(HTTPException(status_code=status, detail=error["detail"]))
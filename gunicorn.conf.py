@@ -0,0 +1,27 @@
+"""Gunicorn settings for running the API with several Uvicorn workers.
+
+    PROMETHEUS_MULTIPROC_DIR=/tmp/metrics gunicorn main:app
+
+With ``PROMETHEUS_MULTIPROC_DIR`` set, the metric files are wiped when the
+server starts and each exited worker's files are archived, so ``/metrics``
+shows the totals of every worker.
+"""
+
+import os
+
+import multiprocess_metrics
+
+bind = os.getenv("GUNICORN_BIND", "0.0.0.0:8000")
+workers = int(os.getenv("WEB_CONCURRENCY", str(os.cpu_count() or 1)))
+worker_class = "uvicorn.workers.UvicornWorker"
+
+
+def on_starting(server):
+    if multiprocess_metrics.ENABLED:
+        os.makedirs(multiprocess_metrics.MULTIPROC_DIR, exist_ok=True)
+        multiprocess_metrics.clear()
+
+
+def child_exit(server, worker):
+    if multiprocess_metrics.ENABLED:
+        multiprocess_metrics.archive_process(worker.pid)
@@ -0,0 +1,131 @@
+"""Cached database health for ``/readyz``.
+
+``HealthProbe`` runs ``SELECT 1`` on a pooled connection every ``interval``
+seconds from a background task and keeps the outcome, so readiness probes
+only read the cached result and the pools' counters. Probes no longer open a
+session per request or queue behind a saturated pool.
+
+A result older than ``stale_after`` seconds counts as a failure; that covers a
+probe stuck waiting for a connection.
+"""
+
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+import asyncio
+import time
+
+from sqlalchemy import text
+from sqlalchemy.exc import SQLAlchemyError
+from starlette.concurrency import run_in_threadpool
+
+
+@dataclass(frozen=True)
+class ProbeResult:
+    ok: bool
+    latency: float
+    finished_at: float
+    error: Optional[str] = None
+
+
+class HealthProbe:
+    """Probe ``engine`` on an interval and report readiness from the last result.
+
+    ``pools`` are the engines whose pool saturation, checked-out connections
+    over pool size plus ``max_overflow``, is reported. At or above
+    ``max_saturation`` the process is not ready, so traffic goes elsewhere.
+    """
+
+    def __init__(
+        self,
+        engine,
+        pools: Dict[str, Any],
+        interval: float,
+        max_overflow: int,
+        max_saturation: float = 1.0,
+    ) -> None:
+        self.engine = engine
+        self.pools = pools
+        self.interval = interval
+        self.stale_after = 3 * interval
+        self.max_overflow = max_overflow
+        self.max_saturation = max_saturation
+        self.last: Optional[ProbeResult] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def probe(self) -> ProbeResult:
+        """Check the database once and store the result."""
+        start = time.perf_counter()
+        error = None
+        try:
+            with self.engine.connect() as conn:
+                conn.execute(text("SELECT 1"))
+        except SQLAlchemyError as exc:
+            error = f"{type(exc).__name__}: {exc}".splitlines()[0]
+        finished = time.perf_counter()
+        self.last = ProbeResult(error is None, finished - start, time.monotonic(), error)
+        return self.last
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            await run_in_threadpool(self.probe)
+
+    def start(self) -> None:
+        """Start probing in the background on the running event loop."""
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def _pool_status(self) -> Dict[str, Dict[str, Any]]:
+        pools = {}
+        for label, engine in self.pools.items():
+            pool = engine.pool
+            if not hasattr(pool, "checkedout"):
+                continue
+            checked_out = pool.checkedout()
+            if self.max_overflow < 0:
+                capacity = None
+                saturation = 0.0
+            else:
+                capacity = pool.size() + self.max_overflow
+                saturation = checked_out / capacity if capacity else 1.0
+            pools[label] = {
+                "checked_out": checked_out,
+                "capacity": capacity,
+                "saturation": round(saturation, 3),
+            }
+        return pools
+
+    def status(self) -> Dict[str, Any]:
+        """Return the readiness report; ``status`` is ``"ok"`` when ready."""
+        last = self.last
+        pools = self._pool_status()
+        if last is None:
+            database = {"ok": False, "error": "not probed yet"}
+            ready = False
+        else:
+            age = time.monotonic() - last.finished_at
+            stale = age > self.stale_after
+            database = {
+                "ok": last.ok and not stale,
+                "latency_ms": round(last.latency * 1000, 3),
+                "age_seconds": round(age, 3),
+                "error": last.error or ("last probe is stale" if stale else None),
+            }
+            ready = database["ok"]
+        saturated = [
+            label for label, pool in pools.items() if pool["saturation"] >= self.max_saturation
+        ]
+        return {
+            "status": "ok" if ready and not saturated else "unavailable",
+            "database": database,
+            "pools": pools,
+        }
@@ -1,17 +1,18 @@
-from fastapi import Depends, FastAPI, HTTPException, Response, Request
+from fastapi import Depends, FastAPI, HTTPException, Query, Response, Request
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
-from sqlalchemy import text
-from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm.exc import StaleDataError
 from sqlalchemy.orm import Session
-from pydantic import BaseModel, Field, ConfigDict
-from typing import List, Optional
+from pydantic import BaseModel, Field, ConfigDict, TypeAdapter, ValidationError, model_validator
+from typing import Any, AsyncIterator, List, Literal, Optional, Tuple, Union
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
+from contextlib import asynccontextmanager
 import os
+import sys
 import json
 import uuid
 from pathlib import Path
-from jinja2 import Template
-import time
 import logging
 from prometheus_client import (
     CollectorRegistry,
@@ -22,12 +23,112 @@ from prometheus_client import (
 )
 
 import models
-from database import SessionLocal, engine
-from settings import ALLOWED_ORIGINS
+import database
+import fieldsets
+from database import ASYNC_DATABASE, SessionLocal, engine
+from db_metrics import PoolCollector
+import multiprocess_metrics
+from etags import (
+    collection_etag,
+    etag_matches,
+    fieldset_tag,
+    not_modified,
+    not_modified_since,
+    opportunity_etag,
+    set_validators,
+)
+from filters import OpportunityFilters
+from group_commit import GroupCommitWriter
+from health import HealthProbe
+import portfolio_stats
+from pagination import InvalidCursor, estimate_count, key_columns, order_by, paginate
+from auth_cache import TokenCache
+from bulk_ingest import BulkResult, ingest_chunk
+from change_feed import ChangeFeed
+from export import iter_csv, iter_ndjson
+from prompt_cache import PromptCache
+from search import search_opportunities
+from single_flight import SingleFlight
+from stream_tickets import StreamTickets
+from settings import (
+    ACCESS_LOG_SAMPLE_RATE,
+    ALLOWED_ORIGINS,
+    AUTH_CACHE_SIZE,
+    AUTH_CACHE_TTL,
+    BULK_CHUNK_SIZE,
+    CHANGE_FEED_BACKLOG,
+    CHANGE_FEED_BUFFER,
+    CHANGE_FEED_HEARTBEAT,
+    DB_MAX_OVERFLOW,
+    DB_POOL_WARM_CONNECTIONS,
+    GROUP_COMMIT,
+    GROUP_COMMIT_MAX_DELAY_MS,
+    GROUP_COMMIT_MAX_ROWS,
+    HEALTH_PROBE_INTERVAL,
+    METRICS_EXCLUDE_PATHS,
+    PROMPT_BATCH_CHUNK_SIZE,
+    PROMPT_BATCH_MAX_IDS,
+    PROMPT_CACHE_SIZE,
+    PROMPT_RENDER_WORKERS,
+    QUERY_BUDGET_STRICT,
+    READY_MAX_POOL_SATURATION,
+    REQUEST_LATENCY_BUCKETS,
+    SERVER_TIMING,
+    SINGLE_FLIGHT_TIMEOUT,
+    SKIP_SCHEMA_SYNC,
+    SQL_QUERY_BUCKETS,
+    STREAM_TICKET_TTL,
+)
+from request_metrics import MetricsMiddleware
+import sql_metrics
+from sql_metrics import query_budget
+from template_registry import TemplateRegistry, prompt_context
+import user_listing
+
+logger = logging.getLogger("uvicorn")
+
+
+def startup() -> None:
+    """Prepare the database and caches before the app starts serving.
+
+    Brings the schema up to date unless ``SKIP_SCHEMA_SYNC`` is set, loads the
+    sample data in development, opens the pooled connections, compiles the
+    prompt templates and runs the first health probe. Runs from ``lifespan``;
+    scripts that use ``app`` without its lifespan can call it directly.
+    """
+    if not SKIP_SCHEMA_SYNC:
+        models.sync_schema(engine)
+        portfolio_stats.ensure(engine)
+    if os.getenv("ENVIRONMENT") == "development":
+        from populate_sample_data import populate
+
+        populate()
+    database.warm_pool(engine, DB_POOL_WARM_CONNECTIONS)
+    try:
+        template_registry.version  # loads and compiles every template
+    except FileNotFoundError:
+        logger.warning("Template file %s not found", TEMPLATE_PATH)
+    health_probe.probe()
+
 
-models.Base.metadata.create_all(bind=engine)
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+    startup()
+    if ASYNC_DATABASE:
+        async_engine = database.AsyncSessionLocal.kw["bind"]
+        await database.warm_async_pool(async_engine, DB_POOL_WARM_CONNECTIONS)
+    health_probe.start()
+    yield
+    await health_probe.stop()
+    if group_writer is not None:
+        await run_in_threadpool(group_writer.stop)
+    # Only loaded once a batch has been rendered.
+    prompt_batch = sys.modules.get("prompt_batch")
+    if prompt_batch is not None:
+        prompt_batch.shutdown_pool()
 
-app = FastAPI()
+
+app = FastAPI(lifespan=lifespan)
 
 
 # Prometheus metrics registry and metrics definitions
@@ -43,40 +144,86 @@ REQUEST_LATENCY = Histogram(
     "Request latency in seconds",
     ["method", "path"],
     registry=PROMETHEUS_REGISTRY,
+    **({"buckets": REQUEST_LATENCY_BUCKETS} if REQUEST_LATENCY_BUCKETS else {}),
 )
+REQUEST_DB_QUERIES = Histogram(
+    "request_db_queries",
+    "SQL statements run per request",
+    ["method", "path"],
+    registry=PROMETHEUS_REGISTRY,
+    buckets=SQL_QUERY_BUCKETS,
+)
+REQUEST_DB_LATENCY = Histogram(
+    "request_db_seconds",
+    "Time spent in SQL statements per request",
+    ["method", "path"],
+    registry=PROMETHEUS_REGISTRY,
+    **({"buckets": REQUEST_LATENCY_BUCKETS} if REQUEST_LATENCY_BUCKETS else {}),
+)
+auth_cache = TokenCache(AUTH_CACHE_SIZE, AUTH_CACHE_TTL, registry=PROMETHEUS_REGISTRY)
+prompt_cache = PromptCache(PROMPT_CACHE_SIZE, registry=PROMETHEUS_REGISTRY)
+change_feed = ChangeFeed(CHANGE_FEED_BACKLOG, CHANGE_FEED_BUFFER, registry=PROMETHEUS_REGISTRY)
+stream_tickets = StreamTickets(STREAM_TICKET_TTL)
+SINGLE_FLIGHT_CALLS = Counter(
+    "single_flight_calls_total",
+    "Coalesced reads: calls run (leader), requests served by another request's "
+    "call (coalesced) and waiters that gave up (timeout)",
+    ["flight", "result"],
+    registry=PROMETHEUS_REGISTRY,
+)
+group_writer = (
+    GroupCommitWriter(SessionLocal, GROUP_COMMIT_MAX_ROWS, GROUP_COMMIT_MAX_DELAY_MS / 1000)
+    if GROUP_COMMIT
+    else None
+)
+opportunity_flights = SingleFlight("opportunity", SINGLE_FLIGHT_CALLS, SINGLE_FLIGHT_TIMEOUT)
+prompt_flights = SingleFlight("prompt", SINGLE_FLIGHT_CALLS, SINGLE_FLIGHT_TIMEOUT)
+_pooled_engines = {"sync": engine}
+if ASYNC_DATABASE:
+    _pooled_engines["async"] = database.AsyncSessionLocal.kw["bind"].sync_engine
+sql_metrics.strict = QUERY_BUDGET_STRICT
+for _pooled_engine in _pooled_engines.values():
+    sql_metrics.instrument(_pooled_engine)
+health_probe = HealthProbe(
+    engine,
+    _pooled_engines,
+    HEALTH_PROBE_INTERVAL,
+    DB_MAX_OVERFLOW,
+    READY_MAX_POOL_SATURATION,
+)
+if multiprocess_metrics.ENABLED:
+    # Counters, histograms and gauges are merged from every worker's files;
+    # pool figures can only come from the worker answering the scrape.
+    multiprocess_metrics.archive_dead_processes()
+    METRICS_REGISTRY = multiprocess_metrics.scrape_registry()
+    METRICS_REGISTRY.register(PoolCollector(_pooled_engines, per_process=True))
+else:
+    PROMETHEUS_REGISTRY.register(PoolCollector(_pooled_engines))
+    METRICS_REGISTRY = PROMETHEUS_REGISTRY
 
 
-@app.middleware("http")
-async def log_requests(request: Request, call_next):
-    """Log request metrics and processing time."""
-    start_time = time.perf_counter()
-    response = await call_next(request)
-    process_time = time.perf_counter() - start_time
-
-    route = request.scope.get("route")
-    path_template = getattr(route, "path", request.url.path)
-
-    REQUEST_COUNT.labels(request.method, path_template, str(response.status_code)).inc()
-    REQUEST_LATENCY.labels(request.method, path_template).observe(process_time)
-
-    logger.info(
-        "%s %s completed in %.4f seconds",
-        request.method,
-        request.url.path,
-        process_time,
-    )
-    return response
+app.add_middleware(
+    MetricsMiddleware,
+    request_count=REQUEST_COUNT,
+    request_latency=REQUEST_LATENCY,
+    exclude=METRICS_EXCLUDE_PATHS,
+    access_log_sample_rate=ACCESS_LOG_SAMPLE_RATE,
+    db_queries=REQUEST_DB_QUERIES,
+    db_latency=REQUEST_DB_LATENCY,
+    server_timing=SERVER_TIMING,
+)
 
 
 @app.get("/metrics")
 def metrics():
     return Response(
-        content=generate_latest(PROMETHEUS_REGISTRY),
+        content=generate_latest(METRICS_REGISTRY),
         media_type=CONTENT_TYPE_LATEST,
     )
 
 
 TEMPLATE_PATH = Path(__file__).with_name("prompt_templates.json")
+template_registry = TemplateRegistry(TEMPLATE_PATH)
 
 app.add_middleware(
     CORSMiddleware,
@@ -87,15 +234,6 @@ app.add_middleware(
 )
 
 
-logger = logging.getLogger("uvicorn")
-if os.getenv("ENVIRONMENT") == "development":
-    from populate_sample_data import populate
-
-    @app.on_event("startup")
-    def _load_sample_data() -> None:
-        populate()
-
-
 @app.get("/")
 def root() -> dict:
     """Basic root endpoint to confirm the API is running."""
@@ -110,11 +248,31 @@ def get_db():
         db.close()
 
 
-def load_templates() -> dict:
-    if not TEMPLATE_PATH.exists():
+def get_template_with_sources(template_name: str):
+    """Return the compiled template, all template sources and the version, or raise an HTTP error."""
+    try:
+        template, sources, version = template_registry.get_with_sources(template_name)
+    except FileNotFoundError:
         raise HTTPException(status_code=500, detail="Template file not found")
-    with TEMPLATE_PATH.open() as f:
-        return json.load(f)
+    if template is None:
+        raise HTTPException(status_code=404, detail="Template not found")
+    return template, sources, version
+
+
+def get_template(template_name: str):
+    """Return the compiled template and its version, or raise an HTTP error."""
+    template, _, version = get_template_with_sources(template_name)
+    return template, version
+
+
+def parse_fields_param(fields: Optional[str]) -> Optional[Tuple[str, ...]]:
+    """Parse a ``fields`` query parameter, or raise a 400 ``HTTPException``."""
+    if fields is None:
+        return None
+    try:
+        return fieldsets.parse_fields(fields)
+    except fieldsets.InvalidFields as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
 
 
 class UserCreate(BaseModel):
@@ -128,6 +286,9 @@ class UserSchema(BaseModel):
     model_config = ConfigDict(from_attributes=True)
 
 
+UserInclude = Literal["opportunities", "counts"]
+
+
 class OpportunityCreate(BaseModel):
     title: str
     market_description: Optional[str] = None
@@ -144,12 +305,80 @@ class OpportunitySchema(OpportunityCreate):
     model_config = ConfigDict(from_attributes=True)
 
 
+class UserWithOpportunities(UserSchema):
+    opportunities: List[OpportunitySchema]
+    has_more_opportunities: bool
+
+
+class UserWithCounts(UserSchema):
+    opportunity_count: int
+    tam_total: float
+
+
+# ``GET /users/`` answers with one of these, depending on ``include``.
+UserListing = Union[List[UserSchema], List[UserWithOpportunities], List[UserWithCounts]]
+# The listing is validated against the shape for its ``include`` mode rather
+# than the union, which could match a richer listing to a poorer shape.
+USER_LISTING_MODELS = {
+    None: TypeAdapter(List[UserSchema]),
+    "opportunities": TypeAdapter(List[UserWithOpportunities]),
+    "counts": TypeAdapter(List[UserWithCounts]),
+}
+
+
+def user_listing_response(include: Optional[str], users: List[dict]) -> Response:
+    """Validate ``users`` against the model for ``include`` and encode them."""
+    adapter = USER_LISTING_MODELS[include]
+    return Response(adapter.dump_json(adapter.validate_python(users)), media_type="application/json")
+
+
+SortKey = Literal["id", "title", "tam_estimate", "growth_rate"]
+
+
+class OpportunityPage(BaseModel):
+    items: List[OpportunitySchema]
+    next_cursor: Optional[str] = None
+    prev_cursor: Optional[str] = None
+    estimated_total: Optional[int] = None
+
+
+class SearchHit(OpportunitySchema):
+    snippet: str
+    score: float
+
+
+class SearchPage(BaseModel):
+    items: List[SearchHit]
+    next_cursor: Optional[str] = None
+
+
+class UserStats(BaseModel):
+    user_id: int
+    opportunities: int
+    tam_total: float
+
+
+class GrowthBucket(BaseModel):
+    min: float
+    max: Optional[float] = None
+    opportunities: int
+
+
+class PortfolioStats(BaseModel):
+    opportunities: int
+    tam_total: float
+    by_user: List[UserStats]
+    growth_distribution: List[GrowthBucket]
+    growth_unknown: int
+
+
 class Token(BaseModel):
     access_token: str
     token_type: str
 
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
+optional_oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token", auto_error=False)
 
 
 def authenticate_user(db: Session, username: str, password: str):
@@ -166,13 +395,19 @@ def create_access_token(data: dict) -> str:
 def get_current_user(
     token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)
 ):
+    cached = auth_cache.get(token)
+    if cached is not None:
+        return db.merge(cached, load=False)
     user = db.query(models.User).filter(models.User.token == token).first()
     if user is None:
         raise HTTPException(status_code=401, detail="Invalid authentication credentials")
-    return user
+    db.expunge(user)
+    auth_cache.put(token, user)
+    return db.merge(user, load=False)
 
 
 @app.post("/users/", response_model=UserSchema)
+@query_budget(3)
 def create_user(user: UserCreate, db: Session = Depends(get_db)):
     db_user = models.User(name=user.name)
     db.add(db_user)
@@ -181,12 +416,34 @@ def create_user(user: UserCreate, db: Session = Depends(get_db)):
     return db_user
 
 
-@app.get("/users/", response_model=List[UserSchema])
-def read_users(db: Session = Depends(get_db)):
-    return db.query(models.User).all()
+@app.get("/users/", response_model=UserListing)
+@query_budget(2)
+def read_users(
+    include: Optional[UserInclude] = None,
+    skip: int = Query(default=0, ge=0),
+    limit: Optional[int] = Query(default=None, ge=1, le=1000),
+    opportunity_limit: int = Query(default=10, ge=1, le=100),
+    db: Session = Depends(get_db),
+):
+    """List users, optionally with their opportunities or opportunity counts.
+
+    Without ``limit`` every user from ``skip`` on is returned, as before
+    paging was added. ``include=opportunities`` embeds up to
+    ``opportunity_limit`` opportunities per user and ``include=counts`` adds
+    ``opportunity_count`` and ``tam_total``; either way the page is loaded in
+    at most two queries. ``UserListing`` documents the three shapes.
+    """
+    if include == "opportunities":
+        users = user_listing.with_opportunities(db, skip, limit, opportunity_limit)
+    elif include == "counts":
+        users = user_listing.with_counts(db, skip, limit)
+    else:
+        users = user_listing.plain(db, skip, limit)
+    return user_listing_response(include, users)
 
 
 @app.post("/token", response_model=Token)
+@query_budget(3)
 async def login_for_access_token(
     form_data: OAuth2PasswordRequestForm = Depends(),
     db: Session = Depends(get_db),
@@ -195,8 +452,11 @@ async def login_for_access_token(
     if not user:
         raise HTTPException(status_code=401, detail="Incorrect username or password")
     access_token = create_access_token({"sub": user.name})
-    user.token = access_token
+    old_token, user.token = user.token, access_token
     db.commit()
+    # Only after the commit, or a concurrent request could cache the old
+    # token again before the new one is stored.
+    auth_cache.invalidate(old_token)
     return {"access_token": access_token, "token_type": "bearer"}
 
 
@@ -209,12 +469,22 @@ class OpportunityUpdate(BaseModel):
     hypothesis: Optional[str] = None
 
 
+def opportunity_event(opportunity: models.Opportunity) -> dict:
+    """The change feed payload for a created or updated opportunity."""
+    return {**fieldsets.project([opportunity], fieldsets.FIELDS)[0], "version": opportunity.version}
+
+
 @app.post("/opportunities/", response_model=OpportunitySchema)
+@query_budget(5)
 def create_opportunity(
     opportunity: OpportunityCreate,
     db: Session = Depends(get_db),
     current_user: models.User = Depends(get_current_user),
 ):
+    if group_writer is not None:
+        created = group_writer.submit(opportunity.model_dump()).result()
+        change_feed.publish("created", {**created, "version": 1})
+        return created
     user = db.query(models.User).filter(models.User.id == opportunity.user_id).first()
     if user is None:
         raise HTTPException(status_code=404, detail="User not found")
@@ -222,36 +492,429 @@ def create_opportunity(
     db.add(db_opportunity)
     db.commit()
     db.refresh(db_opportunity)
+    change_feed.publish("created", opportunity_event(db_opportunity))
     return db_opportunity
 
 
-@app.get("/opportunities/", response_model=List[OpportunitySchema])
+class BulkRowError(BaseModel):
+    index: int
+    detail: Any
+
+
+class BulkCreated(BaseModel):
+    index: int
+    id: int
+
+
+class BulkIngestResult(BaseModel):
+    inserted: int
+    created: List[BulkCreated]
+    errors: List[BulkRowError]
+
+
+NDJSON_MEDIA_TYPES = ("application/x-ndjson", "application/ndjson", "application/jsonl")
+
+
+async def _iter_ndjson(request: Request) -> AsyncIterator[Any]:
+    """Yield decoded NDJSON lines as the request body streams in.
+
+    Lines that are not valid JSON are yielded as ``ValueError`` instances so
+    they can be reported against their row index.
+    """
+    buffer = b""
+    async for chunk in request.stream():
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            if line.strip():
+                yield _decode_line(line)
+    if buffer.strip():
+        yield _decode_line(buffer)
+
+
+def _decode_line(line: bytes) -> Any:
+    try:
+        return json.loads(line)
+    except ValueError as exc:
+        return ValueError(f"Invalid JSON: {exc}")
+
+
+async def _iter_json_array(request: Request) -> AsyncIterator[Any]:
+    try:
+        rows = json.loads(await request.body())
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Body must be a JSON array")
+    if not isinstance(rows, list):
+        raise HTTPException(status_code=400, detail="Body must be a JSON array")
+    for row in rows:
+        yield row
+
+
+@app.post("/opportunities/bulk", response_model=BulkIngestResult)
+async def bulk_create_opportunities(
+    request: Request,
+    chunk_size: int = Query(default=BULK_CHUNK_SIZE, ge=1, le=10_000),
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_user),
+):
+    """Create many opportunities from a JSON array or an NDJSON stream.
+
+    Rows are validated with ``OpportunityCreate`` and inserted ``chunk_size``
+    at a time, one transaction per chunk. Invalid rows, unknown users and
+    duplicate titles are reported by index without aborting the batch.
+    """
+    content_type = request.headers.get("content-type", "").split(";")[0].strip()
+    if content_type in NDJSON_MEDIA_TYPES:
+        rows = _iter_ndjson(request)
+    else:
+        rows = _iter_json_array(request)
+
+    result = BulkResult()
+    pending = []
+    index = 0
+
+    async def ingest(chunk) -> None:
+        for created in await run_in_threadpool(ingest_chunk, db, chunk, result):
+            change_feed.publish("created", {**created, "version": 1})
+
+    async for raw in rows:
+        try:
+            if isinstance(raw, ValueError):
+                raise raw
+            opportunity = OpportunityCreate.model_validate(raw)
+        except ValidationError as exc:
+            result.error(index, exc.errors(include_url=False, include_context=False, include_input=False))
+        except ValueError as exc:
+            result.error(index, str(exc))
+        else:
+            pending.append((index, opportunity.model_dump()))
+        index += 1
+        if len(pending) >= chunk_size:
+            await ingest(pending)
+            pending = []
+    if pending:
+        await ingest(pending)
+    return result.as_dict()
+
+
+def list_opportunities(
+    db: Session,
+    if_none_match: Optional[str],
+    skip: int,
+    limit: int,
+    cursor_mode: bool,
+    cursor: Optional[str],
+    sort: str,
+    include_total: bool,
+    filters: OpportunityFilters = OpportunityFilters(),
+    fields: Optional[Tuple[str, ...]] = None,
+):
+    """Return ``(body, etag)`` for one page of opportunities.
+
+    ``body`` is ``None`` when ``if_none_match`` already matches the page. That
+    check only reads the id, version and sort-key columns, so unchanged pages
+    are answered without loading or serializing the full rows. The total is
+    a whole-table estimate and is left out when ``filters`` are active. With
+    ``fields`` the items are plain dicts of just those columns.
+    """
+
+    def fetch(query):
+        query = filters.apply(query)
+        if cursor_mode:
+            return paginate(query, sort, limit, cursor)
+        rows = query.order_by(*order_by(sort)).offset(skip).limit(limit).all()
+        return rows, None, None
+
+    def page_etag(rows, next_cursor, prev_cursor):
+        tags = []
+        if cursor_mode:
+            # Rows added before or after the page change whether there is a
+            # next or previous page without changing the page itself.
+            tags += [next_cursor is not None, prev_cursor is not None]
+        if fields:
+            # A sparse page has different bytes from the full one.
+            tags.append(fieldset_tag(fields))
+        return collection_etag(((row.id, row.version) for row in rows), total, *tags)
+
+    total = None
+    if cursor_mode and include_total and not filters.active:
+        total = estimate_count(db, models.Opportunity)
+    if if_none_match:
+        etag = page_etag(*fetch(db.query(*key_columns())))
+        if etag_matches(if_none_match, etag):
+            return None, etag
+
+    if fields:
+        query = db.query(*fieldsets.columns(fields, key_columns()))
+    else:
+        query = db.query(models.Opportunity)
+    items, next_cursor, prev_cursor = fetch(query)
+    etag = page_etag(items, next_cursor, prev_cursor)
+    if fields:
+        items = fieldsets.project(items, fields)
+    if not cursor_mode:
+        return items, etag
+    body = {
+        "items": items,
+        "next_cursor": next_cursor,
+        "prev_cursor": prev_cursor,
+        "estimated_total": total,
+    }
+    return body, etag
+
+
+@app.get(
+    "/opportunities/",
+    response_model=Union[List[OpportunitySchema], OpportunityPage],
+)
+@query_budget(6)
 def read_opportunities(
+    request: Request,
+    response: Response,
     skip: int = 0,
     limit: int = 10,
+    paginate_by: Literal["offset", "cursor"] = Query(default="offset", alias="paginate"),
+    cursor: Optional[str] = None,
+    sort: SortKey = "id",
+    include_total: bool = False,
+    user_id: Optional[int] = None,
+    min_tam: Optional[float] = None,
+    max_tam: Optional[float] = None,
+    min_growth: Optional[float] = None,
+    max_growth: Optional[float] = None,
+    fields: Optional[str] = None,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_user),
+):
+    """List opportunities.
+
+    By default this is the legacy ``skip``/``limit`` list. Passing
+    ``paginate=cursor`` or a ``cursor`` switches to keyset pagination and
+    returns a page object with ``next_cursor``/``prev_cursor`` tokens. Both
+    modes send a collection ETag and honour ``If-None-Match``, and both can be
+    filtered by ``user_id`` and TAM/growth ranges and sorted by any of
+    ``SortKey``. ``fields`` limits each item to the named fields.
+    """
+    filters = OpportunityFilters(user_id, min_tam, max_tam, min_growth, max_growth)
+    selected = parse_fields_param(fields)
+    cursor_mode = paginate_by == "cursor" or cursor is not None
+    if cursor_mode and limit < 1:
+        raise HTTPException(status_code=400, detail="limit must be positive")
+    try:
+        body, etag = list_opportunities(
+            db,
+            request.headers.get("if-none-match"),
+            skip,
+            limit,
+            cursor_mode,
+            cursor,
+            sort,
+            include_total,
+            filters,
+            selected,
+        )
+    except InvalidCursor as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    if body is None:
+        return not_modified(etag)
+    if selected:
+        return fieldsets.json_response(body, {"ETag": etag})
+    response.headers["ETag"] = etag
+    return body
+
+
+@app.get("/opportunities/export")
+def export_opportunities(
+    export_format: Literal["ndjson", "csv"] = Query(default="ndjson", alias="format"),
+    current_user: models.User = Depends(get_current_user),
+):
+    """Stream every opportunity as NDJSON or CSV."""
+    if export_format == "csv":
+        return StreamingResponse(
+            iter_csv(SessionLocal),
+            media_type="text/csv",
+            headers={"Content-Disposition": "attachment; filename=opportunities.csv"},
+        )
+    return StreamingResponse(iter_ndjson(SessionLocal), media_type="application/x-ndjson")
+
+
+@app.get("/opportunities/stats", response_model=PortfolioStats)
+@query_budget(2)
+def read_portfolio_stats(
     db: Session = Depends(get_db),
     current_user: models.User = Depends(get_current_user),
 ):
-    return db.query(models.Opportunity).offset(skip).limit(limit).all()
+    """Opportunity counts, TAM totals per user and the growth-rate distribution.
 
+    Served from the incrementally maintained ``portfolio_stats`` table, so the
+    cost depends on the number of users rather than opportunities.
+    """
+    return portfolio_stats.summary(db.connection())
 
-@app.get("/opportunities/{opportunity_id}", response_model=OpportunitySchema)
-def read_opportunity(opportunity_id: int, db: Session = Depends(get_db)):
-    opportunity = (
-        db.query(models.Opportunity)
-        .filter(models.Opportunity.id == opportunity_id)
-        .first()
+
+@app.get("/opportunities/search", response_model=SearchPage)
+@query_budget(3)
+def search(
+    q: str = Query(min_length=1),
+    limit: int = Query(default=10, ge=1, le=100),
+    cursor: Optional[str] = None,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_user),
+):
+    """Full-text search over titles, descriptions, insights and hypotheses.
+
+    Results are ranked by relevance and each one carries a highlighted
+    ``snippet``. Only available on SQLite builds with FTS5.
+    """
+    if not models.has_fts5(db.connection()):
+        raise HTTPException(status_code=501, detail="Full-text search is not available")
+    try:
+        items, next_cursor = search_opportunities(db, q, limit, cursor)
+    except InvalidCursor as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    return {"items": items, "next_cursor": next_cursor}
+
+
+def authenticate_stream(token: Optional[str]) -> models.User:
+    """Resolve a bearer token with a session that is closed before streaming."""
+    if token is None:
+        raise HTTPException(status_code=401, detail="Not authenticated")
+    db = SessionLocal()
+    try:
+        return get_current_user(token, db)
+    finally:
+        db.close()
+
+
+class StreamTicket(BaseModel):
+    ticket: str
+    expires_in: float
+
+
+@app.post("/opportunities/stream/ticket", response_model=StreamTicket)
+@query_budget(1)
+def create_stream_ticket(current_user: models.User = Depends(get_current_user)):
+    """Exchange the bearer token for a single-use ticket to open the stream with."""
+    return {"ticket": stream_tickets.issue(current_user.id), "expires_in": STREAM_TICKET_TTL}
+
+
+@app.get("/opportunities/stream")
+@query_budget(1)
+async def stream_opportunities(
+    request: Request,
+    last_event_id: Optional[str] = None,
+    ticket: Optional[str] = None,
+    token: Optional[str] = Depends(optional_oauth2_scheme),
+):
+    """Server-sent events for every created, updated and deleted opportunity.
+
+    Resumes after the ``Last-Event-ID`` header (or ``last_event_id``) from the
+    backlog. ``EventSource`` clients, which cannot send an ``Authorization``
+    header, authenticate with a ``ticket`` from ``/opportunities/stream/ticket``.
+    """
+    if ticket is not None:
+        if stream_tickets.redeem(ticket) is None:
+            raise HTTPException(status_code=401, detail="Invalid or expired stream ticket")
+    else:
+        await run_in_threadpool(authenticate_stream, token)
+    return StreamingResponse(
+        change_feed.stream(
+            request.headers.get("last-event-id") or last_event_id, CHANGE_FEED_HEARTBEAT
+        ),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
     )
+
+
+def read_opportunity_conditional(
+    db: Session,
+    opportunity_id: int,
+    if_none_match: Optional[str],
+    if_modified_since: Optional[str],
+    fields: Optional[Tuple[str, ...]] = None,
+):
+    """Return ``(opportunity, etag, last_modified)`` for a conditional GET.
+
+    ``opportunity`` is ``None`` when the client's copy is still current; that
+    case is decided from the version and timestamp columns alone. Otherwise
+    it is a plain dict, of just ``fields`` if given, which coalesced requests
+    can share without touching the session it was read in. Raises a 404
+    ``HTTPException`` if the row does not exist.
+    """
+    if if_none_match or if_modified_since:
+        key = (
+            db.query(models.Opportunity.version, models.Opportunity.updated_at)
+            .filter(models.Opportunity.id == opportunity_id)
+            .first()
+        )
+        if key is None:
+            raise HTTPException(status_code=404, detail="Opportunity not found")
+        etag = opportunity_etag(opportunity_id, key.version, fields)
+        if if_none_match:
+            unchanged = etag_matches(if_none_match, etag)
+        else:
+            unchanged = not_modified_since(if_modified_since, key.updated_at)
+        if unchanged:
+            return None, etag, key.updated_at
+
+    if fields:
+        keys = [models.Opportunity.id, models.Opportunity.version, models.Opportunity.updated_at]
+        query = db.query(*fieldsets.columns(fields, keys))
+    else:
+        query = db.query(models.Opportunity)
+    opportunity = query.filter(models.Opportunity.id == opportunity_id).first()
     if opportunity is None:
         raise HTTPException(status_code=404, detail="Opportunity not found")
+    etag = opportunity_etag(opportunity.id, opportunity.version, fields)
+    last_modified = opportunity.updated_at
+    opportunity = fieldsets.project([opportunity], fields or fieldsets.FIELDS)[0]
+    return opportunity, etag, last_modified
+
+
+@app.get("/opportunities/{opportunity_id}", response_model=OpportunitySchema)
+@query_budget(2)
+def read_opportunity(
+    opportunity_id: int,
+    request: Request,
+    response: Response,
+    fields: Optional[str] = None,
+    db: Session = Depends(get_db),
+):
+    """Return one opportunity, or only the comma-separated ``fields`` of it.
+
+    Concurrent identical requests share one lookup.
+    """
+    selected = parse_fields_param(fields)
+    if_none_match = request.headers.get("if-none-match")
+    if_modified_since = request.headers.get("if-modified-since")
+    opportunity, etag, last_modified = opportunity_flights.do(
+        (opportunity_id, selected, if_none_match, if_modified_since),
+        lambda: read_opportunity_conditional(
+            db, opportunity_id, if_none_match, if_modified_since, selected
+        ),
+    )
+    if opportunity is None:
+        return not_modified(etag, last_modified)
+    if selected:
+        response = fieldsets.json_response(opportunity)
+        set_validators(response, etag, last_modified)
+        return response
+    set_validators(response, etag, last_modified)
     return opportunity
 
 
+# Sent with 409 when the row changed between reading and writing it; see the
+# ``version_id_col`` on ``models.Opportunity``. The client re-reads and retries.
+CONCURRENT_UPDATE = "Opportunity was modified concurrently, retry the request"
+
+
 @app.put("/opportunities/{opportunity_id}", response_model=OpportunitySchema)
 @app.patch("/opportunities/{opportunity_id}", response_model=OpportunitySchema)
+@query_budget(5)
 def update_opportunity(
     opportunity_id: int,
     opportunity: OpportunityUpdate,
+    response: Response,
     db: Session = Depends(get_db),
 ):
     db_opportunity = (
@@ -265,12 +928,27 @@ def update_opportunity(
     update_data = opportunity.model_dump(exclude_unset=True)
     for key, value in update_data.items():
         setattr(db_opportunity, key, value)
-    db.commit()
+    db_opportunity.version += 1
+    try:
+        db.commit()
+    except StaleDataError:
+        db.rollback()
+        raise HTTPException(status_code=409, detail=CONCURRENT_UPDATE)
+    prompt_cache.invalidate(opportunity_id)
+    opportunity_flights.invalidate(opportunity_id)
+    prompt_flights.invalidate(opportunity_id)
     db.refresh(db_opportunity)
+    change_feed.publish("updated", opportunity_event(db_opportunity))
+    set_validators(
+        response,
+        opportunity_etag(db_opportunity.id, db_opportunity.version),
+        db_opportunity.updated_at,
+    )
     return db_opportunity
 
 
 @app.delete("/opportunities/{opportunity_id}", status_code=204)
+@query_budget(4)
 def delete_opportunity(opportunity_id: int, db: Session = Depends(get_db)):
     db_opportunity = (
         db.query(models.Opportunity)
@@ -280,46 +958,121 @@ def delete_opportunity(opportunity_id: int, db: Session = Depends(get_db)):
     if db_opportunity is None:
         raise HTTPException(status_code=404, detail="Opportunity not found")
     db.delete(db_opportunity)
-    db.commit()
+    try:
+        db.commit()
+    except StaleDataError:
+        db.rollback()
+        raise HTTPException(status_code=409, detail=CONCURRENT_UPDATE)
+    prompt_cache.invalidate(opportunity_id)
+    opportunity_flights.invalidate(opportunity_id)
+    prompt_flights.invalidate(opportunity_id)
+    change_feed.publish("deleted", {"id": opportunity_id})
     return Response(status_code=204)
 
 
 @app.get("/prompt/{opportunity_id}")
+@query_budget(1)
 def generate_prompt(
-    opportunity_id: int, template_name: str = "default", db: Session = Depends(get_db)
+    opportunity_id: int,
+    response: Response,
+    template_name: str = "default",
+    db: Session = Depends(get_db),
 ):
-    templates = load_templates()
-    template_str = templates.get(template_name)
-    if template_str is None:
-        raise HTTPException(status_code=404, detail="Template not found")
-
-    opportunity = (
-        db.query(models.Opportunity)
-        .filter(models.Opportunity.id == opportunity_id)
-        .first()
+    template, version = get_template(template_name)
+    response.headers["X-Template-Version"] = version
+    prompt = prompt_cache.get(opportunity_id, template_name, version)
+    if prompt is not None:
+        return {"prompt": prompt, "template_version": version}
+
+    def render() -> str:
+        generation = prompt_cache.generation()
+        opportunity = (
+            db.query(models.Opportunity)
+            .filter(models.Opportunity.id == opportunity_id)
+            .first()
+        )
+        if opportunity is None:
+            raise HTTPException(status_code=404, detail="Opportunity not found")
+        prompt = template.render(**prompt_context(opportunity))
+        prompt_cache.put(opportunity_id, template_name, version, prompt, generation)
+        return prompt
+
+    # Concurrent misses for the same prompt share one fetch and render.
+    prompt = prompt_flights.do((opportunity_id, template_name, version), render)
+    return {"prompt": prompt, "template_version": version}
+
+
+class PromptBatchFilter(BaseModel):
+    user_id: Optional[int] = None
+
+
+class PromptBatchRequest(BaseModel):
+    ids: Optional[List[int]] = Field(default=None, max_length=PROMPT_BATCH_MAX_IDS)
+    filter: Optional[PromptBatchFilter] = None
+    template_name: str = "default"
+    parallel: bool = False
+
+    @model_validator(mode="after")
+    def _require_selection(self):
+        if self.ids is None and self.filter is None:
+            raise ValueError("Either ids or filter is required")
+        return self
+
+
+@app.post("/prompt/batch")
+def generate_prompts(batch: PromptBatchRequest):
+    """Render prompts for many opportunities and stream them as NDJSON.
+
+    Each line is ``{"id": ..., "prompt": ...}``, or ``{"id": ..., "error": ...}``
+    for requested ids that do not exist.
+    """
+    from prompt_batch import iter_rendered
+
+    template, sources, version = get_template_with_sources(batch.template_name)
+
+    lines = iter_rendered(
+        SessionLocal,
+        template,
+        sources,
+        (version, batch.template_name),
+        ids=batch.ids,
+        user_id=batch.filter.user_id if batch.filter else None,
+        chunk_size=PROMPT_BATCH_CHUNK_SIZE,
+        workers=PROMPT_RENDER_WORKERS if batch.parallel else 0,
+    )
+    return StreamingResponse(
+        lines,
+        media_type="application/x-ndjson",
+        headers={"X-Template-Version": version},
     )
-    if opportunity is None:
-        raise HTTPException(status_code=404, detail="Opportunity not found")
 
-    data = {
-        "title": opportunity.title or "",
-        "market_description": opportunity.market_description or "",
-        "tam_estimate": opportunity.tam_estimate or "",
-        "growth_rate": opportunity.growth_rate or "",
-        "consumer_insight": opportunity.consumer_insight or "",
-        "hypothesis": opportunity.hypothesis or "",
-    }
-    prompt = Template(template_str).render(**data)
-    return {"prompt": prompt}
+
+@app.get("/livez")
+async def livez():
+    """Liveness: the process is serving requests. Does no I/O."""
+    return {"status": "ok"}
+
+
+@app.get("/readyz")
+async def readyz():
+    """Readiness from the cached background database probe and pool usage."""
+    report = health_probe.status()
+    return JSONResponse(report, status_code=200 if report["status"] == "ok" else 503)
 
 
 @app.get("/healthcheck")
-def healthcheck():
-    db = SessionLocal()
-    try:
-        db.execute(text("SELECT 1"))
-    except SQLAlchemyError:
+async def healthcheck():
+    """Database connectivity from the cached background probe, like ``/readyz``.
+
+    Kept with its original responses for existing monitors; unlike ``/readyz``
+    it ignores pool saturation.
+    """
+    if not health_probe.status()["database"]["ok"]:
         raise HTTPException(status_code=503, detail="Database unavailable")
-    finally:
-        db.close()
     return {"status": "ok"}
+
+
+if ASYNC_DATABASE:
+    import async_routes
+
+    async_routes.install(app)
@@ -1,9 +1,29 @@
-from sqlalchemy import Column, Integer, String, Float, ForeignKey
+from datetime import datetime, timezone
+from typing import Dict
+
+from sqlalchemy import (
+    DDL,
+    Column,
+    DateTime,
+    Integer,
+    String,
+    Float,
+    ForeignKey,
+    Index,
+    event,
+    inspect,
+    text,
+)
 from sqlalchemy.orm import relationship
+from sqlalchemy.schema import CreateColumn
 
 from database import Base
 
 
+def utcnow() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
 class User(Base):
     __tablename__ = "users"
 
@@ -25,5 +45,134 @@ class Opportunity(Base):
     growth_rate = Column(Float, nullable=True)
     consumer_insight = Column(String, nullable=True)
     hypothesis = Column(String, nullable=True)
+    # Bumped by every write so readers can build ETags without comparing rows.
+    version = Column(Integer, nullable=False, default=1, server_default=text("1"))
+    # Naive UTC timestamp of the last write.
+    updated_at = Column(DateTime, nullable=True, default=utcnow, onupdate=utcnow)
 
     user = relationship("User", back_populates="opportunities")
+
+    # Indexes behind the ``GET /opportunities/`` filters and sort keys. Each
+    # ends in ``id`` so keyset pages are read in index order.
+    __table_args__ = (
+        Index("ix_opportunities_tam_estimate_id", "tam_estimate", "id"),
+        Index("ix_opportunities_growth_rate_id", "growth_rate", "id"),
+        Index("ix_opportunities_user_id_id", "user_id", "id"),
+        Index("ix_opportunities_user_id_title", "user_id", "title"),
+        Index("ix_opportunities_user_id_tam_estimate_id", "user_id", "tam_estimate", "id"),
+        Index("ix_opportunities_user_id_growth_rate_id", "user_id", "growth_rate", "id"),
+    )
+    # ORM updates and deletes match ``version`` as loaded, so a row changed
+    # since it was read raises ``StaleDataError`` instead of being overwritten.
+    # ``portfolio_stats`` relies on this: the old values it subtracts are then
+    # always the committed row's. Writers bump the version themselves.
+    __mapper_args__ = {"version_id_col": version, "version_id_generator": False}
+
+
+class PortfolioStat(Base):
+    """Opportunity count and TAM total per user and growth-rate bucket.
+
+    Maintained incrementally by ``portfolio_stats``; see that module.
+    """
+
+    __tablename__ = "portfolio_stats"
+
+    user_id = Column(Integer, primary_key=True, autoincrement=False)
+    growth_bucket = Column(Integer, primary_key=True, autoincrement=False)
+    opportunities = Column(Integer, nullable=False, default=0)
+    tam_total = Column(Float, nullable=False, default=0.0)
+
+
+# SQLite FTS5 index over the opportunity text fields. It is an external-content
+# table, so it stores only the index, and triggers keep it in step with every
+# insert, update and delete, including bulk Core statements.
+FTS_TABLE = "opportunities_fts"
+FTS_COLUMNS = ("title", "market_description", "consumer_insight", "hypothesis")
+_fts_columns = ", ".join(FTS_COLUMNS)
+_fts_new = ", ".join(f"new.{column}" for column in FTS_COLUMNS)
+_fts_old = ", ".join(f"old.{column}" for column in FTS_COLUMNS)
+FTS_DDL = (
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5({_fts_columns}, "
+    f"content='opportunities', content_rowid='id', tokenize='porter unicode61')",
+    f"CREATE TRIGGER IF NOT EXISTS opportunities_fts_ai AFTER INSERT ON opportunities BEGIN "
+    f"INSERT INTO {FTS_TABLE}(rowid, {_fts_columns}) VALUES (new.id, {_fts_new}); END",
+    f"CREATE TRIGGER IF NOT EXISTS opportunities_fts_ad AFTER DELETE ON opportunities BEGIN "
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, {_fts_columns}) "
+    f"VALUES ('delete', old.id, {_fts_old}); END",
+    f"CREATE TRIGGER IF NOT EXISTS opportunities_fts_au AFTER UPDATE OF {_fts_columns} "
+    f"ON opportunities BEGIN "
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, {_fts_columns}) "
+    f"VALUES ('delete', old.id, {_fts_old}); "
+    f"INSERT INTO {FTS_TABLE}(rowid, {_fts_columns}) VALUES (new.id, {_fts_new}); END",
+)
+
+
+# ``has_fts5`` results by engine URL; the compile options of a build never change.
+_fts5_support: Dict[str, bool] = {}
+
+
+def has_fts5(conn) -> bool:
+    """Return whether ``conn`` is SQLite built with the FTS5 extension.
+
+    ``PRAGMA compile_options`` is only run the first time for each engine.
+    """
+    if conn.dialect.name != "sqlite":
+        return False
+    key = conn.engine.url.render_as_string(hide_password=False)
+    supported = _fts5_support.get(key)
+    if supported is None:
+        options = conn.execute(text("PRAGMA compile_options")).scalars()
+        supported = _fts5_support[key] = "ENABLE_FTS5" in set(options)
+    return supported
+
+
+def _fts_enabled(ddl, target, bind, **kw) -> bool:
+    return has_fts5(bind)
+
+
+for _statement in FTS_DDL:
+    event.listen(
+        Opportunity.__table__, "after_create", DDL(_statement).execute_if(callable_=_fts_enabled)
+    )
+event.listen(
+    Opportunity.__table__,
+    "before_drop",
+    DDL(f"DROP TABLE IF EXISTS {FTS_TABLE}").execute_if(dialect="sqlite"),
+)
+
+
+def _sync_fts(conn) -> None:
+    """Create the FTS index for an existing table and fill it if it is new."""
+    exists = conn.execute(
+        text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"),
+        {"name": FTS_TABLE},
+    ).scalar()
+    for statement in FTS_DDL:
+        conn.execute(text(statement))
+    if not exists:
+        conn.execute(text(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')"))
+
+
+def sync_schema(bind) -> None:
+    """Create missing tables, columns and indexes.
+
+    ``create_all`` only creates whole tables, so columns and indexes added to
+    the models later are added here, along with the SQLite full-text index.
+    Nothing is ever dropped or altered, and added columns must be nullable or
+    have a server default.
+    """
+    Base.metadata.create_all(bind=bind)
+    inspector = inspect(bind)
+    with bind.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            columns = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in columns:
+                    ddl = CreateColumn(column).compile(dialect=bind.dialect)
+                    conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {ddl}"))
+            indexes = {index["name"] for index in inspector.get_indexes(table.name)}
+            for index in table.indexes:
+                if index.name not in indexes:
+                    index.create(conn)
+        if has_fts5(conn):
+            _sync_fts(conn)
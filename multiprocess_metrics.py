@@ -0,0 +1,142 @@
+"""Prometheus metrics shared by several worker processes.
+
+When ``PROMETHEUS_MULTIPROC_DIR`` is set (it must be set before
+``prometheus_client`` is imported), every counter, histogram and gauge value
+is kept in a per-process memory-mapped file in that directory, and
+``/metrics`` merges the files of all workers, live or exited, with
+``MultiProcessCollector``.
+
+To keep scrapes cheap however many workers have come and gone, the counter
+and histogram files of an exited worker are folded into one ``*_archive.db``
+file per metric type, and its live gauges are dropped. Gunicorn does this
+from the ``child_exit`` hook in ``gunicorn.conf.py``; each worker also does it
+for any dead worker it finds when it starts, which covers ``uvicorn
+--workers`` and crashed workers. A lock file keeps scrapes from reading the
+directory half-way through a compaction.
+"""
+
+from collections import defaultdict
+from contextlib import contextmanager
+from importlib.metadata import version
+from typing import Dict, Iterator, Optional, Tuple
+import fcntl
+import glob
+import logging
+import os
+
+from prometheus_client import CollectorRegistry
+from prometheus_client.multiprocess import MultiProcessCollector, mark_process_dead
+
+logger = logging.getLogger("uvicorn")
+
+MULTIPROC_DIR = os.environ.get("PROMETHEUS_MULTIPROC_DIR")
+ENABLED = bool(MULTIPROC_DIR)
+
+# Archiving reads and writes the metric files with ``MmapedDict``, which is
+# not part of prometheus_client's public API. Outside the releases it has
+# been checked against, exited workers' files are left in place instead;
+# ``/metrics`` still merges them, only scrapes get slower as workers churn.
+ARCHIVE_VERSIONS = ((0, 20), (0, 27))
+
+
+def _release(name: str) -> Tuple[int, ...]:
+    return tuple(int(part) for part in version(name).split(".")[:2] if part.isdigit())
+
+
+MmapedDict = None
+if ARCHIVE_VERSIONS[0] <= _release("prometheus_client") < ARCHIVE_VERSIONS[1]:
+    try:
+        from prometheus_client.mmap_dict import MmapedDict
+    except ImportError:
+        pass
+if ENABLED and MmapedDict is None:
+    logger.warning("Exited workers' metric files are not archived with this prometheus_client")
+
+# Metric types whose values only ever accumulate and can be summed per sample.
+_ARCHIVED_TYPES = ("counter", "histogram", "summary")
+
+
+@contextmanager
+def _locked(path: str, exclusive: bool) -> Iterator[None]:
+    with open(os.path.join(path, ".lock"), "a") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+class LockedMultiProcessCollector(MultiProcessCollector):
+    """``MultiProcessCollector`` that does not race with ``archive_process``."""
+
+    def collect(self):
+        with _locked(self._path, exclusive=False):
+            return list(super().collect())
+
+
+def scrape_registry(path: Optional[str] = None) -> CollectorRegistry:
+    """Return a registry that merges every worker's metric files in ``path``."""
+    registry = CollectorRegistry()
+    LockedMultiProcessCollector(registry, path=path or MULTIPROC_DIR)
+    return registry
+
+
+def archive_process(pid: int, path: Optional[str] = None) -> None:
+    """Fold an exited worker's counters and histograms into the archive files.
+
+    The worker's live gauges are removed. Merged values are identical before
+    and after, so scrapes never see a counter go backwards.
+    """
+    path = path or MULTIPROC_DIR
+    with _locked(path, exclusive=True):
+        if MmapedDict is None:
+            mark_process_dead(pid, path)
+            return
+        for metric_type in _ARCHIVED_TYPES:
+            filename = os.path.join(path, f"{metric_type}_{pid}.db")
+            if not os.path.exists(filename):
+                continue
+            totals: Dict[str, Tuple[float, float]] = defaultdict(lambda: (0.0, 0.0))
+            archive = MmapedDict(os.path.join(path, f"{metric_type}_archive.db"))
+            try:
+                for key, value, timestamp in archive.read_all_values():
+                    totals[key] = (value, timestamp)
+                for key, value, timestamp, _ in MmapedDict.read_all_values_from_file(filename):
+                    total, latest = totals[key]
+                    totals[key] = (total + value, max(latest, timestamp))
+                for key, (value, timestamp) in totals.items():
+                    archive.write_value(key, value, timestamp)
+            finally:
+                archive.close()
+            os.remove(filename)
+        mark_process_dead(pid, path)
+
+
+def _is_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def archive_dead_processes(path: Optional[str] = None) -> None:
+    """Archive the files of every worker that is no longer running."""
+    path = path or MULTIPROC_DIR
+    pids = set()
+    for filename in glob.glob(os.path.join(path, "*.db")):
+        pid = os.path.basename(filename)[:-3].rsplit("_", 1)[-1]
+        if pid.isdigit():
+            pids.add(int(pid))
+    for pid in pids:
+        if pid != os.getpid() and not _is_alive(pid):
+            archive_process(pid, path)
+
+
+def clear(path: Optional[str] = None) -> None:
+    """Remove every metric file; call from the supervisor before workers start."""
+    path = path or MULTIPROC_DIR
+    for filename in glob.glob(os.path.join(path, "*.db")):
+        os.remove(filename)
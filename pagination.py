@@ -0,0 +1,192 @@
+"""Keyset (cursor) pagination helpers.
+
+Instead of ``OFFSET``, pages are located by seeking past the sort key and id
+of the last row seen, so each page costs an index seek regardless of depth.
+Cursors are opaque URL-safe tokens that encode the sort key, the boundary row
+and the direction of travel.
+"""
+
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from typing import Any, Dict, List, Optional, Tuple
+import json
+
+from sqlalchemy import and_, func, or_, text
+from sqlalchemy.orm import Query, Session
+
+import models
+
+# Sort keys that can be used with cursor pagination. Each one must be backed by
+# an index so the seek stays cheap.
+SORT_COLUMNS = {
+    "id": models.Opportunity.id,
+    "title": models.Opportunity.title,
+    "tam_estimate": models.Opportunity.tam_estimate,
+    "growth_rate": models.Opportunity.growth_rate,
+}
+
+
+def key_columns() -> List[Any]:
+    """Columns needed to paginate and build ETags without loading full rows."""
+    extra = [column for name, column in SORT_COLUMNS.items() if name != "id"]
+    return [models.Opportunity.id, models.Opportunity.version, *extra]
+
+
+class InvalidCursor(ValueError):
+    """Raised when a cursor token cannot be decoded."""
+
+
+def encode_token(payload: Dict[str, Any]) -> str:
+    """Encode ``payload`` as an opaque URL-safe cursor token."""
+    raw = json.dumps(payload, separators=(",", ":")).encode()
+    return urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_token(token: str) -> Dict[str, Any]:
+    """Decode a token from ``encode_token``; raises ``InvalidCursor`` if malformed."""
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        payload = json.loads(urlsafe_b64decode(padded.encode()))
+    except ValueError:
+        raise InvalidCursor("Invalid cursor")
+    if not isinstance(payload, dict):
+        raise InvalidCursor("Invalid cursor")
+    return payload
+
+
+def encode_cursor(sort: str, row: Any, direction: str) -> str:
+    return encode_token({"s": sort, "v": getattr(row, sort), "id": row.id, "d": direction})
+
+
+def _valid_value(column, value: Any) -> bool:
+    """Whether a cursor's boundary ``value`` can be compared with ``column``."""
+    if value is None:
+        return bool(column.nullable)
+    if isinstance(value, bool):
+        return False
+    python_type = column.type.python_type
+    if python_type is float:
+        return isinstance(value, (int, float))
+    return isinstance(value, python_type)
+
+
+def decode_cursor(token: str) -> Dict[str, Any]:
+    payload = decode_token(token)
+    try:
+        if payload["s"] not in SORT_COLUMNS or payload["d"] not in ("next", "prev"):
+            raise KeyError(payload["s"])
+        if not isinstance(payload["id"], int) or isinstance(payload["id"], bool):
+            raise TypeError(payload["id"])
+        if not _valid_value(SORT_COLUMNS[payload["s"]], payload["v"]):
+            raise TypeError(payload["v"])
+    except (ValueError, KeyError, TypeError):
+        raise InvalidCursor("Invalid cursor")
+    return payload
+
+
+def _after(column, value, last_id, backwards: bool):
+    """Condition for rows past ``(value, last_id)`` in ``(column, id)`` order.
+
+    NULLs sort before every value going forwards, as SQLite does by default,
+    and the ordering in ``order_by`` pins that down for other databases.
+    """
+    id_column = models.Opportunity.id
+    if value is None:
+        if backwards:
+            return and_(column.is_(None), id_column < last_id)
+        return or_(column.is_not(None), and_(column.is_(None), id_column > last_id))
+    if backwards:
+        condition = or_(column < value, and_(column == value, id_column < last_id))
+        return or_(condition, column.is_(None)) if column.nullable else condition
+    return or_(column > value, and_(column == value, id_column > last_id))
+
+
+def order_by(sort: str, backwards: bool = False) -> List[Any]:
+    """ORDER BY clauses for ``sort`` with ``id`` as the tie-breaker."""
+    id_column = models.Opportunity.id
+    if sort == "id":
+        return [id_column.desc() if backwards else id_column.asc()]
+    column = SORT_COLUMNS[sort]
+    if backwards:
+        key = column.desc().nulls_last() if column.nullable else column.desc()
+        return [key, id_column.desc()]
+    key = column.asc().nulls_first() if column.nullable else column.asc()
+    return [key, id_column.asc()]
+
+
+def _seek(query: Query, sort: str, cursor: Optional[Dict[str, Any]]) -> Query:
+    column = SORT_COLUMNS[sort]
+    id_column = models.Opportunity.id
+    backwards = cursor is not None and cursor["d"] == "prev"
+
+    if cursor is not None:
+        value, last_id = cursor["v"], cursor["id"]
+        if sort == "id":
+            condition = id_column < last_id if backwards else id_column > last_id
+        else:
+            condition = _after(column, value, last_id, backwards)
+        query = query.filter(condition)
+    return query.order_by(*order_by(sort, backwards))
+
+
+def paginate(
+    query: Query, sort: str, limit: int, cursor_token: Optional[str] = None
+) -> Tuple[List[Any], Optional[str], Optional[str]]:
+    """Return one page of ``query`` plus the next and previous cursors.
+
+    One extra row is fetched to find out whether another page exists in the
+    direction of travel, so no ``COUNT`` is needed.
+    """
+    cursor = decode_cursor(cursor_token) if cursor_token else None
+    if cursor is not None:
+        sort = cursor["s"]
+    if sort not in SORT_COLUMNS:
+        raise InvalidCursor(f"Unsupported sort key: {sort}")
+
+    rows = _seek(query, sort, cursor).limit(limit + 1).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    backwards = cursor is not None and cursor["d"] == "prev"
+    if backwards:
+        rows.reverse()
+    if not rows:
+        return rows, None, None
+
+    if backwards:
+        has_next, has_prev = True, has_more
+    else:
+        has_next, has_prev = has_more, cursor is not None
+    next_cursor = encode_cursor(sort, rows[-1], "next") if has_next else None
+    prev_cursor = encode_cursor(sort, rows[0], "prev") if has_prev else None
+    return rows, next_cursor, prev_cursor
+
+
+def estimate_count(db: Session, model) -> int:
+    """Return a cheap row-count estimate for ``model``'s table.
+
+    PostgreSQL uses the planner statistics and SQLite the ``ANALYZE`` results
+    when present. Otherwise the id range is used, which is an index lookup but
+    overcounts when rows have been deleted.
+    """
+    table = model.__tablename__
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        estimate = db.execute(
+            text("SELECT reltuples::bigint FROM pg_class WHERE relname = :t"), {"t": table}
+        ).scalar()
+        if estimate is not None and estimate >= 0:
+            return int(estimate)
+    elif dialect == "sqlite":
+        has_stats = db.execute(
+            text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'sqlite_stat1'")
+        ).scalar()
+        if has_stats:
+            stat = db.execute(
+                text("SELECT stat FROM sqlite_stat1 WHERE tbl = :t LIMIT 1"), {"t": table}
+            ).scalar()
+            if stat:
+                return int(str(stat).split()[0])
+
+    low, high = db.query(func.min(model.id), func.max(model.id)).one()
+    if low is None:
+        return 0
+    return high - low + 1
@@ -1,33 +1,185 @@
-"""Populate database with sample data in an idempotent way.
+"""Populate the database with sample or generated data in an idempotent way.
 
-Running this script multiple times will not create duplicate
-``Opportunity`` records. Each opportunity is looked up by its title
-before insertion and updated in place if it already exists.
+Run without arguments to upsert the two fixed sample opportunities. Pass
+``--opportunities`` to generate a large synthetic data set instead::
+
+    python populate_sample_data.py --opportunities 1000000 --users 1000 --seed 7 \\
+        --tam-distribution lognormal:14,1.5 --growth-distribution uniform:0,30
+
+Rows are written with chunked ``INSERT ... ON CONFLICT(title) DO UPDATE``
+statements, so running the script again with the same arguments updates the
+same rows instead of creating duplicates. Generated values only depend on the
+seed, and rows whose values did not change are left untouched. The portfolio
+statistics are rebuilt once the rows are written.
 """
 
-from typing import List, Dict
+from typing import Callable, Dict, Iterable, List
+import argparse
+import random
+import sys
+import time
 
-from sqlalchemy.orm import Session
+from sqlalchemy import or_, select
+from sqlalchemy.engine import Connection
 
-from database import SessionLocal, engine
+from database import dialect_insert, engine
 import models
+import portfolio_stats
+
+models.sync_schema(engine)
+
+DISTRIBUTIONS = {
+    "lognormal": lambda rng, a, b: rng.lognormvariate(a, b),
+    "normal": lambda rng, a, b: rng.gauss(a, b),
+    "uniform": lambda rng, a, b: rng.uniform(a, b),
+}
 
-models.Base.metadata.create_all(bind=engine)
+_OPPORTUNITY_FIELDS = (
+    "market_description",
+    "tam_estimate",
+    "growth_rate",
+    "consumer_insight",
+    "hypothesis",
+    "user_id",
+)
 
 
-def _upsert_opportunity(session: Session, data: Dict) -> None:
-    """Insert or update an opportunity based on its title.
+def upsert_users(conn: Connection, names: List[str]) -> Dict[str, int]:
+    """Insert any missing users and return a mapping of name to id."""
+    insert = dialect_insert(conn)
+    if names:
+        statement = insert(models.User).on_conflict_do_nothing(index_elements=["name"])
+        conn.execute(statement, [{"name": name} for name in names])
+    ids: Dict[str, int] = {}
+    for start in range(0, len(names), 500):
+        chunk = names[start:start + 500]
+        rows = conn.execute(
+            select(models.User.name, models.User.id).where(models.User.name.in_(chunk))
+        )
+        ids.update((name, user_id) for name, user_id in rows)
+    return ids
 
-    ``session.merge`` attaches the object to the current session and performs
-    an update if it already exists; otherwise it inserts a new row.
+
+def upsert_opportunities(conn: Connection, rows: List[Dict]) -> None:
+    """Insert or update opportunities by title.
+
+    Existing rows are only rewritten, and their ``version`` bumped, when one
+    of their values actually changed.
     """
-    existing = session.query(models.Opportunity).filter_by(title=data["title"]).one_or_none()
-    if existing:
-        for key, value in data.items():
-            setattr(existing, key, value)
-        session.merge(existing)
-    else:
-        session.merge(models.Opportunity(**data))
+    if not rows:
+        return
+    insert = dialect_insert(conn)
+    statement = insert(models.Opportunity)
+    excluded = statement.excluded
+    table = models.Opportunity.__table__
+    statement = statement.on_conflict_do_update(
+        index_elements=["title"],
+        set_={
+            **{field: excluded[field] for field in _OPPORTUNITY_FIELDS},
+            "version": table.c.version + 1,
+            "updated_at": models.utcnow(),
+        },
+        where=or_(
+            *(table.c[field].is_distinct_from(excluded[field]) for field in _OPPORTUNITY_FIELDS)
+        ),
+    )
+    conn.execute(statement, rows)
+
+
+def parse_distribution(spec: str) -> Callable[[random.Random], float]:
+    """Parse ``name:a,b`` (for example ``lognormal:14,1.5``) into a sampler."""
+    name, _, params = spec.partition(":")
+    if name not in DISTRIBUTIONS:
+        raise argparse.ArgumentTypeError(
+            f"unknown distribution {name!r}; choose from {', '.join(DISTRIBUTIONS)}"
+        )
+    try:
+        a, b = (float(value) for value in params.split(","))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected {name}:a,b, got {spec!r}")
+    sample = DISTRIBUTIONS[name]
+    return lambda rng: sample(rng, a, b)
+
+
+def _secondary_indexes():
+    # The unique title index backs ON CONFLICT(title) and must stay in place.
+    return [index for index in models.Opportunity.__table__.indexes if not index.unique]
+
+
+def _generated_rows(
+    count: int,
+    user_ids: List[int],
+    seed: int,
+    tam: Callable[[random.Random], float],
+    growth: Callable[[random.Random], float],
+) -> Iterable[Dict]:
+    rng = random.Random(seed)
+    for i in range(count):
+        yield {
+            "title": f"Generated opportunity {i:09d}",
+            "market_description": f"Synthetic market segment {rng.randrange(10_000)}",
+            # The API requires tam_estimate > 0 and growth_rate >= 0.
+            "tam_estimate": round(max(tam(rng), 1.0), 2),
+            "growth_rate": round(max(growth(rng), 0.0), 3),
+            "consumer_insight": f"Synthetic consumer insight {rng.randrange(10_000)}",
+            "hypothesis": f"Synthetic hypothesis {rng.randrange(10_000)}",
+            "user_id": user_ids[rng.randrange(len(user_ids))],
+        }
+
+
+def generate(
+    opportunities: int,
+    users: int = 100,
+    seed: int = 0,
+    tam_distribution: str = "lognormal:14,1.5",
+    growth_distribution: str = "uniform:0,30",
+    chunk_size: int = 10_000,
+    rebuild_indexes: bool = False,
+    log: Callable[[str], None] = print,
+) -> None:
+    """Upsert ``users`` generated users and ``opportunities`` generated rows.
+
+    Each chunk is committed separately. With ``rebuild_indexes`` the non-unique
+    opportunity indexes are dropped for the load and recreated afterwards,
+    which is much faster for large loads into a mostly empty table.
+    """
+    tam = parse_distribution(tam_distribution)
+    growth = parse_distribution(growth_distribution)
+    with engine.begin() as conn:
+        names = [f"Generated user {i}" for i in range(max(users, 1))]
+        ids = upsert_users(conn, names)
+    user_ids = [ids[name] for name in names]
+
+    indexes = _secondary_indexes() if rebuild_indexes else []
+    if indexes:
+        with engine.begin() as conn:
+            for index in indexes:
+                index.drop(conn, checkfirst=True)
+
+    start = time.perf_counter()
+    try:
+        chunk: List[Dict] = []
+        written = 0
+        for row in _generated_rows(opportunities, user_ids, seed, tam, growth):
+            chunk.append(row)
+            if len(chunk) >= chunk_size:
+                with engine.begin() as conn:
+                    upsert_opportunities(conn, chunk)
+                written += len(chunk)
+                chunk = []
+                log(f"{written}/{opportunities} rows ({written / (time.perf_counter() - start):.0f}/s)")
+        if chunk:
+            with engine.begin() as conn:
+                upsert_opportunities(conn, chunk)
+    finally:
+        if indexes:
+            log("rebuilding indexes")
+            with engine.begin() as conn:
+                for index in indexes:
+                    index.create(conn, checkfirst=True)
+    with engine.begin() as conn:
+        portfolio_stats.rebuild(conn)
+    log(f"done: {opportunities} opportunities in {time.perf_counter() - start:.1f}s")
 
 
 def populate() -> None:
@@ -36,15 +188,9 @@ def populate() -> None:
     Because each record is upserted by title, re-running this function is safe
     and will not result in duplicate rows or integrity errors.
     """
-    session: Session = SessionLocal()
-    try:
+    with engine.begin() as conn:
         # Ensure a default user exists
-        user = session.query(models.User).filter_by(name="Sample User").one_or_none()
-        if not user:
-            user = models.User(name="Sample User")
-            session.add(user)
-            session.commit()
-            session.refresh(user)
+        user_id = upsert_users(conn, ["Sample User"])["Sample User"]
 
         sample_opportunities: List[Dict] = [
             {
@@ -54,7 +200,7 @@ def populate() -> None:
                 "growth_rate": 7.5,
                 "consumer_insight": "Consumers seek sustainable alternatives",
                 "hypothesis": "A durable bottle with filter will attract buyers",
-                "user_id": user.id,
+                "user_id": user_id,
             },
             {
                 "title": "Smart Home Energy Monitor",
@@ -63,17 +209,48 @@ def populate() -> None:
                 "growth_rate": 10.0,
                 "consumer_insight": "People want to reduce energy bills",
                 "hypothesis": "Real-time usage alerts can save cost",
-                "user_id": user.id,
+                "user_id": user_id,
             },
         ]
 
-        for opp in sample_opportunities:
-            _upsert_opportunity(session, opp)
+        upsert_opportunities(conn, sample_opportunities)
+        portfolio_stats.rebuild(conn)
 
-        session.commit()
-    finally:
-        session.close()
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Seed the database with sample or synthetic data.")
+    parser.add_argument("--opportunities", type=int, default=0,
+                        help="number of synthetic opportunities (default: only the fixed samples)")
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--tam-distribution", default="lognormal:14,1.5",
+                        help="lognormal|normal|uniform:a,b")
+    parser.add_argument("--growth-distribution", default="uniform:0,30",
+                        help="lognormal|normal|uniform:a,b")
+    parser.add_argument("--chunk-size", type=int, default=10_000)
+    parser.add_argument("--rebuild-indexes", action="store_true",
+                        help="drop secondary indexes during the load and rebuild them afterwards")
+    args = parser.parse_args(argv)
+
+    if args.opportunities <= 0:
+        populate()
+        return 0
+    for spec in (args.tam_distribution, args.growth_distribution):
+        try:
+            parse_distribution(spec)
+        except argparse.ArgumentTypeError as exc:
+            parser.error(str(exc))
+    generate(
+        args.opportunities,
+        users=args.users,
+        seed=args.seed,
+        tam_distribution=args.tam_distribution,
+        growth_distribution=args.growth_distribution,
+        chunk_size=args.chunk_size,
+        rebuild_indexes=args.rebuild_indexes,
+    )
+    return 0
 
 
 if __name__ == "__main__":
-    populate()
+    sys.exit(main())
@@ -0,0 +1,261 @@
+"""Portfolio statistics for ``GET /opportunities/stats``.
+
+The ``portfolio_stats`` table holds one row per user and growth-rate bucket
+with the number of opportunities and their summed TAM. Every ORM flush that
+adds, changes or deletes opportunities applies the difference to those rows
+in the same transaction, and bulk inserts record their rows explicitly, so
+reading the statistics never touches ``opportunities``.
+
+Writers that bypass both, such as the upserts in ``populate_sample_data``,
+call ``rebuild`` afterwards. Run ``python portfolio_stats.py check`` to
+compare the table against a full scan, or ``rebuild`` to recompute it.
+"""
+
+from bisect import bisect_right
+from collections import defaultdict
+from typing import Dict, Iterable, List, Mapping, Optional, Tuple
+import argparse
+import math
+import sys
+
+from sqlalchemy import case, delete, event, exists, func, inspect, select, tuple_, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from database import UPSERT_DIALECTS, dialect_insert
+import models
+
+# Lower edges of the growth-rate buckets; the last bucket is open-ended.
+GROWTH_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+# Bucket for opportunities without a growth rate.
+NO_GROWTH = -1
+
+_TRACKED = ("user_id", "tam_estimate", "growth_rate")
+
+Key = Tuple[int, int]
+
+
+def growth_bucket(growth_rate: Optional[float]) -> int:
+    if growth_rate is None:
+        return NO_GROWTH
+    return max(bisect_right(GROWTH_BUCKETS, growth_rate) - 1, 0)
+
+
+def _bucket_expression(column):
+    whens = [(column.is_(None), NO_GROWTH)]
+    whens += [(column < edge, index) for index, edge in enumerate(GROWTH_BUCKETS[1:])]
+    return case(*whens, else_=len(GROWTH_BUCKETS) - 1)
+
+
+class Deltas:
+    """Accumulated ``(count, tam)`` changes keyed by ``(user_id, bucket)``."""
+
+    def __init__(self) -> None:
+        self._changes: Dict[Key, List[float]] = defaultdict(lambda: [0, 0.0])
+
+    def add(self, user_id: int, tam: Optional[float], growth: Optional[float], sign: int) -> None:
+        change = self._changes[(user_id, growth_bucket(growth))]
+        change[0] += sign
+        change[1] += sign * (tam or 0.0)
+
+    def __bool__(self) -> bool:
+        return any(count or tam for count, tam in self._changes.values())
+
+    def apply(self, conn) -> None:
+        """Add the changes to ``portfolio_stats`` and drop rows that reach zero."""
+        changes = [
+            {"user_id": user_id, "growth_bucket": bucket, "opportunities": count, "tam_total": tam}
+            for (user_id, bucket), (count, tam) in self._changes.items()
+            if count or tam
+        ]
+        if not changes:
+            return
+        table = models.PortfolioStat.__table__
+        if conn.dialect.name in UPSERT_DIALECTS:
+            statement = dialect_insert(conn)(table)
+            statement = statement.on_conflict_do_update(
+                index_elements=["user_id", "growth_bucket"],
+                set_={
+                    "opportunities": table.c.opportunities + statement.excluded.opportunities,
+                    "tam_total": table.c.tam_total + statement.excluded.tam_total,
+                },
+            )
+            conn.execute(statement, changes)
+        else:
+            for change in changes:
+                _update_or_insert(conn, table, change)
+        shrunk = [(c["user_id"], c["growth_bucket"]) for c in changes if c["opportunities"] < 0]
+        if shrunk:
+            conn.execute(
+                delete(table).where(
+                    tuple_(table.c.user_id, table.c.growth_bucket).in_(shrunk),
+                    table.c.opportunities <= 0,
+                )
+            )
+
+
+def _update_or_insert(conn, table, change: dict) -> None:
+    # Portable upsert for dialects without ``ON CONFLICT``, such as MySQL.
+    # Inserting in a savepoint lets a concurrent insert of the same row fall
+    # back to the update instead of failing the flush.
+    key = (table.c.user_id == change["user_id"], table.c.growth_bucket == change["growth_bucket"])
+    increment = update(table).where(*key).values(
+        opportunities=table.c.opportunities + change["opportunities"],
+        tam_total=table.c.tam_total + change["tam_total"],
+    )
+    if conn.execute(increment).rowcount:
+        return
+    try:
+        with conn.begin_nested():
+            conn.execute(table.insert(), change)
+    except IntegrityError:
+        conn.execute(increment)
+
+
+def record_inserts(conn, rows: Iterable[Mapping]) -> None:
+    """Count rows written with Core ``INSERT`` statements that skip the ORM."""
+    deltas = Deltas()
+    for row in rows:
+        deltas.add(row["user_id"], row.get("tam_estimate"), row.get("growth_rate"), 1)
+    deltas.apply(conn)
+
+
+def _previous(state, name: str):
+    history = state.attrs[name].history
+    if history.deleted:
+        return history.deleted[0]
+    return getattr(state.obj(), name)
+
+
+@event.listens_for(Session, "after_flush")
+def _track_flush(session: Session, flush_context) -> None:
+    # ``after_flush`` still sees the pre-flush new/dirty/deleted sets and
+    # attribute history, and new rows already have their foreign keys.
+    deltas = Deltas()
+    for obj in session.new:
+        if isinstance(obj, models.Opportunity):
+            deltas.add(obj.user_id, obj.tam_estimate, obj.growth_rate, 1)
+    for obj in session.deleted:
+        if isinstance(obj, models.Opportunity):
+            state = inspect(obj)
+            old = [_previous(state, name) for name in _TRACKED]
+            deltas.add(*old, -1)
+    for obj in session.dirty:
+        if isinstance(obj, models.Opportunity) and obj not in session.deleted:
+            state = inspect(obj)
+            old = [_previous(state, name) for name in _TRACKED]
+            new = [getattr(obj, name) for name in _TRACKED]
+            if old != new:
+                deltas.add(*old, -1)
+                deltas.add(*new, 1)
+    if deltas:
+        deltas.apply(session.connection())
+
+
+def _aggregate_query():
+    opportunity = models.Opportunity
+    bucket = _bucket_expression(opportunity.growth_rate).label("growth_bucket")
+    return select(
+        opportunity.user_id,
+        bucket,
+        func.count().label("opportunities"),
+        func.coalesce(func.sum(opportunity.tam_estimate), 0.0).label("tam_total"),
+    ).group_by(opportunity.user_id, bucket)
+
+
+def rebuild(conn) -> None:
+    """Recompute ``portfolio_stats`` from a full scan of ``opportunities``."""
+    table = models.PortfolioStat.__table__
+    conn.execute(delete(table))
+    conn.execute(
+        table.insert().from_select(
+            ["user_id", "growth_bucket", "opportunities", "tam_total"], _aggregate_query()
+        )
+    )
+
+
+def check(conn) -> List[dict]:
+    """Compare ``portfolio_stats`` with a full scan and return the differences.
+
+    Each difference holds the ``user_id`` and ``growth_bucket`` with the
+    ``expected`` and ``actual`` ``(opportunities, tam_total)``. TAM totals are
+    compared with a relative tolerance since they are summed incrementally.
+    """
+    stats = models.PortfolioStat
+    actual = {
+        (row.user_id, row.growth_bucket): (row.opportunities, row.tam_total)
+        for row in conn.execute(select(stats))
+    }
+    expected = {
+        (row.user_id, row.growth_bucket): (row.opportunities, row.tam_total)
+        for row in conn.execute(_aggregate_query())
+    }
+    differences = []
+    for key in sorted(actual.keys() | expected.keys()):
+        want, got = expected.get(key, (0, 0.0)), actual.get(key, (0, 0.0))
+        if want[0] != got[0] or not math.isclose(want[1], got[1], rel_tol=1e-9, abs_tol=1e-6):
+            differences.append(
+                {"user_id": key[0], "growth_bucket": key[1], "expected": want, "actual": got}
+            )
+    return differences
+
+
+def ensure(bind) -> None:
+    """Rebuild the statistics if the table is empty but opportunities exist.
+
+    Covers databases created before ``portfolio_stats`` existed.
+    """
+    with bind.begin() as conn:
+        has_stats = conn.execute(select(exists().select_from(models.PortfolioStat))).scalar()
+        if not has_stats and conn.execute(select(exists().select_from(models.Opportunity))).scalar():
+            rebuild(conn)
+
+
+def summary(conn) -> dict:
+    """Return the totals, per-user figures and growth distribution."""
+    users: Dict[int, List[float]] = defaultdict(lambda: [0, 0.0])
+    buckets: Dict[int, int] = defaultdict(int)
+    for row in conn.execute(select(models.PortfolioStat)):
+        users[row.user_id][0] += row.opportunities
+        users[row.user_id][1] += row.tam_total
+        buckets[row.growth_bucket] += row.opportunities
+
+    distribution = [
+        {
+            "min": edge,
+            "max": GROWTH_BUCKETS[index + 1] if index + 1 < len(GROWTH_BUCKETS) else None,
+            "opportunities": buckets[index],
+        }
+        for index, edge in enumerate(GROWTH_BUCKETS)
+    ]
+    return {
+        "opportunities": sum(count for count, _ in users.values()),
+        "tam_total": sum(tam for _, tam in users.values()),
+        "by_user": [
+            {"user_id": user_id, "opportunities": count, "tam_total": tam}
+            for user_id, (count, tam) in sorted(users.items())
+        ],
+        "growth_distribution": distribution,
+        "growth_unknown": buckets[NO_GROWTH],
+    }
+
+
+def main(argv=None) -> int:
+    from database import engine
+
+    parser = argparse.ArgumentParser(description="Check or rebuild the portfolio statistics.")
+    parser.add_argument("action", choices=["check", "rebuild"])
+    args = parser.parse_args(argv)
+    with engine.begin() as conn:
+        if args.action == "rebuild":
+            rebuild(conn)
+            return 0
+        differences = check(conn)
+    for difference in differences:
+        print(difference)
+    print(f"{len(differences)} difference(s)")
+    return 1 if differences else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
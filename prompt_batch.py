@@ -0,0 +1,130 @@
+"""Batch prompt rendering for ``POST /prompt/batch``.
+
+Opportunities are fetched ``chunk_size`` at a time, either with one ``IN``
+query per chunk of requested ids or by streaming a filtered query, and each
+chunk is rendered and written out as NDJSON before the next one is read. This
+keeps memory bounded however many prompts are requested.
+
+Rendering can optionally be spread over a shared process pool. Workers receive
+the template sources with their version and build the same environment as the
+registry once per version, so includes, inheritance and options match.
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+from threading import Lock
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+import json
+
+from jinja2 import Environment, Template
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+import models
+from template_registry import create_environment, prompt_context
+
+_COLUMNS = (
+    models.Opportunity.id,
+    models.Opportunity.title,
+    models.Opportunity.market_description,
+    models.Opportunity.tam_estimate,
+    models.Opportunity.growth_rate,
+    models.Opportunity.consumer_insight,
+    models.Opportunity.hypothesis,
+)
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = Lock()
+
+# The template environment inside a worker process, for the latest version.
+_worker_environment: Optional[Tuple[str, Environment]] = None
+
+
+def _render_in_worker(
+    key: Tuple[str, str], sources: Dict[str, str], contexts: List[dict]
+) -> List[str]:
+    global _worker_environment
+    version, name = key
+    if _worker_environment is None or _worker_environment[0] != version:
+        _worker_environment = (version, create_environment(sources))
+    template = _worker_environment[1].get_template(name)
+    return [template.render(**context) for context in contexts]
+
+
+def get_pool(workers: int) -> ProcessPoolExecutor:
+    """Return the shared render pool, creating it on first use."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=workers)
+        return _pool
+
+
+def shutdown_pool() -> None:
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(cancel_futures=True)
+            _pool = None
+
+
+def _iter_id_chunks(db: Session, ids: Sequence[int], chunk_size: int):
+    for start in range(0, len(ids), chunk_size):
+        chunk = ids[start:start + chunk_size]
+        rows = db.execute(select(*_COLUMNS).where(models.Opportunity.id.in_(chunk)))
+        found = {row.id: row for row in rows}
+        yield [(opportunity_id, found.get(opportunity_id)) for opportunity_id in chunk]
+
+
+def _iter_filter_chunks(db: Session, user_id: Optional[int], chunk_size: int):
+    statement = select(*_COLUMNS).order_by(models.Opportunity.id)
+    if user_id is not None:
+        statement = statement.where(models.Opportunity.user_id == user_id)
+    result = db.execute(statement.execution_options(yield_per=chunk_size))
+    for partition in result.partitions():
+        yield [(row.id, row) for row in partition]
+
+
+def iter_rendered(
+    session_factory: Callable[[], Session],
+    template: Template,
+    sources: Dict[str, str],
+    key: Tuple[str, str],
+    ids: Optional[Sequence[int]] = None,
+    user_id: Optional[int] = None,
+    chunk_size: int = 500,
+    workers: int = 0,
+) -> Iterator[str]:
+    """Yield NDJSON blocks of ``{"id", "prompt"}`` or ``{"id", "error"}`` lines.
+
+    With ``workers`` > 0 each chunk is split across the shared process pool;
+    otherwise the pre-compiled ``template`` renders in the calling thread.
+    """
+    dumps = json.JSONEncoder(separators=(",", ":")).encode
+    db = session_factory()
+    try:
+        if ids is not None:
+            chunks = _iter_id_chunks(db, ids, chunk_size)
+        else:
+            chunks = _iter_filter_chunks(db, user_id, chunk_size)
+        for chunk in chunks:
+            present = [row for _, row in chunk if row is not None]
+            contexts = [prompt_context(row) for row in present]
+            if workers > 0 and len(contexts) > 1:
+                pool = get_pool(workers)
+                step = -(-len(contexts) // workers)
+                parts = [contexts[i:i + step] for i in range(0, len(contexts), step)]
+                futures = [pool.submit(_render_in_worker, key, sources, part) for part in parts]
+                prompts = iter([prompt for f in futures for prompt in f.result()])
+            else:
+                prompts = iter([template.render(**context) for context in contexts])
+
+            lines = []
+            for opportunity_id, row in chunk:
+                if row is None:
+                    line = {"id": opportunity_id, "error": "Opportunity not found"}
+                else:
+                    line = {"id": opportunity_id, "prompt": next(prompts)}
+                lines.append(dumps(line) + "\n")
+            yield "".join(lines)
+    finally:
+        db.close()
@@ -0,0 +1,140 @@
+"""Size-bounded LRU cache of rendered prompts.
+
+Entries are keyed on ``(opportunity_id, template_name)`` and tagged with the
+template version, so editing ``prompt_templates.json`` drops every cached
+prompt. Writes to an opportunity call ``invalidate``, which also bumps a write
+generation: a render that started before any write cannot store its possibly
+stale result afterwards.
+"""
+
+from collections import OrderedDict
+from threading import Lock
+from typing import Dict, Optional, Set, Tuple
+
+from prometheus_client import CollectorRegistry, Counter, Gauge
+
+import multiprocess_metrics
+
+Key = Tuple[int, str]
+
+
+class PromptCache:
+    def __init__(self, maxsize: int, registry: Optional[CollectorRegistry] = None) -> None:
+        self.maxsize = maxsize
+        self._entries: "OrderedDict[Key, str]" = OrderedDict()
+        self._by_opportunity: Dict[int, Set[str]] = {}
+        self._generation = 0
+        self._version: Optional[str] = None
+        self._hit_count = 0
+        self._lookup_count = 0
+        self._lock = Lock()
+        self.hits = Counter(
+            "prompt_cache_hits_total", "Rendered prompt cache hits", registry=registry
+        )
+        self.misses = Counter(
+            "prompt_cache_misses_total", "Rendered prompt cache misses", registry=registry
+        )
+        self.evictions = Counter(
+            "prompt_cache_evictions_total",
+            "Rendered prompts evicted because the cache was full",
+            registry=registry,
+        )
+        self.invalidations = Counter(
+            "prompt_cache_invalidations_total",
+            "Rendered prompts dropped because the opportunity or templates changed",
+            registry=registry,
+        )
+        self.size = Gauge(
+            "prompt_cache_size",
+            "Rendered prompts currently cached",
+            registry=registry,
+            multiprocess_mode="livesum",
+        )
+        # A per-process ratio cannot be merged across workers; in multiprocess
+        # mode derive it from the hit and miss counters instead.
+        if not multiprocess_metrics.ENABLED:
+            self.hit_ratio = Gauge(
+                "prompt_cache_hit_ratio",
+                "Fraction of rendered prompt lookups served from the cache",
+                registry=registry,
+            )
+            self.hit_ratio.set_function(
+                lambda: self._hit_count / self._lookup_count if self._lookup_count else 0.0
+            )
+
+    def _remove(self, key: Key) -> None:
+        # Caller holds the lock.
+        del self._entries[key]
+        names = self._by_opportunity[key[0]]
+        names.discard(key[1])
+        if not names:
+            del self._by_opportunity[key[0]]
+
+    def _check_version(self, version: str) -> None:
+        # Caller holds the lock.
+        if version != self._version:
+            self.invalidations.inc(len(self._entries))
+            self._entries.clear()
+            self._by_opportunity.clear()
+            self._version = version
+            self.size.set(0)
+
+    def generation(self) -> int:
+        """Return a token to pass to ``put`` for a render starting now."""
+        return self._generation
+
+    def get(self, opportunity_id: int, template_name: str, version: str) -> Optional[str]:
+        key = (opportunity_id, template_name)
+        with self._lock:
+            self._check_version(version)
+            prompt = self._entries.get(key)
+            self._lookup_count += 1
+            if prompt is not None:
+                self._entries.move_to_end(key)
+                self._hit_count += 1
+        if prompt is None:
+            self.misses.inc()
+        else:
+            self.hits.inc()
+        return prompt
+
+    def put(
+        self,
+        opportunity_id: int,
+        template_name: str,
+        version: str,
+        prompt: str,
+        generation: int,
+    ) -> None:
+        if self.maxsize <= 0:
+            return
+        key = (opportunity_id, template_name)
+        with self._lock:
+            self._check_version(version)
+            if generation != self._generation:
+                return
+            self._entries[key] = prompt
+            self._entries.move_to_end(key)
+            self._by_opportunity.setdefault(opportunity_id, set()).add(template_name)
+            while len(self._entries) > self.maxsize:
+                self._remove(next(iter(self._entries)))
+                self.evictions.inc()
+            self.size.set(len(self._entries))
+
+    def invalidate(self, opportunity_id: int) -> None:
+        """Drop every cached prompt for ``opportunity_id``."""
+        with self._lock:
+            self._generation += 1
+            names = self._by_opportunity.get(opportunity_id, ())
+            stale = [(opportunity_id, name) for name in names]
+            for key in stale:
+                self._remove(key)
+            self.size.set(len(self._entries))
+        self.invalidations.inc(len(stale))
+
+    def clear(self) -> None:
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+            self._by_opportunity.clear()
+            self.size.set(0)
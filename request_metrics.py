@@ -0,0 +1,107 @@
+"""Request metrics and access logging as a pure ASGI middleware.
+
+``BaseHTTPMiddleware`` runs every request through an extra task and memory
+stream pair. This middleware only wraps ``send`` to capture the status code,
+so the per-request cost is a couple of function calls plus the metric updates.
+It also collects the request's SQL statement count and time (see
+``sql_metrics``) and reports them in a ``Server-Timing`` header.
+"""
+
+from typing import Iterable, Optional
+import logging
+import random
+import time
+
+from prometheus_client import Counter, Histogram
+
+import sql_metrics
+
+logger = logging.getLogger("uvicorn")
+
+
+class MetricsMiddleware:
+    """Count requests and observe latency, labelled by route template.
+
+    Requests to ``exclude`` paths are passed straight through. A fraction
+    ``access_log_sample_rate`` of the remaining requests is logged at INFO;
+    the default of 0 disables access logging. With ``db_queries`` and
+    ``db_latency`` the SQL statements of each request are counted and timed,
+    checked against the route's query budget and, with ``server_timing``,
+    sent as ``Server-Timing: db;dur=<ms>;desc="<n> queries"``.
+    """
+
+    def __init__(
+        self,
+        app,
+        request_count: Counter,
+        request_latency: Histogram,
+        exclude: Iterable[str] = (),
+        access_log_sample_rate: float = 0.0,
+        db_queries: Optional[Histogram] = None,
+        db_latency: Optional[Histogram] = None,
+        server_timing: bool = False,
+    ) -> None:
+        self.app = app
+        self.request_count = request_count
+        self.request_latency = request_latency
+        self.exclude = frozenset(exclude)
+        self.access_log_sample_rate = access_log_sample_rate
+        self.db_queries = db_queries
+        self.db_latency = db_latency
+        self.server_timing = server_timing and db_queries is not None
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http" or scope["path"] in self.exclude:
+            await self.app(scope, receive, send)
+            return
+
+        status_code: Optional[int] = None
+        stats = None
+        stats_token = None
+        # Statement count when the budget was checked at the response start.
+        checked: Optional[int] = None
+        if self.db_queries is not None:
+            stats = sql_metrics.QueryStats()
+            stats_token = sql_metrics.current.set(stats)
+
+        async def send_with_status(message) -> None:
+            nonlocal status_code, checked
+            if message["type"] == "http.response.start":
+                matched = scope.get("route")
+                if stats is not None and matched is not None:
+                    # Before anything is sent, so that in strict mode the
+                    # overrun fails the request with a plain 500.
+                    checked = stats.count
+                    sql_metrics.check_budget(getattr(matched, "endpoint", None), matched.path, stats)
+                status_code = message["status"]
+                if self.server_timing:
+                    queries = "query" if stats.count == 1 else "queries"
+                    timing = f'db;dur={stats.seconds * 1000:.2f};desc="{stats.count} {queries}"'
+                    headers = [*message.get("headers", ()), (b"server-timing", timing.encode())]
+                    message = {**message, "headers": headers}
+            await send(message)
+
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - start
+            # The router stores the matched route in the shared scope.
+            route = scope.get("route")
+            path = getattr(route, "path", scope["path"])
+            method = scope["method"]
+            status = str(status_code or 500)
+            self.request_count.labels(method, path, status).inc()
+            self.request_latency.labels(method, path).observe(elapsed)
+            if stats is not None:
+                sql_metrics.current.reset(stats_token)
+                self.db_queries.labels(method, path).observe(stats.count)
+                self.db_latency.labels(method, path).observe(stats.seconds)
+            rate = self.access_log_sample_rate
+            if rate > 0 and (rate >= 1 or random.random() < rate):
+                logger.info(
+                    "%s %s %s completed in %.4f seconds", method, scope["path"], status, elapsed
+                )
+        if checked is not None and stats.count > checked:
+            # Statements run while streaming the body; too late to fail the request.
+            sql_metrics.check_budget(getattr(route, "endpoint", None), path, stats, can_fail=False)
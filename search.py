@@ -0,0 +1,108 @@
+"""Full-text search over opportunities using the SQLite FTS5 index.
+
+User input is never passed to ``MATCH`` as-is: it is split into word tokens,
+each token is quoted, and all of them must match. Results are ordered by the
+BM25 ``rank`` and paged with an opaque ``(rank, id)`` cursor.
+
+Snippets are HTML: the matched text is HTML-escaped and only the ``<mark>``
+tags around the hits are markup. SQLite wraps the hits in random per-process
+markers, which stored text cannot forge, and they are swapped for the tags
+after escaping.
+"""
+
+from typing import List, Optional, Tuple
+import html
+import re
+import secrets
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from models import FTS_TABLE
+from pagination import InvalidCursor, decode_token, encode_token
+
+_OPPORTUNITY_COLUMNS = (
+    "id",
+    "title",
+    "market_description",
+    "tam_estimate",
+    "growth_rate",
+    "consumer_insight",
+    "hypothesis",
+    "user_id",
+)
+
+
+_HIT_START = f"\x02{secrets.token_hex(8)}\x03"
+_HIT_END = f"\x02{secrets.token_hex(8)}\x03"
+
+
+def render_snippet(raw: str) -> str:
+    """HTML-escape an FTS5 snippet and turn the hit markers into ``<mark>`` tags."""
+    return html.escape(raw).replace(_HIT_START, "<mark>").replace(_HIT_END, "</mark>")
+
+
+def match_expression(q: str) -> Optional[str]:
+    """Turn free text into an FTS5 query that ANDs the quoted word tokens.
+
+    Returns ``None`` if ``q`` contains no words.
+    """
+    tokens = re.findall(r"\w+", q)
+    if not tokens:
+        return None
+    return " ".join(f'"{token}"' for token in tokens)
+
+
+def _decode_search_cursor(token: str) -> Tuple[float, int]:
+    payload = decode_token(token)
+    try:
+        return float(payload["r"]), int(payload["id"])
+    except (KeyError, TypeError, ValueError):
+        raise InvalidCursor("Invalid cursor")
+
+
+def search_opportunities(
+    db: Session, q: str, limit: int, cursor: Optional[str] = None
+) -> Tuple[List[dict], Optional[str]]:
+    """Return ``(items, next_cursor)`` for the opportunities matching ``q``.
+
+    Each item holds the opportunity fields plus a highlighted ``snippet`` and
+    a ``score`` where higher is more relevant. Raises ``InvalidCursor`` for a
+    malformed cursor.
+    """
+    expression = match_expression(q)
+    if expression is None:
+        return [], None
+    params = {"q": expression, "limit": limit + 1, "start": _HIT_START, "end": _HIT_END}
+    after = ""
+    if cursor is not None:
+        params["rank"], params["id"] = _decode_search_cursor(cursor)
+        after = (
+            f"AND ({FTS_TABLE}.rank > :rank "
+            f"OR ({FTS_TABLE}.rank = :rank AND {FTS_TABLE}.rowid > :id))"
+        )
+    columns = ", ".join(f"o.{column}" for column in _OPPORTUNITY_COLUMNS)
+    statement = text(
+        f"SELECT {columns}, "
+        f"snippet({FTS_TABLE}, -1, :start, :end, '…', 12) AS snippet, "
+        f"{FTS_TABLE}.rank AS rank "
+        f"FROM {FTS_TABLE} JOIN opportunities AS o ON o.id = {FTS_TABLE}.rowid "
+        f"WHERE {FTS_TABLE} MATCH :q {after} "
+        f"ORDER BY {FTS_TABLE}.rank, {FTS_TABLE}.rowid "
+        f"LIMIT :limit"
+    )
+    rows = db.execute(statement, params).all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_token({"r": last.rank, "id": last.id})
+    items = [
+        {
+            **{column: getattr(row, column) for column in _OPPORTUNITY_COLUMNS},
+            "snippet": render_snippet(row.snippet),
+            "score": -row.rank,
+        }
+        for row in rows
+    ]
+    return items, next_cursor
@@ -1,6 +1,6 @@
 """Application configuration settings."""
 
-from typing import List
+from typing import List, Optional, Tuple
 import os
 
 
@@ -18,3 +18,119 @@ def _get_allowed_origins() -> List[str]:
 
 # Expose the configured origins as a constant for importers.
 ALLOWED_ORIGINS = _get_allowed_origins()
+
+
+def _get_int(name: str, default: int) -> int:
+    """Return the integer value of environment variable ``name``."""
+
+    return int(os.getenv(name, str(default)))
+
+
+def _get_float(name: str, default: float) -> float:
+    """Return the float value of environment variable ``name``."""
+
+    return float(os.getenv(name, str(default)))
+
+
+def _get_floats(name: str, default: Optional[Tuple[float, ...]]) -> Optional[Tuple[float, ...]]:
+    """Return the comma-separated floats in environment variable ``name``."""
+
+    raw = os.getenv(name)
+    if raw is None or not raw.strip():
+        return default
+    return tuple(float(value) for value in raw.split(",") if value.strip())
+
+
+def _get_list(name: str, default: str) -> List[str]:
+    """Return the comma-separated, non-empty values in environment variable ``name``."""
+
+    return [value.strip() for value in os.getenv(name, default).split(",") if value.strip()]
+
+
+def _get_bool(name: str, default: bool) -> bool:
+    """Return the boolean value of environment variable ``name``."""
+
+    return os.getenv(name, str(default)).strip().lower() in ("1", "true", "yes", "on")
+
+
+# Token-to-user cache used by ``get_current_user``. A size of 0 disables it.
+AUTH_CACHE_SIZE = _get_int("AUTH_CACHE_SIZE", 10_000)
+AUTH_CACHE_TTL = _get_float("AUTH_CACHE_TTL", 60.0)
+
+# Rows inserted per transaction by ``POST /opportunities/bulk``.
+BULK_CHUNK_SIZE = _get_int("BULK_CHUNK_SIZE", 500)
+
+# Group commit for ``POST /opportunities/``: concurrent creates are written
+# together, once ``GROUP_COMMIT_MAX_ROWS`` are queued or
+# ``GROUP_COMMIT_MAX_DELAY_MS`` after the first one, in one transaction.
+GROUP_COMMIT = _get_bool("GROUP_COMMIT", False)
+GROUP_COMMIT_MAX_ROWS = _get_int("GROUP_COMMIT_MAX_ROWS", 100)
+GROUP_COMMIT_MAX_DELAY_MS = _get_float("GROUP_COMMIT_MAX_DELAY_MS", 5.0)
+
+# PRAGMAs applied to every new SQLite connection. WAL lets readers proceed
+# while a writer holds the lock; NORMAL sync is durable across application
+# crashes in WAL mode and avoids an fsync per commit.
+SQLITE_JOURNAL_MODE = os.getenv("SQLITE_JOURNAL_MODE", "WAL")
+SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")
+SQLITE_MMAP_SIZE = _get_int("SQLITE_MMAP_SIZE", 256 * 1024 * 1024)
+# Negative values are in KiB, positive values in pages.
+SQLITE_CACHE_SIZE = _get_int("SQLITE_CACHE_SIZE", -64_000)
+SQLITE_BUSY_TIMEOUT_MS = _get_int("SQLITE_BUSY_TIMEOUT_MS", 5_000)
+
+# Connection pool settings. They apply to file-backed SQLite and to server
+# databases; in-memory SQLite keeps SQLAlchemy's single-connection pool.
+DB_POOL_SIZE = _get_int("DB_POOL_SIZE", 5)
+DB_MAX_OVERFLOW = _get_int("DB_MAX_OVERFLOW", 10)
+DB_POOL_TIMEOUT = _get_float("DB_POOL_TIMEOUT", 30.0)
+DB_POOL_RECYCLE = _get_int("DB_POOL_RECYCLE", -1)
+DB_POOL_PRE_PING = _get_bool("DB_POOL_PRE_PING", False)
+
+# Startup. Deployments that migrate the schema before rolling out can skip
+# the check for missing tables, columns and indexes; ``DB_POOL_WARM_CONNECTIONS``
+# connections are opened before the app starts serving.
+SKIP_SCHEMA_SYNC = _get_bool("SKIP_SCHEMA_SYNC", False)
+DB_POOL_WARM_CONNECTIONS = _get_int("DB_POOL_WARM_CONNECTIONS", DB_POOL_SIZE)
+
+# ``/readyz``: seconds between background database probes, and the share of
+# pool capacity in use at which the process reports itself not ready.
+HEALTH_PROBE_INTERVAL = _get_float("HEALTH_PROBE_INTERVAL", 5.0)
+READY_MAX_POOL_SATURATION = _get_float("READY_MAX_POOL_SATURATION", 1.0)
+
+# ``POST /prompt/batch``: ids fetched per IN query, the most ids one request
+# may list, and the size of the process pool used when a batch asks for
+# parallel rendering.
+PROMPT_BATCH_CHUNK_SIZE = _get_int("PROMPT_BATCH_CHUNK_SIZE", 500)
+PROMPT_BATCH_MAX_IDS = _get_int("PROMPT_BATCH_MAX_IDS", 10_000)
+PROMPT_RENDER_WORKERS = _get_int("PROMPT_RENDER_WORKERS", os.cpu_count() or 1)
+
+# Rendered prompts kept by ``GET /prompt/{id}``. A size of 0 disables it.
+PROMPT_CACHE_SIZE = _get_int("PROMPT_CACHE_SIZE", 10_000)
+
+# ``GET /opportunities/stream``: change events kept for clients resuming with
+# ``Last-Event-ID``, events buffered per stream before a slow client is
+# dropped, seconds between keep-alive comments on an idle stream, and the
+# lifetime in seconds of the single-use tickets that open a stream.
+CHANGE_FEED_BACKLOG = _get_int("CHANGE_FEED_BACKLOG", 1_000)
+CHANGE_FEED_BUFFER = _get_int("CHANGE_FEED_BUFFER", 100)
+CHANGE_FEED_HEARTBEAT = _get_float("CHANGE_FEED_HEARTBEAT", 15.0)
+STREAM_TICKET_TTL = _get_float("STREAM_TICKET_TTL", 30.0)
+
+# Concurrent identical reads of one opportunity or prompt share a single
+# fetch; waiters give up and run their own after this many seconds.
+SINGLE_FLIGHT_TIMEOUT = _get_float("SINGLE_FLIGHT_TIMEOUT", 5.0)
+
+# Request metrics middleware. ``REQUEST_LATENCY_BUCKETS`` is a comma-separated
+# list of histogram bucket bounds in seconds (Prometheus defaults if unset).
+# Access logging is off by default; a rate of 0.01 logs one request in 100.
+REQUEST_LATENCY_BUCKETS = _get_floats("REQUEST_LATENCY_BUCKETS", None)
+ACCESS_LOG_SAMPLE_RATE = _get_float("ACCESS_LOG_SAMPLE_RATE", 0.0)
+METRICS_EXCLUDE_PATHS = _get_list(
+    "METRICS_EXCLUDE_PATHS", "/metrics,/healthcheck,/livez,/readyz,/opportunities/stream"
+)
+
+# Per-request SQL statement counts and time. ``SERVER_TIMING`` sends them to
+# clients in a ``Server-Timing`` header; ``QUERY_BUDGET_STRICT`` makes a route
+# that runs more statements than its declared budget fail instead of logging.
+SQL_QUERY_BUCKETS = _get_floats("SQL_QUERY_BUCKETS", (0, 1, 2, 3, 5, 8, 13, 21, 50, 100))
+SERVER_TIMING = _get_bool("SERVER_TIMING", True)
+QUERY_BUDGET_STRICT = _get_bool("QUERY_BUDGET_STRICT", False)
@@ -0,0 +1,150 @@
+"""Coalescing of concurrent identical reads ("single flight").
+
+The first request for a key runs the fetch or render; requests for the same
+key that arrive while it is running wait for it and share its result or
+exception instead of running their own. A waiter that has not heard back
+within ``timeout`` seconds gives up and runs the call itself.
+
+Keys are tuples whose first element is the opportunity id. Writes call
+``invalidate(opportunity_id)`` after committing, which detaches the calls in
+flight for that opportunity: requests already waiting on them still get their
+result, which was read concurrently with the write, but every later request
+starts a fresh call and sees the write.
+
+The result is handed to every waiter as is, so calls should return plain
+data (a dict or the rendered text), never an ORM instance bound to the
+leader's session. An exception is re-raised in each waiter as its own copy,
+chained to the leader's, since one instance raised in several requests at
+once would share and overwrite its traceback.
+
+``SingleFlight`` is for sync handlers running in the threadpool and
+``AsyncSingleFlight`` for handlers on the event loop.
+"""
+
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+import asyncio
+import copy
+import threading
+
+from prometheus_client import Counter
+
+Key = Tuple[Hashable, ...]
+
+
+class _Flights:
+    """Bookkeeping and metrics shared by both variants.
+
+    ``calls`` is a counter labelled by flight name and ``result``: ``leader``
+    for calls that ran, ``coalesced`` for requests served by another
+    request's call and ``timeout`` for waiters that gave up and ran their own.
+    """
+
+    def __init__(self, name: str, calls: Counter, timeout: float) -> None:
+        self.name = name
+        self.timeout = timeout
+        self._leaders = calls.labels(name, "leader")
+        self._coalesced = calls.labels(name, "coalesced")
+        self._timeouts = calls.labels(name, "timeout")
+        self._calls: Dict[Key, Any] = {}
+
+    def _detach(self, opportunity_id: int) -> None:
+        for key in [key for key in self._calls if key[0] == opportunity_id]:
+            del self._calls[key]
+
+    def _finish(self, key: Key, call) -> None:
+        if self._calls.get(key) is call:
+            del self._calls[key]
+
+
+def _copy_error(error: BaseException) -> BaseException:
+    """Return a fresh instance of the leader's ``error`` for one waiter."""
+    try:
+        fresh = copy.copy(error)
+    except Exception:  # not reconstructible from its args
+        return error
+    fresh.__cause__ = error
+    fresh.__traceback__ = None
+    return fresh
+
+
+class _Call:
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self, done) -> None:
+        self.done = done
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight(_Flights):
+    def __init__(self, name: str, calls: Counter, timeout: float) -> None:
+        super().__init__(name, calls, timeout)
+        self._lock = threading.Lock()
+
+    def do(self, key: Key, fn: Callable[[], Any]) -> Any:
+        """Return ``fn()``, sharing one call among concurrent callers of ``key``."""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call(threading.Event())
+        if not leader:
+            if not call.done.wait(self.timeout):
+                self._timeouts.inc()
+                return fn()
+            self._coalesced.inc()
+            if call.error is not None:
+                raise _copy_error(call.error)
+            return call.result
+
+        self._leaders.inc()
+        try:
+            call.result = fn()
+        except BaseException as exc:
+            call.error = exc
+            raise
+        finally:
+            with self._lock:
+                self._finish(key, call)
+            call.done.set()
+        return call.result
+
+    def invalidate(self, opportunity_id: int) -> None:
+        """Make later requests for ``opportunity_id`` start a fresh call."""
+        with self._lock:
+            self._detach(opportunity_id)
+
+
+class AsyncSingleFlight(_Flights):
+    async def do(self, key: Key, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """Await ``fn()``, sharing one call among concurrent callers of ``key``."""
+        call = self._calls.get(key)
+        if call is not None:
+            try:
+                await asyncio.wait_for(call.done.wait(), self.timeout)
+            except asyncio.TimeoutError:
+                self._timeouts.inc()
+                return await fn()
+            if isinstance(call.error, asyncio.CancelledError):
+                # The leader's client went away; that is not this request's error.
+                return await fn()
+            self._coalesced.inc()
+            if call.error is not None:
+                raise _copy_error(call.error)
+            return call.result
+
+        call = self._calls[key] = _Call(asyncio.Event())
+        self._leaders.inc()
+        try:
+            call.result = await fn()
+        except BaseException as exc:
+            call.error = exc
+            raise
+        finally:
+            self._finish(key, call)
+            call.done.set()
+        return call.result
+
+    def invalidate(self, opportunity_id: int) -> None:
+        """Make later requests for ``opportunity_id`` start a fresh call."""
+        self._detach(opportunity_id)
@@ -0,0 +1,91 @@
+"""Per-request SQL statement counts and time.
+
+``instrument(engine)`` hooks the engine's cursor events. While a request is
+being handled, ``MetricsMiddleware`` keeps a ``QueryStats`` in a context
+variable; the hooks add every statement's duration to it, including
+statements run from the threadpool or through an async engine, since both
+inherit the request's context.
+
+Route handlers declare how many statements they expect with ``query_budget``.
+In strict mode, which tests switch on, a request that runs more statements
+than its budget raises ``QueryBudgetExceeded`` listing them, which catches
+per-row lookups creeping into a handler. Otherwise the overrun is logged.
+The budget is checked as the response starts, so a strict failure is a plain
+500 before any of the body is sent. Statements run while a streaming body is
+sent can no longer fail the request and are only logged.
+"""
+
+from contextvars import ContextVar
+from typing import Callable, List, Optional
+import logging
+import time
+
+from sqlalchemy import event
+
+logger = logging.getLogger("uvicorn")
+
+# Raise instead of logging when a request exceeds its query budget.
+strict = False
+
+
+class QueryBudgetExceeded(AssertionError):
+    """Raised in strict mode when a request runs more statements than declared."""
+
+
+class QueryStats:
+    __slots__ = ("count", "seconds", "statements")
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.seconds = 0.0
+        self.statements: List[str] = []
+
+
+current: ContextVar[Optional[QueryStats]] = ContextVar("query_stats", default=None)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    started = conn.info["query_start"].pop()
+    stats = current.get()
+    if stats is not None:
+        stats.count += 1
+        stats.seconds += time.perf_counter() - started
+        if strict:
+            stats.statements.append(statement)
+
+
+def instrument(sync_engine) -> None:
+    """Count and time the statements run on ``sync_engine``."""
+    if not event.contains(sync_engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(sync_engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(sync_engine, "after_cursor_execute", _after_cursor_execute)
+
+
+def query_budget(limit: int) -> Callable:
+    """Declare the most statements a route handler should run per request."""
+
+    def decorate(endpoint: Callable) -> Callable:
+        endpoint.query_budget = limit
+        return endpoint
+
+    return decorate
+
+
+def check_budget(endpoint, path: str, stats: QueryStats, can_fail: bool = True) -> None:
+    """Log, or raise in strict mode, if ``stats`` exceeds ``endpoint``'s budget.
+
+    With ``can_fail=False``, for a response that has already started, the
+    overrun is logged even in strict mode.
+    """
+    limit = getattr(endpoint, "query_budget", None)
+    if limit is None or stats.count <= limit:
+        return
+    message = f"{path} ran {stats.count} SQL statements, budget is {limit}"
+    if strict and can_fail:
+        listing = "\n".join(f"  {statement}" for statement in stats.statements)
+        raise QueryBudgetExceeded(f"{message}:\n{listing}")
+    logger.warning(message)
@@ -0,0 +1,41 @@
+"""Short-lived, single-use tickets for ``GET /opportunities/stream``.
+
+``EventSource`` cannot send an ``Authorization`` header, and the bearer token
+must not appear in URLs, where access logs, proxies and browser history keep
+it. Clients instead exchange their token for a ticket with an authenticated
+``POST /opportunities/stream/ticket`` and open the stream with ``?ticket=``.
+A ticket is redeemed on first use and expires after ``ttl`` seconds, so a
+logged URL is worthless. Tickets live in the process that issued them, like
+the change feed itself.
+"""
+
+from threading import Lock
+from typing import Dict, Optional, Tuple
+import secrets
+import time
+
+
+class StreamTickets:
+    def __init__(self, ttl: float) -> None:
+        self.ttl = ttl
+        self._tickets: Dict[str, Tuple[int, float]] = {}
+        self._lock = Lock()
+
+    def issue(self, user_id: int) -> str:
+        """Return a new ticket for ``user_id``."""
+        ticket = secrets.token_urlsafe(32)
+        now = time.monotonic()
+        with self._lock:
+            # Drop tickets that were never redeemed.
+            for key in [key for key, (_, expires_at) in self._tickets.items() if expires_at <= now]:
+                del self._tickets[key]
+            self._tickets[ticket] = (user_id, now + self.ttl)
+        return ticket
+
+    def redeem(self, ticket: str) -> Optional[int]:
+        """Return the ticket's user id and invalidate it, or ``None`` if not valid."""
+        with self._lock:
+            entry = self._tickets.pop(ticket, None)
+        if entry is None or entry[1] <= time.monotonic():
+            return None
+        return entry[0]
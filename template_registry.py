@@ -0,0 +1,165 @@
+"""Compiled prompt-template registry.
+
+Templates are read from ``prompt_templates.json`` once, compiled into a shared
+Jinja ``Environment`` and kept in memory. The file is only re-read when its
+modification time changes, and templates are only recompiled when the content
+hash changes as well. An in-memory bytecode cache means templates whose source
+did not change are not recompiled even after a reload.
+
+A reload never takes good templates down with a bad one: a template that no
+longer compiles keeps its last good version, and a file that is not valid
+JSON keeps the whole previous set. Either is logged.
+"""
+
+from dataclasses import dataclass
+from hashlib import sha256
+from pathlib import Path
+from threading import Lock
+from typing import Dict, Optional, Tuple
+import json
+import logging
+
+from jinja2 import BytecodeCache, DictLoader, Environment, Template, TemplateError
+
+logger = logging.getLogger("uvicorn")
+
+
+class MemoryBytecodeCache(BytecodeCache):
+    """Keep compiled template bytecode in a process-local dictionary."""
+
+    def __init__(self) -> None:
+        self._store: Dict[str, bytes] = {}
+
+    def load_bytecode(self, bucket) -> None:
+        data = self._store.get(bucket.key)
+        if data is not None:
+            bucket.bytecode_from_string(data)
+
+    def dump_bytecode(self, bucket) -> None:
+        self._store[bucket.key] = bucket.bytecode_to_string()
+
+    def clear(self) -> None:
+        self._store.clear()
+
+
+def create_environment(
+    sources: Dict[str, str], bytecode_cache: Optional[BytecodeCache] = None
+) -> Environment:
+    """The Jinja environment prompt templates are compiled in.
+
+    Render workers build theirs with this too, so ``include``/``extends`` and
+    every option behave as they do for ``GET /prompt``.
+    """
+    return Environment(
+        loader=DictLoader(sources),
+        bytecode_cache=bytecode_cache,
+        auto_reload=False,
+    )
+
+
+@dataclass(frozen=True)
+class _Snapshot:
+    mtime_ns: int
+    version: str
+    templates: Dict[str, Template]
+    sources: Dict[str, str]
+
+
+class TemplateRegistry:
+    """Serve pre-compiled templates and reload them when the file changes.
+
+    ``version`` is a short hash of the template file content and changes
+    whenever any template is edited, so callers can use it as a cache key.
+    """
+
+    def __init__(self, path: Path) -> None:
+        self.path = Path(path)
+        self._bytecode_cache = MemoryBytecodeCache()
+        self._snapshot: Optional[_Snapshot] = None
+        self._lock = Lock()
+
+    @property
+    def version(self) -> str:
+        return self._current().version
+
+    def get(self, name: str) -> Tuple[Optional[Template], str]:
+        """Return the compiled template called ``name`` and the file version.
+
+        The template is ``None`` if no template with that name exists. Raises
+        ``FileNotFoundError`` if the template file is missing.
+        """
+        snapshot = self._current()
+        return snapshot.templates.get(name), snapshot.version
+
+    def get_with_sources(self, name: str) -> Tuple[Optional[Template], Dict[str, str], str]:
+        """Like ``get`` but also return every template source from the same load."""
+        snapshot = self._current()
+        return snapshot.templates.get(name), snapshot.sources, snapshot.version
+
+    def reload(self) -> None:
+        """Force the next lookup to re-read the template file."""
+        with self._lock:
+            self._snapshot = None
+
+    def _current(self) -> _Snapshot:
+        mtime_ns = self.path.stat().st_mtime_ns
+        snapshot = self._snapshot
+        if snapshot is not None and snapshot.mtime_ns == mtime_ns:
+            return snapshot
+        with self._lock:
+            snapshot = self._snapshot
+            if snapshot is not None and snapshot.mtime_ns == mtime_ns:
+                return snapshot
+            self._snapshot = self._load(mtime_ns, snapshot)
+            return self._snapshot
+
+    def _load(self, mtime_ns: int, previous: Optional[_Snapshot]) -> _Snapshot:
+        raw = self.path.read_bytes()
+        version = sha256(raw).hexdigest()[:12]
+        if previous is not None and previous.version == version:
+            # Touched but not edited: keep the compiled templates.
+            return _Snapshot(mtime_ns, version, previous.templates, previous.sources)
+
+        try:
+            sources = json.loads(raw)
+            if not isinstance(sources, dict):
+                raise ValueError("expected an object of template sources")
+        except ValueError as exc:
+            logger.error("Keeping the previous templates, %s is not valid: %s", self.path, exc)
+            if previous is None:
+                return _Snapshot(mtime_ns, version, {}, {})
+            return _Snapshot(mtime_ns, previous.version, previous.templates, previous.sources)
+
+        env = create_environment(sources, self._bytecode_cache)
+        templates = {}
+        for name, source in list(sources.items()):
+            try:
+                if not isinstance(source, str):
+                    raise TemplateError("template source is not a string")
+                templates[name] = env.get_template(name)
+            except TemplateError as exc:
+                kept = previous is not None and name in previous.templates
+                logger.error(
+                    "Template %r does not compile, %s: %s",
+                    name,
+                    "keeping the last good version" if kept else "skipping it",
+                    exc,
+                )
+                if kept:
+                    templates[name] = previous.templates[name]
+                    sources[name] = previous.sources[name]
+                else:
+                    del sources[name]
+        return _Snapshot(mtime_ns, version, templates, sources)
+
+
+def prompt_context(opportunity) -> dict:
+    """Build the template variables for an opportunity or an opportunity row."""
+    return {
+        "title": opportunity.title or "",
+        "market_description": opportunity.market_description or "",
+        "tam_estimate": opportunity.tam_estimate or "",
+        "growth_rate": opportunity.growth_rate or "",
+        "consumer_insight": opportunity.consumer_insight or "",
+        "hypothesis": opportunity.hypothesis or "",
+    }
@@ -0,0 +1,13 @@
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+import sql_metrics
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def strict_query_budgets(monkeypatch):
+    """Fail any request that runs more SQL statements than its route declares."""
+    monkeypatch.setattr(sql_metrics, "strict", True)
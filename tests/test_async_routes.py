@@ -0,0 +1,98 @@
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+import pytest
+
+import async_routes
+import database
+import main
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    path = tmp_path / "async.db"
+    sync_engine = create_engine(f"sqlite:///{path}")
+    database.Base.metadata.create_all(bind=sync_engine)
+    sync_engine.dispose()
+    monkeypatch.setattr(
+        database,
+        "AsyncSessionLocal",
+        database.create_async_session_factory(f"sqlite+aiosqlite:///{path}"),
+    )
+    main.auth_cache.clear()
+    main.prompt_cache.clear()
+    app = FastAPI()
+    app.include_router(async_routes.router)
+    with TestClient(app) as test_client:
+        yield test_client
+
+
+def test_async_opportunity_lifecycle(client):
+    user_id = client.post("/users/", json={"name": "Async"}).json()["id"]
+    token = client.post("/token", data={"username": "Async", "password": "pw"}).json()
+    headers = {"Authorization": f"Bearer {token['access_token']}"}
+
+    created = client.post(
+        "/opportunities/",
+        json={"title": "Async Market", "tam_estimate": 10.0, "user_id": user_id},
+        headers=headers,
+    )
+    assert created.status_code == 200
+    opp_id = created.json()["id"]
+
+    listed = client.get("/opportunities/", headers=headers).json()
+    assert [o["title"] for o in listed] == ["Async Market"]
+    page = client.get("/opportunities/", params={"paginate": "cursor"}, headers=headers).json()
+    assert [o["id"] for o in page["items"]] == [opp_id]
+    sparse = client.get("/opportunities/", params={"fields": "title"}, headers=headers).json()
+    assert sparse == [{"title": "Async Market"}]
+    assert client.get(f"/opportunities/{opp_id}?fields=tam_estimate").json() == {"tam_estimate": 10.0}
+    with_opps = client.get("/users/", params={"include": "opportunities"}).json()
+    assert [o["title"] for o in with_opps[0]["opportunities"]] == ["Async Market"]
+    counts = client.get("/users/", params={"include": "counts"}).json()
+    assert counts == [{"id": user_id, "name": "Async", "opportunity_count": 1, "tam_total": 10.0}]
+
+    etag = client.get(f"/opportunities/{opp_id}").headers["ETag"]
+    assert client.get(
+        f"/opportunities/{opp_id}", headers={"If-None-Match": etag}
+    ).status_code == 304
+
+    updated = client.patch(f"/opportunities/{opp_id}", json={"growth_rate": 3.0})
+    assert updated.json()["growth_rate"] == 3.0
+    assert updated.headers["ETag"] != etag
+
+    prompt = client.get(f"/prompt/{opp_id}").json()
+    assert "Opportunity Title: Async Market" in prompt["prompt"]
+
+    assert client.delete(f"/opportunities/{opp_id}").status_code == 204
+    assert client.get(f"/opportunities/{opp_id}").status_code == 404
+
+
+def test_async_create_requires_existing_user(client):
+    client.post("/users/", json={"name": "Owner"})
+    token = client.post("/token", data={"username": "Owner", "password": "pw"}).json()
+    headers = {"Authorization": f"Bearer {token['access_token']}"}
+    resp = client.post(
+        "/opportunities/", json={"title": "Orphan", "user_id": 999}, headers=headers
+    )
+    assert resp.status_code == 404
+
+
+def test_install_replaces_sync_routes_in_place():
+    app = FastAPI()
+    app.router.routes = list(main.app.router.routes)
+    async_routes.install(app)
+    handlers = {
+        (route.path, tuple(sorted(route.methods))): route.endpoint
+        for route in app.router.routes
+        if hasattr(route, "methods")
+    }
+    assert handlers[("/opportunities/", ("GET",))] is async_routes.read_opportunities
+    assert handlers[("/opportunities/export", ("GET",))] is main.export_opportunities
+    paths = [route.path for route in app.router.routes]
+    assert paths.index("/opportunities/export") < paths.index("/opportunities/{opportunity_id}")
@@ -0,0 +1,88 @@
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+from fastapi.testclient import TestClient
+from database import Base, SessionLocal, engine
+import models
+import main
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def setup_db():
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    main.auth_cache.clear()
+    yield
+    Base.metadata.drop_all(bind=engine)
+
+
+def login(client, username):
+    resp = client.post("/token", data={"username": username, "password": "password"})
+    return {"Authorization": f"Bearer {resp.json()['access_token']}"}
+
+
+def _sample(name: str) -> float:
+    return main.PROMETHEUS_REGISTRY.get_sample_value(name) or 0.0
+
+
+def test_repeated_requests_hit_cache():
+    client = TestClient(main.app)
+    client.post("/users/", json={"name": "Cached"})
+    headers = login(client, "Cached")
+
+    misses_before = _sample("auth_cache_misses_total")
+    hits_before = _sample("auth_cache_hits_total")
+    assert client.get("/opportunities/", headers=headers).status_code == 200
+    assert client.get("/opportunities/", headers=headers).status_code == 200
+
+    assert _sample("auth_cache_misses_total") == misses_before + 1
+    assert _sample("auth_cache_hits_total") == hits_before + 1
+
+
+def test_new_token_invalidates_old_one():
+    client = TestClient(main.app)
+    client.post("/users/", json={"name": "Rotating"})
+    old_headers = login(client, "Rotating")
+    assert client.get("/opportunities/", headers=old_headers).status_code == 200
+
+    new_headers = login(client, "Rotating")
+    assert client.get("/opportunities/", headers=old_headers).status_code == 401
+    assert client.get("/opportunities/", headers=new_headers).status_code == 200
+
+
+def test_old_token_is_invalidated_after_the_new_one_is_committed(monkeypatch):
+    client = TestClient(main.app)
+    client.post("/users/", json={"name": "Racing"})
+    old_token = login(client, "Racing")["Authorization"].split()[1]
+    stored = []
+    invalidate = main.auth_cache.invalidate
+
+    def record(token):
+        # What a concurrent request would find in the database right now.
+        with SessionLocal() as db:
+            stored.append(db.query(models.User.token).filter(models.User.name == "Racing").scalar())
+        invalidate(token)
+
+    monkeypatch.setattr(main.auth_cache, "invalidate", record)
+    new_token = login(client, "Racing")["Authorization"].split()[1]
+    assert stored == [new_token] != [old_token]
+
+
+def test_cache_evicts_least_recently_used():
+    cache = main.TokenCache(maxsize=2, ttl=60)
+    cache.put("a", "user-a")
+    cache.put("b", "user-b")
+    assert cache.get("a") == "user-a"
+    cache.put("c", "user-c")
+    assert cache.get("b") is None
+    assert cache.get("a") == "user-a"
+    assert cache.get("c") == "user-c"
+
+
+def test_cache_entries_expire():
+    cache = main.TokenCache(maxsize=2, ttl=-1)
+    cache.put("a", "user-a")
+    assert cache.get("a") is None
@@ -0,0 +1,87 @@
+import json
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+from fastapi.testclient import TestClient
+from database import Base, engine
+from main import app
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def setup_db():
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    yield
+    Base.metadata.drop_all(bind=engine)
+
+
+def create_user_and_token(client, username="user"):
+    user_resp = client.post("/users/", json={"name": username})
+    user_id = user_resp.json()["id"]
+    token_resp = client.post(
+        "/token", data={"username": username, "password": "password"}
+    )
+    token = token_resp.json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+    return headers, user_id
+
+
+def test_bulk_create_json_array_reports_row_errors():
+    client = TestClient(app)
+    headers, user_id = create_user_and_token(client, "Bulk")
+    client.post("/opportunities/", json={"title": "Existing", "user_id": user_id}, headers=headers)
+
+    rows = [
+        {"title": "Row 0", "tam_estimate": 10.0, "user_id": user_id},
+        {"title": "Existing", "user_id": user_id},
+        {"title": "Row 2", "tam_estimate": -5, "user_id": user_id},
+        {"title": "Row 3", "user_id": 9999},
+        {"title": "Row 0", "user_id": user_id},
+        {"title": "Row 5", "user_id": user_id},
+    ]
+    resp = client.post(
+        "/opportunities/bulk", params={"chunk_size": 2}, json=rows, headers=headers
+    )
+    assert resp.status_code == 200
+    data = resp.json()
+    assert data["inserted"] == 2
+    assert [c["index"] for c in data["created"]] == [0, 5]
+    errors = {e["index"]: e["detail"] for e in data["errors"]}
+    assert errors[1] == "Duplicate title"
+    assert errors[2][0]["loc"] == ["tam_estimate"]
+    assert errors[3] == "User not found"
+    assert errors[4] == "Duplicate title"
+
+    listed = client.get("/opportunities/", params={"limit": 10}, headers=headers).json()
+    assert sorted(o["title"] for o in listed) == ["Existing", "Row 0", "Row 5"]
+    by_title = {o["title"]: o["id"] for o in listed}
+    assert data["created"][0]["id"] == by_title["Row 0"]
+
+
+def test_bulk_create_ndjson_stream():
+    client = TestClient(app)
+    headers, user_id = create_user_and_token(client, "Streamer")
+    lines = [json.dumps({"title": f"Line {i}", "user_id": user_id}) for i in range(5)]
+    body = "\n".join(lines[:2] + ["{not json"] + lines[2:]) + "\n"
+
+    resp = client.post(
+        "/opportunities/bulk",
+        content=body,
+        headers={**headers, "Content-Type": "application/x-ndjson"},
+    )
+    assert resp.status_code == 200
+    data = resp.json()
+    assert data["inserted"] == 5
+    assert [e["index"] for e in data["errors"]] == [2]
+
+
+def test_bulk_create_rejects_non_array():
+    client = TestClient(app)
+    headers, user_id = create_user_and_token(client, "Obj")
+    resp = client.post(
+        "/opportunities/bulk", json={"title": "x", "user_id": user_id}, headers=headers
+    )
+    assert resp.status_code == 400
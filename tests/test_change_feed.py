@@ -0,0 +1,244 @@
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+import asyncio
+import json
+import threading
+
+from fastapi.testclient import TestClient
+from prometheus_client import CollectorRegistry
+
+from change_feed import ChangeFeed
+from database import Base, engine
+from stream_tickets import StreamTickets
+import main
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def setup_db():
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    yield
+    Base.metadata.drop_all(bind=engine)
+
+
+def create_user_and_token(client, username="user"):
+    user_resp = client.post("/users/", json={"name": username})
+    user_id = user_resp.json()["id"]
+    token_resp = client.post(
+        "/token", data={"username": username, "password": "password"}
+    )
+    token = token_resp.json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+    return headers, user_id
+
+
+def parse(chunk):
+    """Split a stream chunk into ``(id, event, data)`` tuples."""
+    events = []
+    for block in chunk.decode().split("\n\n"):
+        fields = dict(line.split(": ", 1) for line in block.splitlines() if not line.startswith(":"))
+        if fields:
+            events.append((fields["id"], fields["event"], json.loads(fields["data"])))
+    return events
+
+
+def replay(feed, last_event_id=None):
+    """Return the events a client connecting with ``last_event_id`` starts with."""
+
+    async def run():
+        subscriber = feed.subscribe(last_event_id)
+        feed.unsubscribe(subscriber)
+        return parse(b"".join(subscriber.replay))
+
+    return asyncio.run(run())
+
+
+def test_resume_replays_only_the_missed_events():
+    feed = ChangeFeed(backlog=3, buffer=10, registry=CollectorRegistry())
+    [(start, kind, _)] = replay(feed)
+    assert kind == "reset"
+
+    for opportunity_id in range(1, 5):
+        feed.publish("created", {"id": opportunity_id})
+
+    assert [data["id"] for _, _, data in replay(feed, f"{feed.epoch}-2")] == [3, 4]
+    assert replay(feed, f"{feed.epoch}-4") == []
+    # Older than the backlog, from another process, or malformed: reload.
+    for last_event_id in (start, f"{feed.epoch}-0", "other-3", "garbage", f"{feed.epoch}-9"):
+        assert [kind for _, kind, _ in replay(feed, last_event_id)] == ["reset"]
+
+
+def test_events_from_other_threads_reach_subscribers_in_order():
+    registry = CollectorRegistry()
+    feed = ChangeFeed(backlog=100, buffer=100, registry=registry)
+
+    async def run():
+        stream = feed.stream(None, heartbeat=5)
+        assert [kind for _, kind, _ in parse(await stream.__anext__())] == ["reset"]
+        publishers = [
+            threading.Thread(target=lambda n=n: [feed.publish("updated", {"id": n}) for _ in range(5)])
+            for n in range(4)
+        ]
+        for thread in publishers:
+            thread.start()
+        for thread in publishers:
+            thread.join()
+        received = []
+        while len(received) < 20:
+            received.extend(parse(await stream.__anext__()))
+        await stream.aclose()
+        return received
+
+    received = asyncio.run(run())
+    assert [event_id for event_id, _, _ in received] == [f"{feed.epoch}-{n}" for n in range(1, 21)]
+    assert registry.get_sample_value("change_feed_subscribers") == 0
+    assert registry.get_sample_value("change_feed_events_total", {"kind": "updated"}) == 20
+
+
+def test_slow_subscribers_are_dropped_and_idle_ones_get_keep_alives():
+    registry = CollectorRegistry()
+    feed = ChangeFeed(backlog=100, buffer=2, registry=registry)
+
+    async def run():
+        slow = feed.stream(None, heartbeat=5)
+        idle = feed.stream(None, heartbeat=0.01)
+        await slow.__anext__()
+        await idle.__anext__()
+        assert await idle.__anext__() == b": keep-alive\n\n"
+        await idle.aclose()
+        for n in range(3):
+            feed.publish("created", {"id": n})
+        await asyncio.sleep(0)
+        # The buffered events are still delivered, then the stream ends.
+        buffered = [data["id"] for _, _, data in parse(await slow.__anext__())]
+        with pytest.raises(StopAsyncIteration):
+            await slow.__anext__()
+        return buffered
+
+    assert asyncio.run(run()) == [0, 1]
+    assert registry.get_sample_value("change_feed_dropped_total") == 1
+    assert registry.get_sample_value("change_feed_subscribers") == 0
+
+
+def test_writes_publish_to_the_feed():
+    client = TestClient(main.app)
+    headers, user_id = create_user_and_token(client)
+    [(start, _, _)] = replay(main.change_feed)
+
+    opp_id = client.post("/opportunities/", json={"title": "Fresh", "user_id": user_id}, headers=headers).json()["id"]
+    client.patch(f"/opportunities/{opp_id}", json={"growth_rate": 2.0})
+    client.delete(f"/opportunities/{opp_id}")
+
+    events = replay(main.change_feed, start)
+    assert [kind for _, kind, _ in events] == ["created", "updated", "deleted"]
+    assert events[0][2]["title"] == "Fresh"
+    assert events[0][2]["version"] == 1
+    assert events[1][2]["growth_rate"] == 2.0
+    assert events[1][2]["version"] == 2
+    assert events[2][2] == {"id": opp_id}
+
+
+async def request_stream(path, headers=()):
+    """Run ``GET path`` against the app until the first body chunk arrives."""
+    messages = asyncio.Queue()
+    disconnected = asyncio.Event()
+    requested = False
+
+    async def receive():
+        nonlocal requested
+        if not requested:
+            requested = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        await disconnected.wait()
+        return {"type": "http.disconnect"}
+
+    path, _, query = path.partition("?")
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0", "spec_version": "2.3"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": query.encode(),
+        "root_path": "",
+        "headers": [(name.lower().encode(), value.encode()) for name, value in headers],
+        "client": ("testclient", 50000),
+        "server": ("testserver", 80),
+    }
+    app = asyncio.create_task(main.app(scope, receive, messages.put))
+    start = await asyncio.wait_for(messages.get(), 5)
+    body = b""
+    if start["status"] == 200:
+        body = (await asyncio.wait_for(messages.get(), 5))["body"]
+    disconnected.set()
+    await asyncio.wait_for(app, 5)
+    return start, body
+
+
+def test_stream_endpoint():
+    client = TestClient(main.app)
+    headers, _ = create_user_and_token(client)
+    token = headers["Authorization"].split()[1]
+
+    start, body = asyncio.run(request_stream("/opportunities/stream", headers.items()))
+    assert start["status"] == 200
+    assert (b"content-type", b"text/event-stream; charset=utf-8") in start["headers"]
+    [(event_id, kind, _)] = parse(body)
+    assert kind == "reset"
+
+    main.change_feed.publish("deleted", {"id": 7})
+    ticket = client.post("/opportunities/stream/ticket", headers=headers).json()["ticket"]
+    start, body = asyncio.run(
+        request_stream(f"/opportunities/stream?ticket={ticket}", [("Last-Event-ID", event_id)])
+    )
+    assert [(kind, data) for _, kind, data in parse(body)] == [("deleted", {"id": 7})]
+
+    # Tickets are single-use, and the API token is not accepted in the URL.
+    for path in (
+        "/opportunities/stream",
+        f"/opportunities/stream?ticket={ticket}",
+        f"/opportunities/stream?access_token={token}",
+    ):
+        start, _ = asyncio.run(request_stream(path))
+        assert start["status"] == 401
+    assert client.post("/opportunities/stream/ticket").status_code == 401
+
+
+def test_stream_tickets_expire():
+    tickets = StreamTickets(ttl=0)
+    assert tickets.redeem(tickets.issue(1)) is None
+    tickets.ttl = 60
+    ticket = tickets.issue(1)
+    assert tickets.redeem(ticket) == 1
+    assert tickets.redeem(ticket) is None
+
+
+def test_bulk_inserts_publish_to_the_feed():
+    client = TestClient(main.app)
+    headers, user_id = create_user_and_token(client)
+    [(start, _, _)] = replay(main.change_feed)
+
+    rows = [{"title": f"Bulk {i}", "user_id": user_id, "tam_estimate": i + 1} for i in range(3)]
+    rows.append({"title": "Bulk 0", "user_id": user_id})
+    created = client.post("/opportunities/bulk?chunk_size=2", json=rows, headers=headers).json()["created"]
+
+    events = replay(main.change_feed, start)
+    assert [kind for _, kind, _ in events] == ["created"] * 3
+    assert [data["id"] for _, _, data in events] == [row["id"] for row in created]
+    assert events[2][2] == {
+        "id": created[2]["id"],
+        "title": "Bulk 2",
+        "market_description": None,
+        "tam_estimate": 3.0,
+        "growth_rate": None,
+        "consumer_insight": None,
+        "hypothesis": None,
+        "user_id": user_id,
+        "version": 1,
+    }
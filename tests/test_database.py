@@ -0,0 +1,42 @@
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, make_url, text
+
+import database
+import main
+
+
+def test_sqlite_pragmas_applied_on_connect(tmp_path):
+    url = make_url(f"sqlite:///{tmp_path / 'tuned.db'}")
+    engine = create_engine(url, **database.engine_options(url))
+    database.configure_engine(engine)
+    with engine.connect() as conn:
+        assert conn.execute(text("PRAGMA journal_mode")).scalar() == "wal"
+        # NORMAL == 1
+        assert conn.execute(text("PRAGMA synchronous")).scalar() == 1
+        assert conn.execute(text("PRAGMA busy_timeout")).scalar() == database.SQLITE_BUSY_TIMEOUT_MS
+        assert conn.execute(text("PRAGMA cache_size")).scalar() == database.SQLITE_CACHE_SIZE
+    assert isinstance(engine.pool, database.TimedQueuePool)
+    assert engine.pool.checkouts == 1
+    engine.dispose()
+
+
+def test_memory_sqlite_keeps_default_pool():
+    url = make_url("sqlite://")
+    assert "poolclass" not in database.engine_options(url)
+
+
+def test_pool_metrics_exported():
+    client = TestClient(main.app)
+    with database.engine.connect():
+        checked_out = main.PROMETHEUS_REGISTRY.get_sample_value(
+            "db_pool_checked_out", {"engine": "sync"}
+        )
+        assert checked_out >= 1
+    body = client.get("/metrics").text
+    assert 'db_pool_size{engine="sync"}' in body
+    assert "db_pool_checkout_wait_seconds_total" in body
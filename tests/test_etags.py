@@ -0,0 +1,119 @@
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+from fastapi.testclient import TestClient
+from database import Base, engine
+from main import app
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def setup_db():
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    yield
+    Base.metadata.drop_all(bind=engine)
+
+
+def create_user_and_token(client, username="user"):
+    user_resp = client.post("/users/", json={"name": username})
+    user_id = user_resp.json()["id"]
+    token_resp = client.post(
+        "/token", data={"username": username, "password": "password"}
+    )
+    token = token_resp.json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+    return headers, user_id
+
+
+def test_opportunity_etag_and_conditional_get():
+    client = TestClient(app)
+    headers, user_id = create_user_and_token(client, "Tagger")
+    opp_id = client.post(
+        "/opportunities/", json={"title": "Tagged", "user_id": user_id}, headers=headers
+    ).json()["id"]
+
+    first = client.get(f"/opportunities/{opp_id}")
+    etag = first.headers["ETag"]
+    assert etag == f'"{opp_id}-1"'
+    assert first.headers["Last-Modified"].endswith("GMT")
+
+    cached = client.get(f"/opportunities/{opp_id}", headers={"If-None-Match": etag})
+    assert cached.status_code == 304
+    assert cached.content == b""
+    assert cached.headers["ETag"] == etag
+
+    since = client.get(
+        f"/opportunities/{opp_id}",
+        headers={"If-Modified-Since": first.headers["Last-Modified"]},
+    )
+    assert since.status_code == 304
+
+    patched = client.patch(f"/opportunities/{opp_id}", json={"hypothesis": "New"})
+    assert patched.headers["ETag"] == f'"{opp_id}-2"'
+    refreshed = client.get(f"/opportunities/{opp_id}", headers={"If-None-Match": etag})
+    assert refreshed.status_code == 200
+    assert refreshed.json()["hypothesis"] == "New"
+    assert refreshed.headers["ETag"] == patched.headers["ETag"]
+
+
+def test_conditional_get_of_missing_opportunity():
+    client = TestClient(app)
+    resp = client.get("/opportunities/404", headers={"If-None-Match": '"404-1"'})
+    assert resp.status_code == 404
+
+
+@pytest.mark.parametrize("params", [{}, {"paginate": "cursor"}])
+def test_collection_etag_changes_with_writes(params):
+    client = TestClient(app)
+    headers, user_id = create_user_and_token(client, "Lister")
+    opp_id = client.post(
+        "/opportunities/", json={"title": "Listed", "user_id": user_id}, headers=headers
+    ).json()["id"]
+
+    first = client.get("/opportunities/", params=params, headers=headers)
+    etag = first.headers["ETag"]
+    unchanged = client.get(
+        "/opportunities/", params=params, headers={**headers, "If-None-Match": etag}
+    )
+    assert unchanged.status_code == 304
+
+    client.patch(f"/opportunities/{opp_id}", json={"title": "Relisted"})
+    changed = client.get(
+        "/opportunities/", params=params, headers={**headers, "If-None-Match": etag}
+    )
+    assert changed.status_code == 200
+    assert changed.headers["ETag"] != etag
+
+    client.delete(f"/opportunities/{opp_id}")
+    emptied = client.get(
+        "/opportunities/",
+        params=params,
+        headers={**headers, "If-None-Match": changed.headers["ETag"]},
+    )
+    assert emptied.status_code == 200
+
+
+def test_cursor_page_etag_changes_when_a_next_page_appears():
+    client = TestClient(app)
+    headers, user_id = create_user_and_token(client, "Pager")
+    for title in ("One", "Two"):
+        client.post("/opportunities/", json={"title": title, "user_id": user_id}, headers=headers)
+    params = {"paginate": "cursor", "limit": 2}
+
+    first = client.get("/opportunities/", params=params, headers=headers)
+    assert first.json()["next_cursor"] is None
+    etag = first.headers["ETag"]
+
+    # The page's rows are unchanged, but there is now a page after it.
+    client.post("/opportunities/", json={"title": "Three", "user_id": user_id}, headers=headers)
+    resp = client.get("/opportunities/", params=params, headers={**headers, "If-None-Match": etag})
+    assert resp.status_code == 200
+    assert resp.json()["next_cursor"] is not None
+    assert resp.headers["ETag"] != etag
+    cached = client.get(
+        "/opportunities/", params=params, headers={**headers, "If-None-Match": resp.headers["ETag"]}
+    )
+    assert cached.status_code == 304
@@ -0,0 +1,81 @@
+import csv
+import io
+import json
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+from fastapi.testclient import TestClient
+from database import Base, SessionLocal, engine
+from export import iter_ndjson
+from main import app
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def setup_db():
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    yield
+    Base.metadata.drop_all(bind=engine)
+
+
+def create_user_and_token(client, username="user"):
+    user_resp = client.post("/users/", json={"name": username})
+    user_id = user_resp.json()["id"]
+    token_resp = client.post(
+        "/token", data={"username": username, "password": "password"}
+    )
+    token = token_resp.json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+    return headers, user_id
+
+
+def seed(client, headers, user_id, count):
+    rows = [
+        {"title": f"Export {i}", "tam_estimate": 100.0 + i, "user_id": user_id}
+        for i in range(count)
+    ]
+    resp = client.post("/opportunities/bulk", json=rows, headers=headers)
+    assert resp.json()["inserted"] == count
+
+
+def test_export_ndjson():
+    client = TestClient(app)
+    headers, user_id = create_user_and_token(client, "Analyst")
+    seed(client, headers, user_id, 3)
+
+    resp = client.get("/opportunities/export", headers=headers)
+    assert resp.status_code == 200
+    assert resp.headers["content-type"].startswith("application/x-ndjson")
+    rows = [json.loads(line) for line in resp.text.splitlines()]
+    assert [r["title"] for r in rows] == ["Export 0", "Export 1", "Export 2"]
+    assert rows[1]["tam_estimate"] == 101.0
+    assert rows[0]["market_description"] is None
+
+
+def test_export_csv():
+    client = TestClient(app)
+    headers, user_id = create_user_and_token(client, "Csv")
+    seed(client, headers, user_id, 2)
+
+    resp = client.get("/opportunities/export", params={"format": "csv"}, headers=headers)
+    assert resp.status_code == 200
+    rows = list(csv.DictReader(io.StringIO(resp.text)))
+    assert [r["title"] for r in rows] == ["Export 0", "Export 1"]
+    assert rows[0]["user_id"] == str(user_id)
+
+
+def test_export_streams_in_batches():
+    client = TestClient(app)
+    headers, user_id = create_user_and_token(client, "Batches")
+    seed(client, headers, user_id, 5)
+
+    chunks = list(iter_ndjson(SessionLocal, batch_size=2))
+    assert [chunk.count("\n") for chunk in chunks] == [2, 2, 1]
+
+
+def test_export_requires_auth():
+    client = TestClient(app)
+    assert client.get("/opportunities/export").status_code == 401
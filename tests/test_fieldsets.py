@@ -0,0 +1,118 @@
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+from fastapi.testclient import TestClient
+from database import Base, engine
+from main import app
+import fieldsets
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def setup_db():
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    yield
+    Base.metadata.drop_all(bind=engine)
+
+
+def create_user_and_token(client, username="user"):
+    user_resp = client.post("/users/", json={"name": username})
+    user_id = user_resp.json()["id"]
+    token_resp = client.post(
+        "/token", data={"username": username, "password": "password"}
+    )
+    token = token_resp.json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+    return headers, user_id
+
+
+def seed(client, headers, user_id, count=3):
+    for i in range(count):
+        payload = {
+            "title": f"Opp {i}",
+            "market_description": "long text " * 50,
+            "tam_estimate": 1000.5 * (i + 1),
+            "user_id": user_id,
+        }
+        assert client.post("/opportunities/", json=payload, headers=headers).status_code == 200
+
+
+def test_list_returns_only_requested_fields():
+    client = TestClient(app)
+    headers, user_id = create_user_and_token(client)
+    seed(client, headers, user_id)
+
+    full = client.get("/opportunities/", headers=headers)
+    resp = client.get("/opportunities/?fields=title,tam_estimate", headers=headers)
+    assert resp.status_code == 200
+    assert resp.headers["content-type"] == "application/json"
+    assert resp.json() == [
+        {"title": item["title"], "tam_estimate": item["tam_estimate"]} for item in full.json()
+    ]
+    # Different bytes, so a different strong validator from the full list.
+    assert resp.headers["ETag"] != full.headers["ETag"]
+    assert client.get(
+        "/opportunities/", headers={**headers, "If-None-Match": resp.headers["ETag"]}
+    ).status_code == 200
+    reordered = client.get("/opportunities/?fields=tam_estimate,title", headers=headers)
+    assert reordered.headers["ETag"] not in (resp.headers["ETag"], full.headers["ETag"])
+    cached = client.get(
+        "/opportunities/?fields=title,tam_estimate",
+        headers={**headers, "If-None-Match": resp.headers["ETag"]},
+    )
+    assert cached.status_code == 304
+
+
+def test_cursor_pages_with_fields():
+    client = TestClient(app)
+    headers, user_id = create_user_and_token(client)
+    seed(client, headers, user_id)
+
+    first = client.get(
+        "/opportunities/?paginate=cursor&limit=2&sort=title&fields=id", headers=headers
+    ).json()
+    assert first["items"] == [{"id": 1}, {"id": 2}]
+    second = client.get(
+        f"/opportunities/?cursor={first['next_cursor']}&limit=2&sort=title&fields=id",
+        headers=headers,
+    ).json()
+    assert second["items"] == [{"id": 3}]
+    assert second["next_cursor"] is None
+
+
+def test_single_opportunity_with_fields():
+    client = TestClient(app)
+    headers, user_id = create_user_and_token(client)
+    seed(client, headers, user_id, count=1)
+
+    full = client.get("/opportunities/1")
+    resp = client.get("/opportunities/1?fields=user_id, title,title")
+    assert resp.status_code == 200
+    assert resp.json() == {"user_id": user_id, "title": "Opp 0"}
+    assert resp.headers["ETag"] != full.headers["ETag"]
+    assert client.get("/opportunities/1", headers={"If-None-Match": resp.headers["ETag"]}).status_code == 200
+    assert client.get(
+        "/opportunities/1?fields=user_id,title", headers={"If-None-Match": resp.headers["ETag"]}
+    ).status_code == 304
+    assert resp.headers["Last-Modified"] == full.headers["Last-Modified"]
+    assert client.get("/opportunities/2?fields=title").status_code == 404
+
+
+def test_unknown_fields_are_rejected():
+    client = TestClient(app)
+    headers, _ = create_user_and_token(client)
+
+    resp = client.get("/opportunities/?fields=title,version", headers=headers)
+    assert resp.status_code == 400
+    assert "Unknown fields: version" in resp.json()["detail"]
+    assert client.get("/opportunities/1?fields=,").status_code == 400
+
+
+def test_standard_library_encoder_matches(monkeypatch):
+    body = [{"id": 1, "title": "Café", "tam_estimate": 1.5, "growth_rate": None}]
+    fast = fieldsets.dumps(body)
+    monkeypatch.setattr(fieldsets, "orjson", None)
+    assert fieldsets.dumps(body) == fast
@@ -0,0 +1,133 @@
+import os
+import sys
+from itertools import product
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+from fastapi.testclient import TestClient
+from sqlalchemy import text
+from database import Base, SessionLocal, engine
+from filters import OpportunityFilters
+from main import app
+from pagination import SORT_COLUMNS, _seek
+import models
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def setup_db():
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    yield
+    Base.metadata.drop_all(bind=engine)
+
+
+def create_user_and_token(client, username="user"):
+    user_resp = client.post("/users/", json={"name": username})
+    user_id = user_resp.json()["id"]
+    token_resp = client.post(
+        "/token", data={"username": username, "password": "password"}
+    )
+    token = token_resp.json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+    return headers, user_id
+
+
+def seed(client, headers, user_id, rows):
+    for i, (tam, growth) in enumerate(rows):
+        payload = {"title": f"Opp {user_id}-{i}", "user_id": user_id}
+        if tam is not None:
+            payload["tam_estimate"] = tam
+        if growth is not None:
+            payload["growth_rate"] = growth
+        assert client.post("/opportunities/", json=payload, headers=headers).status_code == 200
+
+
+def test_range_and_user_filters():
+    client = TestClient(app)
+    headers, alice = create_user_and_token(client, "Alice")
+    _, bob = create_user_and_token(client, "Bob")
+    seed(client, headers, alice, [(100, 1), (200, 5), (300, 10), (None, None)])
+    seed(client, headers, bob, [(250, 20)])
+
+    def titles(**params):
+        resp = client.get("/opportunities/", params=params, headers=headers)
+        assert resp.status_code == 200
+        return [o["title"] for o in resp.json()]
+
+    assert titles(min_tam=150, max_tam=260) == ["Opp 1-1", "Opp 2-0"]
+    assert titles(min_growth=5, user_id=alice) == ["Opp 1-1", "Opp 1-2"]
+    assert titles(max_growth=5, sort="tam_estimate") == ["Opp 1-0", "Opp 1-1"]
+    assert titles(user_id=bob) == ["Opp 2-0"]
+    assert titles(sort="growth_rate", limit=2) == ["Opp 1-3", "Opp 1-0"]
+
+
+def test_cursor_pages_over_nullable_sort_key():
+    client = TestClient(app)
+    headers, user_id = create_user_and_token(client, "Nulls")
+    seed(client, headers, user_id, [(300, 0), (None, 0), (100, 0), (None, 0), (100, 0), (200, 0)])
+    expected = ["Opp 1-1", "Opp 1-3", "Opp 1-2", "Opp 1-4", "Opp 1-5", "Opp 1-0"]
+
+    pages, cursor = [], None
+    params = {"paginate": "cursor", "sort": "tam_estimate", "limit": 2}
+    while True:
+        page = client.get(
+            "/opportunities/", params={**params, "cursor": cursor} if cursor else params,
+            headers=headers,
+        ).json()
+        pages.append(page)
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+    assert [o["title"] for page in pages for o in page["items"]] == expected
+
+    back = client.get(
+        "/opportunities/", params={"cursor": pages[2]["prev_cursor"], "limit": 2}, headers=headers
+    ).json()
+    assert back["items"] == pages[1]["items"]
+    back = client.get(
+        "/opportunities/", params={"cursor": back["prev_cursor"], "limit": 2}, headers=headers
+    ).json()
+    assert back["items"] == pages[0]["items"]
+
+
+FILTERS = [
+    OpportunityFilters(),
+    OpportunityFilters(user_id=1),
+    OpportunityFilters(min_tam=1e6),
+    OpportunityFilters(max_tam=1e6),
+    OpportunityFilters(min_tam=1e6, max_tam=1e7),
+    OpportunityFilters(min_growth=5),
+    OpportunityFilters(max_growth=5),
+    OpportunityFilters(min_tam=1e6, max_growth=5),
+    OpportunityFilters(user_id=1, min_tam=1e6),
+    OpportunityFilters(user_id=1, max_growth=5),
+    OpportunityFilters(user_id=1, min_tam=1e6, max_tam=1e7, min_growth=1, max_growth=5),
+]
+CURSORS = [None, ("next", 1e6), ("next", None), ("prev", 1e6), ("prev", None)]
+
+
+def query_plan(db, statement):
+    sql = str(statement.compile(engine, compile_kwargs={"literal_binds": True}))
+    return [row[-1] for row in db.execute(text(f"EXPLAIN QUERY PLAN {sql}"))]
+
+
+@pytest.mark.parametrize("filters", FILTERS, ids=repr)
+def test_every_filter_and_sort_uses_an_index(filters):
+    db = SessionLocal()
+    try:
+        for sort, cursor in product(SORT_COLUMNS, CURSORS):
+            if cursor is not None:
+                direction, value = cursor
+                cursor = {"s": sort, "v": value if sort != "id" else 5, "id": 5, "d": direction}
+            query = _seek(filters.apply(db.query(models.Opportunity)), sort, cursor).limit(11)
+            plan = query_plan(db, query.statement)
+            scans = [step for step in plan if "opportunities" in step]
+            full_scans = [step for step in scans if step.strip() == "SCAN opportunities"]
+            # With no filter the id sort reads the table itself, which is
+            # stored in primary key order.
+            if sort == "id" and cursor is None and not filters.active:
+                continue
+            assert scans and not full_scans, (sort, cursor, plan)
+    finally:
+        db.close()
@@ -0,0 +1,166 @@
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+import threading
+
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+from sqlalchemy.exc import OperationalError
+
+from database import Base, SessionLocal, engine
+from group_commit import GroupCommitWriter
+import group_commit
+import main
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def setup_db():
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    yield
+    Base.metadata.drop_all(bind=engine)
+
+
+@pytest.fixture
+def writer():
+    writer = GroupCommitWriter(SessionLocal, max_rows=50, max_delay=0.05)
+    yield writer
+    writer.stop()
+
+
+def create_user_and_token(client, username="user"):
+    user_resp = client.post("/users/", json={"name": username})
+    user_id = user_resp.json()["id"]
+    token_resp = client.post(
+        "/token", data={"username": username, "password": "password"}
+    )
+    token = token_resp.json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+    return headers, user_id
+
+
+def row(title, user_id, **extra):
+    return {
+        "title": title,
+        "market_description": None,
+        "tam_estimate": None,
+        "growth_rate": None,
+        "consumer_insight": None,
+        "hypothesis": None,
+        "user_id": user_id,
+        **extra,
+    }
+
+
+def test_queued_rows_share_one_commit_and_get_their_own_outcome(writer):
+    client = TestClient(main.app)
+    _, user_id = create_user_and_token(client)
+    commits = []
+
+    def count_commit(conn):
+        commits.append(1)
+
+    event.listen(engine, "commit", count_commit)
+    try:
+        futures = [
+            writer.submit(row("A", user_id, tam_estimate=10.0)),
+            writer.submit(row("B", user_id)),
+            writer.submit(row("A", user_id)),
+            writer.submit(row("C", user_id + 1)),
+        ]
+        outcomes = []
+        for future in futures:
+            try:
+                outcomes.append(future.result(timeout=5))
+            except HTTPException as exc:
+                outcomes.append((exc.status_code, exc.detail))
+    finally:
+        event.remove(engine, "commit", count_commit)
+    assert outcomes[0] == {**row("A", user_id, tam_estimate=10.0), "id": 1}
+    assert outcomes[1] == {**row("B", user_id), "id": 2}
+    assert outcomes[2] == (409, "Duplicate title")
+    assert outcomes[3] == (404, "User not found")
+    assert len(commits) == 1
+    assert client.get("/opportunities/1").json()["tam_estimate"] == 10.0
+
+
+def test_stop_writes_queued_rows(writer):
+    client = TestClient(main.app)
+    _, user_id = create_user_and_token(client)
+    writer.max_delay = 10
+    future = writer.submit(row("Late", user_id))
+    writer.stop()
+    assert future.result(timeout=0)["id"] == 1
+
+
+def test_rows_submitted_after_stop_are_written_directly(writer):
+    client = TestClient(main.app)
+    _, user_id = create_user_and_token(client)
+    writer.submit(row("Early", user_id)).result(timeout=5)
+    thread = writer._thread
+    writer.stop()
+    assert not thread.is_alive()
+
+    future = writer.submit(row("After stop", user_id))
+    assert future.done()
+    assert future.result()["id"] == 2
+    assert writer._thread is thread
+    writer.stop()
+
+
+def test_concurrent_submit_and_stop_keep_one_writer(writer):
+    client = TestClient(main.app)
+    _, user_id = create_user_and_token(client)
+    started = []
+    real_thread = threading.Thread
+
+    def counting_thread(*args, **kwargs):
+        started.append(kwargs.get("name"))
+        return real_thread(*args, **kwargs)
+
+    with patch("group_commit.threading.Thread", counting_thread):
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            futures = [pool.submit(writer.submit, row(f"Row {i}", user_id)) for i in range(40)]
+            pool.submit(writer.stop).result(timeout=5)
+            results = [future.result(timeout=5).result(timeout=5) for future in futures]
+    assert started.count("group-commit") == 1
+    assert sorted(result["id"] for result in results) == list(range(1, 41))
+
+
+def test_failed_group_commit_is_a_structured_error(writer, monkeypatch):
+    def fail(db, rows, result):
+        raise OperationalError("INSERT", {}, Exception("database is locked"))
+
+    monkeypatch.setattr(group_commit, "ingest_chunk", fail)
+    future = writer.submit(row("Doomed", 1))
+    with pytest.raises(HTTPException) as excinfo:
+        future.result(timeout=5)
+    assert excinfo.value.status_code == 503
+    assert excinfo.value.detail == "Database unavailable"
+
+
+def test_create_endpoint_in_group_commit_mode(monkeypatch, writer):
+    monkeypatch.setattr(main, "group_writer", writer)
+    client = TestClient(main.app)
+    headers, user_id = create_user_and_token(client)
+
+    def create(title):
+        return client.post("/opportunities/", json={"title": title, "user_id": user_id}, headers=headers)
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        responses = list(pool.map(create, [f"Opp {i}" for i in range(16)]))
+    assert [r.status_code for r in responses] == [200] * 16
+    assert sorted(r.json()["id"] for r in responses) == list(range(1, 17))
+    assert all(r.json()["title"] == f"Opp {i}" for i, r in enumerate(responses))
+
+    duplicate = create("Opp 0")
+    assert duplicate.status_code == 409
+    assert duplicate.json()["detail"] == "Duplicate title"
+    stats = client.get("/opportunities/stats", headers=headers).json()
+    assert stats["opportunities"] == 16
@@ -0,0 +1,76 @@
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+import asyncio
+
+from fastapi.testclient import TestClient
+from sqlalchemy.exc import OperationalError
+
+from database import engine
+from health import HealthProbe, ProbeResult
+from settings import DB_MAX_OVERFLOW, DB_POOL_SIZE
+import main
+
+
+class FailingEngine:
+    pool = None
+
+    def connect(self):
+        raise OperationalError("SELECT 1", {}, Exception("database is locked"))
+
+
+def test_livez():
+    response = TestClient(main.app).get("/livez")
+    assert response.status_code == 200
+    assert response.json() == {"status": "ok"}
+
+
+def test_readyz_serves_the_cached_probe(monkeypatch):
+    with TestClient(main.app) as client:
+        response = client.get("/readyz")
+        assert response.status_code == 200
+        report = response.json()
+        assert report["status"] == "ok"
+        assert report["database"]["ok"] is True
+        assert report["database"]["latency_ms"] >= 0
+        assert report["pools"]["sync"]["capacity"] == DB_POOL_SIZE + DB_MAX_OVERFLOW
+
+        # Requests only read the last result; the database is not touched.
+        monkeypatch.setattr(main.health_probe, "engine", FailingEngine())
+        assert client.get("/readyz").status_code == 200
+
+        main.health_probe.probe()
+        response = client.get("/readyz")
+        assert response.status_code == 503
+        assert response.json()["database"]["error"].startswith("OperationalError")
+
+
+def test_stale_probe_and_saturated_pool_are_not_ready(monkeypatch):
+    probe = HealthProbe(engine, {"sync": engine}, interval=1.0, max_overflow=0)
+    assert probe.status()["database"] == {"ok": False, "error": "not probed yet"}
+
+    probe.probe()
+    assert probe.status()["status"] == "ok"
+    probe.last = ProbeResult(True, 0.001, probe.last.finished_at - 10)
+    assert probe.status()["database"]["error"] == "last probe is stale"
+
+    probe.probe()
+    with engine.connect():
+        probe.max_saturation = 1 / engine.pool.size()
+        report = probe.status()
+    assert report["status"] == "unavailable"
+    assert report["pools"]["sync"]["checked_out"] == 1
+
+
+def test_background_task_refreshes_the_result():
+    probe = HealthProbe(engine, {}, interval=0.01, max_overflow=0)
+
+    async def run():
+        probe.start()
+        await asyncio.sleep(0.1)
+        await probe.stop()
+
+    asyncio.run(run())
+    assert probe.last is not None and probe.last.ok
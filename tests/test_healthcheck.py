@@ -9,22 +9,28 @@ from sqlalchemy.exc import SQLAlchemyError
 
 
 def test_healthcheck_success():
-    client = TestClient(main.app)
-    response = client.get("/healthcheck")
+    with TestClient(main.app) as client:
+        response = client.get("/healthcheck")
     assert response.status_code == 200
     assert response.json() == {"status": "ok"}
 
 
 def test_healthcheck_db_failure(monkeypatch):
-    class FailingSession:
-        def execute(self, *args, **kwargs):
+    class FailingEngine:
+        def connect(self):
             raise SQLAlchemyError()
 
-        def close(self):
-            pass
-
-    monkeypatch.setattr(main, "SessionLocal", lambda: FailingSession())
+    monkeypatch.setattr(main.health_probe, "last", None)
+    monkeypatch.setattr(main.health_probe, "engine", FailingEngine())
+    main.health_probe.probe()
     client = TestClient(main.app)
     response = client.get("/healthcheck")
     assert response.status_code == 503
     assert response.json()["detail"] == "Database unavailable"
+
+
+def test_healthcheck_reads_the_cached_probe(monkeypatch):
+    main.health_probe.probe()
+    monkeypatch.setattr(main, "SessionLocal", None)
+    monkeypatch.setattr(main.health_probe, "engine", None)
+    assert TestClient(main.app).get("/healthcheck").status_code == 200
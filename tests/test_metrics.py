@@ -3,12 +3,24 @@ import sys
 
 sys.path.append(os.path.dirname(os.path.dirname(__file__)))
 
+import logging
+
 import main
+from database import Base, engine
+from fastapi import FastAPI
 from fastapi.testclient import TestClient
+from prometheus_client import CollectorRegistry, Counter, Histogram
+from request_metrics import MetricsMiddleware
+import pytest
 
 client = TestClient(main.app)
 
 
+@pytest.fixture(autouse=True)
+def setup_db():
+    Base.metadata.create_all(bind=engine)
+
+
 def _get_request_count(path: str, method: str = "GET", status: str = "404") -> float:
     value = main.PROMETHEUS_REGISTRY.get_sample_value(
         "requests_total", {"method": method, "path": path, "status_code": status}
@@ -38,3 +50,40 @@ def test_metrics_use_route_template():
     assert latency_after == latency_before + 1
     # Ensure metrics are not recorded with the concrete path
     assert _get_request_count("/opportunities/123") == 0.0
+
+
+def test_excluded_paths_are_not_recorded():
+    client.get("/metrics")
+    client.get("/healthcheck")
+    assert _get_request_count("/metrics", status="200") == 0.0
+    assert _get_latency_count("/healthcheck") == 0.0
+
+
+def test_status_code_comes_from_the_response():
+    before = _get_request_count("/", status="200")
+    assert client.get("/").status_code == 200
+    assert _get_request_count("/", status="200") == before + 1
+
+
+def test_access_log_is_sampled(caplog):
+    app = FastAPI()
+
+    @app.get("/ping")
+    def ping():
+        return {}
+
+    registry = CollectorRegistry()
+    count = Counter("requests_total", "", ["method", "path", "status_code"], registry=registry)
+    latency = Histogram("request_latency_seconds", "", ["method", "path"], registry=registry)
+
+    for rate, expected in ((0.0, 0), (1.0, 3)):
+        middleware = MetricsMiddleware(app, count, latency, access_log_sample_rate=rate)
+        caplog.clear()
+        with caplog.at_level(logging.INFO, logger="uvicorn"):
+            sampled = TestClient(middleware)
+            for _ in range(3):
+                sampled.get("/ping")
+        assert len([r for r in caplog.records if "/ping" in r.getMessage()]) == expected
+    assert registry.get_sample_value(
+        "requests_total", {"method": "GET", "path": "/ping", "status_code": "200"}
+    ) == 6
@@ -0,0 +1,98 @@
+import os
+import subprocess
+import sys
+import textwrap
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+
+import multiprocess_metrics
+
+WORKER = textwrap.dedent(
+    """
+    import sys
+    from prometheus_client import Counter, Gauge, Histogram
+
+    jobs = Counter("jobs_total", "Jobs", ["kind"])
+    latency = Histogram("job_seconds", "Job latency", buckets=(1, 2))
+    busy = Gauge("busy", "Busy", multiprocess_mode="livesum")
+    jobs.labels("a").inc(int(sys.argv[1]))
+    latency.observe(0.5)
+    busy.set(1)
+    """
+)
+
+
+def run_worker(directory, count):
+    env = {**os.environ, "PROMETHEUS_MULTIPROC_DIR": str(directory)}
+    subprocess.run([sys.executable, "-c", WORKER, str(count)], env=env, cwd=ROOT, check=True)
+
+
+def sample(registry, name, labels=None):
+    return registry.get_sample_value(name, labels or {})
+
+
+def test_counters_and_histograms_are_merged_and_survive_archiving(tmp_path):
+    for count in (1, 2, 3):
+        run_worker(tmp_path, count)
+    registry = multiprocess_metrics.scrape_registry(str(tmp_path))
+    assert sample(registry, "jobs_total", {"kind": "a"}) == 6
+    assert sample(registry, "job_seconds_count") == 3
+    assert sample(registry, "job_seconds_bucket", {"le": "1.0"}) == 3
+    # The workers have exited, but their live gauge files are still there.
+    assert sample(registry, "busy") == 3
+
+    multiprocess_metrics.archive_dead_processes(str(tmp_path))
+
+    files = sorted(os.listdir(tmp_path))
+    assert [f for f in files if f.endswith(".db")] == ["counter_archive.db", "histogram_archive.db"]
+    assert sample(registry, "jobs_total", {"kind": "a"}) == 6
+    assert sample(registry, "job_seconds_count") == 3
+    assert sample(registry, "busy") is None
+
+    run_worker(tmp_path, 4)
+    multiprocess_metrics.archive_dead_processes(str(tmp_path))
+    assert sample(registry, "jobs_total", {"kind": "a"}) == 10
+    assert sample(registry, "job_seconds_sum") == 2.0
+
+
+def test_app_serves_merged_metrics(tmp_path):
+    metrics_dir = tmp_path / "metrics"
+    metrics_dir.mkdir()
+    code = textwrap.dedent(
+        """
+        from fastapi.testclient import TestClient
+        import main
+
+        client = TestClient(main.app)
+        client.get("/")
+        client.get("/")
+        print(client.get("/metrics").text)
+        """
+    )
+    env = {
+        **os.environ,
+        "PROMETHEUS_MULTIPROC_DIR": str(metrics_dir),
+        "DATABASE_URL": f"sqlite:///{tmp_path / 'app.db'}",
+    }
+    for _ in range(2):
+        output = subprocess.run(
+            [sys.executable, "-c", code], env=env, cwd=ROOT, check=True,
+            capture_output=True, text=True,
+        ).stdout
+    # The second process reports its own requests plus the first one's.
+    assert 'requests_total{method="GET",path="/",status_code="200"} 4.0' in output
+    assert "prompt_cache_hit_ratio" not in output
+    assert any(name.endswith("_archive.db") for name in os.listdir(metrics_dir))
+
+
+def test_unsupported_prometheus_client_leaves_files_unarchived(tmp_path, monkeypatch):
+    monkeypatch.setattr(multiprocess_metrics, "MmapedDict", None)
+    run_worker(tmp_path, 2)
+    registry = multiprocess_metrics.scrape_registry(str(tmp_path))
+
+    multiprocess_metrics.archive_dead_processes(str(tmp_path))
+
+    assert not any(name.endswith("_archive.db") for name in os.listdir(tmp_path))
+    assert sample(registry, "jobs_total", {"kind": "a"}) == 2
+    assert sample(registry, "busy") is None
@@ -0,0 +1,126 @@
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+from fastapi.testclient import TestClient
+from database import Base, engine
+from main import app
+from pagination import encode_token
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def setup_db():
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    yield
+    Base.metadata.drop_all(bind=engine)
+
+
+def create_user_and_token(client, username="user"):
+    user_resp = client.post("/users/", json={"name": username})
+    user_id = user_resp.json()["id"]
+    token_resp = client.post(
+        "/token", data={"username": username, "password": "password"}
+    )
+    token = token_resp.json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+    return headers, user_id
+
+
+def seed(client, headers, user_id, count):
+    titles = []
+    for i in range(count):
+        title = f"Opportunity {i:03d}"
+        resp = client.post(
+            "/opportunities/", json={"title": title, "user_id": user_id}, headers=headers
+        )
+        assert resp.status_code == 200
+        titles.append(title)
+    return titles
+
+
+def test_cursor_pagination_walks_forward_and_back():
+    client = TestClient(app)
+    headers, user_id = create_user_and_token(client, "Pager")
+    titles = seed(client, headers, user_id, 7)
+
+    params = {"paginate": "cursor", "limit": 3}
+    first = client.get("/opportunities/", params=params, headers=headers).json()
+    assert [o["title"] for o in first["items"]] == titles[:3]
+    assert first["prev_cursor"] is None
+    assert first["next_cursor"]
+
+    second = client.get(
+        "/opportunities/", params={"cursor": first["next_cursor"], "limit": 3}, headers=headers
+    ).json()
+    assert [o["title"] for o in second["items"]] == titles[3:6]
+
+    third = client.get(
+        "/opportunities/", params={"cursor": second["next_cursor"], "limit": 3}, headers=headers
+    ).json()
+    assert [o["title"] for o in third["items"]] == titles[6:]
+    assert third["next_cursor"] is None
+
+    back = client.get(
+        "/opportunities/", params={"cursor": second["prev_cursor"], "limit": 3}, headers=headers
+    ).json()
+    assert back["items"] == first["items"]
+    assert back["prev_cursor"] is None
+
+
+def test_cursor_pagination_by_title_with_total():
+    client = TestClient(app)
+    headers, user_id = create_user_and_token(client, "Sorter")
+    titles = seed(client, headers, user_id, 4)
+
+    page = client.get(
+        "/opportunities/",
+        params={"paginate": "cursor", "sort": "title", "limit": 2, "include_total": True},
+        headers=headers,
+    ).json()
+    assert [o["title"] for o in page["items"]] == sorted(titles)[:2]
+    assert page["estimated_total"] == 4
+
+
+def test_invalid_cursor_rejected():
+    client = TestClient(app)
+    headers, _ = create_user_and_token(client, "Bad")
+    resp = client.get("/opportunities/", params={"cursor": "not-a-cursor"}, headers=headers)
+    assert resp.status_code == 400
+
+
+def test_tampered_cursor_value_rejected():
+    client = TestClient(app)
+    headers, user_id = create_user_and_token(client, "Forger")
+    seed(client, headers, user_id, 3)
+
+    tampered = [
+        {"s": "title", "v": {"a": 1}, "id": 1, "d": "next"},
+        {"s": "title", "v": [1, 2], "id": 1, "d": "next"},
+        {"s": "title", "v": 5, "id": 1, "d": "next"},
+        {"s": "title", "v": None, "id": 1, "d": "next"},
+        {"s": "tam_estimate", "v": "big", "id": 1, "d": "next"},
+        {"s": "tam_estimate", "v": True, "id": 1, "d": "next"},
+        {"s": "id", "v": 1, "id": "1", "d": "next"},
+    ]
+    for payload in tampered:
+        resp = client.get(
+            "/opportunities/", params={"cursor": encode_token(payload)}, headers=headers
+        )
+        assert resp.status_code == 400, payload
+
+    valid = {"s": "tam_estimate", "v": None, "id": 1, "d": "next"}
+    resp = client.get("/opportunities/", params={"cursor": encode_token(valid)}, headers=headers)
+    assert resp.status_code == 200
+
+
+def test_legacy_offset_pagination_still_returns_list():
+    client = TestClient(app)
+    headers, user_id = create_user_and_token(client, "Legacy")
+    titles = seed(client, headers, user_id, 5)
+
+    resp = client.get("/opportunities/", params={"skip": 2, "limit": 2}, headers=headers)
+    assert resp.status_code == 200
+    assert [o["title"] for o in resp.json()] == titles[2:4]
@@ -0,0 +1,58 @@
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+from sqlalchemy import func, inspect, select
+from database import Base, SessionLocal, engine
+import models
+import populate_sample_data
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def setup_db():
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    yield
+    Base.metadata.drop_all(bind=engine)
+
+
+def _snapshot():
+    with SessionLocal() as db:
+        rows = db.execute(
+            select(models.Opportunity.title, models.Opportunity.tam_estimate, models.Opportunity.version)
+        )
+        return {title: (tam, version) for title, tam, version in rows}
+
+
+def test_populate_is_idempotent():
+    populate_sample_data.populate()
+    populate_sample_data.populate()
+    with SessionLocal() as db:
+        assert db.scalar(select(func.count()).select_from(models.Opportunity)) == 2
+        assert db.scalar(select(func.count()).select_from(models.User)) == 1
+
+
+def test_generate_is_deterministic_and_idempotent():
+    options = dict(users=3, seed=1, chunk_size=20, rebuild_indexes=True, log=lambda _: None)
+    populate_sample_data.generate(50, **options)
+    first = _snapshot()
+    assert len(first) == 50
+    assert all(tam >= 1.0 for tam, _ in first.values())
+
+    populate_sample_data.generate(50, **options)
+    assert _snapshot() == first
+
+    populate_sample_data.generate(50, **{**options, "seed": 2})
+    changed = _snapshot()
+    assert len(changed) == 50
+    assert all(version == 2 for _, version in changed.values())
+    # Indexes dropped for the load are rebuilt afterwards.
+    indexes = {index["name"] for index in inspect(engine).get_indexes("opportunities")}
+    assert {index.name for index in models.Opportunity.__table__.indexes} <= indexes
+
+
+def test_parse_distribution_rejects_unknown_names():
+    with pytest.raises(Exception):
+        populate_sample_data.parse_distribution("cauchy:1,2")
@@ -1,3 +1,4 @@
+import json
 import os
 import sys
 
@@ -5,7 +6,12 @@ sys.path.append(os.path.dirname(os.path.dirname(__file__)))
 
 from fastapi.testclient import TestClient
 from database import Base, engine
+import main
+import prompt_batch
 from main import app
+from prompt_cache import PromptCache
+from settings import PROMPT_BATCH_MAX_IDS
+from template_registry import TemplateRegistry
 import pytest
 
 
@@ -13,6 +19,7 @@ import pytest
 def setup_db():
     Base.metadata.drop_all(bind=engine)
     Base.metadata.create_all(bind=engine)
+    main.prompt_cache.clear()
     yield
     Base.metadata.drop_all(bind=engine)
 
@@ -53,3 +60,190 @@ def test_generate_prompt():
     assert f"Growth Rate: {payload['growth_rate']}" in prompt
     assert f"Consumer Insight: {payload['consumer_insight']}" in prompt
     assert f"Hypothesis: {payload['hypothesis']}" in prompt
+
+
+def test_generate_prompt_exposes_template_version():
+    client = TestClient(app)
+    headers, user_id = create_user_and_token(client, "Eve")
+    create_resp = client.post(
+        "/opportunities/", json={"title": "Versioned", "user_id": user_id}, headers=headers
+    )
+    opp_id = create_resp.json()["id"]
+
+    resp = client.get(f"/prompt/{opp_id}")
+    assert resp.status_code == 200
+    version = resp.json()["template_version"]
+    assert version
+    assert resp.headers["X-Template-Version"] == version
+
+
+def test_generate_prompt_unknown_template():
+    client = TestClient(app)
+    headers, user_id = create_user_and_token(client, "Frank")
+    create_resp = client.post(
+        "/opportunities/", json={"title": "No Template", "user_id": user_id}, headers=headers
+    )
+    opp_id = create_resp.json()["id"]
+
+    resp = client.get(f"/prompt/{opp_id}", params={"template_name": "missing"})
+    assert resp.status_code == 404
+    assert resp.json()["detail"] == "Template not found"
+
+
+def test_template_registry_reloads_on_change(tmp_path):
+    path = tmp_path / "templates.json"
+    path.write_text(json.dumps({"default": "Hello {{ title }}"}))
+    registry = TemplateRegistry(path)
+
+    template, version = registry.get("default")
+    assert template.render(title="A") == "Hello A"
+    # Unchanged file: the same compiled template is served.
+    assert registry.get("default")[0] is template
+
+    path.write_text(json.dumps({"default": "Bye {{ title }}"}))
+    os.utime(path, ns=(0, path.stat().st_mtime_ns + 1_000_000))
+    new_template, new_version = registry.get("default")
+    assert new_version != version
+    assert new_template.render(title="A") == "Bye A"
+
+
+def test_template_registry_keeps_good_templates_when_a_reload_fails(tmp_path, caplog):
+    path = tmp_path / "templates.json"
+
+    def write(content):
+        path.write_text(content)
+        os.utime(path, ns=(0, path.stat().st_mtime_ns + 1_000_000))
+
+    path.write_text(json.dumps({"default": "Hello {{ title }}", "other": "Other {{ title }}"}))
+    registry = TemplateRegistry(path)
+    assert registry.get("other")[0].render(title="A") == "Other A"
+
+    # One broken template keeps its last good version; the others reload.
+    write(json.dumps({"default": "Bye {{ title }}", "other": "{% if %}", "new": "{{ oops"}))
+    assert registry.get("default")[0].render(title="A") == "Bye A"
+    assert registry.get("other")[0].render(title="A") == "Other A"
+    assert registry.get("new")[0] is None
+    assert "Template 'other' does not compile" in caplog.text
+
+    # A malformed file keeps every template from the last good load.
+    version = registry.version
+    write("{not json")
+    assert registry.version == version
+    assert registry.get("default")[0].render(title="A") == "Bye A"
+    assert "is not valid" in caplog.text
+
+
+def _seed_opportunities(client, headers, user_id, count):
+    rows = [
+        {"title": f"Batch {i}", "market_description": f"Market {i}", "user_id": user_id}
+        for i in range(count)
+    ]
+    resp = client.post("/opportunities/bulk", json=rows, headers=headers)
+    return [c["id"] for c in resp.json()["created"]]
+
+
+def test_generate_prompt_batch_by_ids():
+    client = TestClient(app)
+    headers, user_id = create_user_and_token(client, "Batcher")
+    ids = _seed_opportunities(client, headers, user_id, 3)
+
+    resp = client.post("/prompt/batch", json={"ids": [ids[2], 999, ids[0]]})
+    assert resp.status_code == 200
+    assert resp.headers["X-Template-Version"]
+    lines = [json.loads(line) for line in resp.text.splitlines()]
+    assert [line["id"] for line in lines] == [ids[2], 999, ids[0]]
+    assert "Opportunity Title: Batch 2" in lines[0]["prompt"]
+    assert lines[1]["error"] == "Opportunity not found"
+    assert "Market Description: Market 0" in lines[2]["prompt"]
+
+
+def test_generate_prompt_batch_by_filter_in_parallel(monkeypatch):
+    monkeypatch.setattr(main, "PROMPT_RENDER_WORKERS", 2)
+    monkeypatch.setattr(main, "PROMPT_BATCH_CHUNK_SIZE", 3)
+    client = TestClient(app)
+    headers, user_id = create_user_and_token(client, "Parallel")
+    ids = _seed_opportunities(client, headers, user_id, 5)
+
+    try:
+        resp = client.post(
+            "/prompt/batch", json={"filter": {"user_id": user_id}, "parallel": True}
+        )
+    finally:
+        prompt_batch.shutdown_pool()
+    lines = [json.loads(line) for line in resp.text.splitlines()]
+    assert [line["id"] for line in lines] == ids
+    assert all(
+        f"Opportunity Title: Batch {i}" in line["prompt"] for i, line in enumerate(lines)
+    )
+
+
+def test_generate_prompt_batch_requires_selection():
+    client = TestClient(app)
+    assert client.post("/prompt/batch", json={"template_name": "default"}).status_code == 422
+    assert client.post("/prompt/batch", json={"ids": [1], "template_name": "nope"}).status_code == 404
+    too_many = list(range(PROMPT_BATCH_MAX_IDS + 1))
+    assert client.post("/prompt/batch", json={"ids": too_many}).status_code == 422
+
+
+def test_render_workers_use_the_registry_environment(tmp_path):
+    sources = {
+        "base": "Pitch: {% block body %}{% endblock %} ({% include 'footer' %})",
+        "child": "{% extends 'base' %}{% block body %}{{ title }}{% endblock %}",
+        "footer": "{{ title | upper }}",
+    }
+    path = tmp_path / "templates.json"
+    path.write_text(json.dumps(sources))
+    registry = TemplateRegistry(path)
+    template, loaded, version = registry.get_with_sources("child")
+
+    rendered = prompt_batch._render_in_worker((version, "child"), loaded, [{"title": "Kiosk"}])
+    assert rendered == [template.render(title="Kiosk")] == ["Pitch: Kiosk (KIOSK)"]
+
+
+def _cache_sample(name):
+    return main.PROMETHEUS_REGISTRY.get_sample_value(name) or 0.0
+
+
+def test_generate_prompt_is_cached_until_update():
+    client = TestClient(app)
+    headers, user_id = create_user_and_token(client, "Cacher")
+    opp_id = client.post(
+        "/opportunities/", json={"title": "Cached Title", "user_id": user_id}, headers=headers
+    ).json()["id"]
+
+    hits_before = _cache_sample("prompt_cache_hits_total")
+    first = client.get(f"/prompt/{opp_id}").json()
+    second = client.get(f"/prompt/{opp_id}").json()
+    assert first == second
+    assert _cache_sample("prompt_cache_hits_total") == hits_before + 1
+
+    client.patch(f"/opportunities/{opp_id}", json={"title": "Edited Title"})
+    edited = client.get(f"/prompt/{opp_id}").json()
+    assert "Opportunity Title: Edited Title" in edited["prompt"]
+
+    client.delete(f"/opportunities/{opp_id}")
+    assert client.get(f"/prompt/{opp_id}").status_code == 404
+
+
+def test_prompt_cache_evicts_and_tracks_versions():
+    cache = PromptCache(maxsize=2)
+    generation = cache.generation()
+    cache.put(1, "default", "v1", "one", generation)
+    cache.put(2, "default", "v1", "two", generation)
+    assert cache.get(1, "default", "v1") == "one"
+    cache.put(3, "default", "v1", "three", generation)
+    assert cache.get(2, "default", "v1") is None
+    assert cache.get(1, "default", "v1") == "one"
+
+    # A new template version drops everything cached for the old one.
+    assert cache.get(1, "default", "v2") is None
+    cache.put(1, "default", "v2", "one-v2", generation)
+    assert cache.get(1, "default", "v2") == "one-v2"
+
+
+def test_prompt_cache_rejects_render_that_raced_a_write():
+    cache = PromptCache(maxsize=10)
+    generation = cache.generation()
+    cache.invalidate(1)
+    cache.put(1, "default", "v1", "stale", generation)
+    assert cache.get(1, "default", "v1") is None
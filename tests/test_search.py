@@ -0,0 +1,157 @@
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+from database import Base, engine
+from main import app
+import models
+import pytest
+
+with engine.connect() as _conn:
+    FTS5 = models.has_fts5(_conn)
+
+pytestmark = pytest.mark.skipif(not FTS5, reason="SQLite was built without FTS5")
+
+
+@pytest.fixture(autouse=True)
+def setup_db():
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    yield
+    Base.metadata.drop_all(bind=engine)
+
+
+def create_user_and_token(client, username="user"):
+    user_resp = client.post("/users/", json={"name": username})
+    user_id = user_resp.json()["id"]
+    token_resp = client.post(
+        "/token", data={"username": username, "password": "password"}
+    )
+    token = token_resp.json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+    return headers, user_id
+
+
+def create(client, headers, user_id, title, **fields):
+    payload = {"title": title, "user_id": user_id, **fields}
+    return client.post("/opportunities/", json=payload, headers=headers).json()["id"]
+
+
+def test_search_ranks_and_highlights_matches():
+    client = TestClient(app)
+    headers, user_id = create_user_and_token(client, "Searcher")
+    bottle = create(
+        client, headers, user_id, "Water bottle",
+        hypothesis="A filtered water bottle for hikers who drink water all day",
+    )
+    create(client, headers, user_id, "Energy monitor", market_description="Smart home energy")
+    create(client, headers, user_id, "Garden tools", consumer_insight="People like water features")
+
+    resp = client.get("/opportunities/search", params={"q": "water"}, headers=headers)
+    assert resp.status_code == 200
+    items = resp.json()["items"]
+    assert [item["title"] for item in items] == ["Water bottle", "Garden tools"]
+    assert items[0]["id"] == bottle
+    assert items[0]["score"] >= items[1]["score"]
+    assert "<mark>water</mark>" in items[0]["snippet"].lower()
+
+    stemmed = client.get("/opportunities/search", params={"q": "drinking hikers"}, headers=headers)
+    assert [item["id"] for item in stemmed.json()["items"]] == [bottle]
+
+
+def test_snippets_escape_stored_html():
+    client = TestClient(app)
+    headers, user_id = create_user_and_token(client, "Escaper")
+    create(client, headers, user_id, "<script>alert(1)</script> water <mark>pump</mark>")
+
+    resp = client.get("/opportunities/search", params={"q": "water"}, headers=headers)
+    [item] = resp.json()["items"]
+    assert item["snippet"] == (
+        "&lt;script&gt;alert(1)&lt;/script&gt; <mark>water</mark> "
+        "&lt;mark&gt;pump&lt;/mark&gt;"
+    )
+
+
+def test_fts5_check_runs_once_per_engine():
+    statements = []
+
+    def record(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        with engine.connect() as conn:
+            assert models.has_fts5(conn)
+            assert models.has_fts5(conn)
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+    assert not [statement for statement in statements if "compile_options" in statement]
+
+
+def test_search_sanitizes_query_syntax():
+    client = TestClient(app)
+    headers, user_id = create_user_and_token(client, "Sanitizer")
+    create(client, headers, user_id, "Solar roof")
+
+    for q in ['solar"', "solar OR", "NEAR(solar", "title:solar*"]:
+        resp = client.get("/opportunities/search", params={"q": q}, headers=headers)
+        assert resp.status_code == 200, q
+    assert client.get(
+        "/opportunities/search", params={"q": "()"}, headers=headers
+    ).json() == {"items": [], "next_cursor": None}
+
+
+def test_search_cursor_pages_through_results():
+    client = TestClient(app)
+    headers, user_id = create_user_and_token(client, "Pager")
+    ids = {create(client, headers, user_id, f"Coffee idea {i}") for i in range(5)}
+
+    seen, cursor = [], None
+    while True:
+        params = {"q": "coffee", "limit": 2}
+        if cursor:
+            params["cursor"] = cursor
+        page = client.get("/opportunities/search", params=params, headers=headers).json()
+        seen.extend(item["id"] for item in page["items"])
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+    assert sorted(seen) == sorted(ids)
+
+    bad = client.get(
+        "/opportunities/search", params={"q": "coffee", "cursor": "nope"}, headers=headers
+    )
+    assert bad.status_code == 400
+
+
+def test_search_index_follows_updates_and_deletes():
+    client = TestClient(app)
+    headers, user_id = create_user_and_token(client, "Editor")
+    opp_id = create(client, headers, user_id, "Bicycle rental")
+
+    client.patch(f"/opportunities/{opp_id}", json={"title": "Scooter rental"})
+
+    def find(q):
+        return client.get("/opportunities/search", params={"q": q}, headers=headers).json()["items"]
+
+    assert find("bicycle") == []
+    assert [item["id"] for item in find("scooter")] == [opp_id]
+
+    client.delete(f"/opportunities/{opp_id}")
+    assert find("scooter") == []
+
+
+def test_sync_schema_builds_index_for_existing_rows():
+    client = TestClient(app)
+    headers, user_id = create_user_and_token(client, "Migrator")
+    opp_id = create(client, headers, user_id, "Legacy kiosk")
+    with engine.begin() as conn:
+        conn.exec_driver_sql(f"DROP TABLE {models.FTS_TABLE}")
+
+    models.sync_schema(engine)
+
+    resp = client.get("/opportunities/search", params={"q": "kiosk"}, headers=headers)
+    assert [item["id"] for item in resp.json()["items"]] == [opp_id]
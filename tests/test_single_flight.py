@@ -0,0 +1,189 @@
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import threading
+import time
+
+from fastapi.testclient import TestClient
+from prometheus_client import CollectorRegistry, Counter
+
+from database import Base, SessionLocal, engine
+from single_flight import AsyncSingleFlight, SingleFlight
+import main
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def setup_db():
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    yield
+    Base.metadata.drop_all(bind=engine)
+
+
+@pytest.fixture
+def registry():
+    return CollectorRegistry()
+
+
+def make_counter(registry):
+    return Counter("calls_total", "Calls", ["flight", "result"], registry=registry)
+
+
+def calls(registry, result):
+    return registry.get_sample_value("calls_total", {"flight": "test", "result": result}) or 0
+
+
+class Blocking:
+    """A call that blocks until released and counts how often it ran."""
+
+    def __init__(self, result="value"):
+        self.result = result
+        self.runs = 0
+        self.started = threading.Event()
+        self.release = threading.Event()
+
+    def __call__(self):
+        self.runs += 1
+        self.started.set()
+        assert self.release.wait(5)
+        if isinstance(self.result, Exception):
+            raise self.result
+        return self.result
+
+
+def run_concurrently(flight, key, fn, followers=5):
+    """Start a leader, then ``followers`` callers once the leader is running."""
+    with ThreadPoolExecutor(max_workers=followers + 1) as pool:
+        leader = pool.submit(flight.do, key, fn)
+        assert fn.started.wait(5)
+        waiting = [pool.submit(flight.do, key, fn) for _ in range(followers)]
+        time.sleep(0.1)
+        fn.release.set()
+        return [leader, *waiting]
+
+
+def test_concurrent_calls_share_one_result(registry):
+    flight = SingleFlight("test", make_counter(registry), timeout=5)
+    fn = Blocking()
+
+    futures = run_concurrently(flight, (1, "a"), fn)
+
+    assert [f.result() for f in futures] == ["value"] * 6
+    assert fn.runs == 1
+    assert calls(registry, "leader") == 1
+    assert calls(registry, "coalesced") == 5
+    # The key is released once the call has finished.
+    assert flight.do((1, "a"), lambda: "fresh") == "fresh"
+
+
+def test_errors_fan_out(registry):
+    flight = SingleFlight("test", make_counter(registry), timeout=5)
+    fn = Blocking(LookupError("missing"))
+
+    futures = run_concurrently(flight, (1,), fn, followers=2)
+
+    errors = []
+    for future in futures:
+        with pytest.raises(LookupError, match="missing") as raised:
+            future.result()
+        errors.append(raised.value)
+    assert fn.runs == 1
+    # Each waiter raises its own copy, chained to the leader's exception.
+    assert len({id(error) for error in errors}) == 3
+    assert sum(error is fn.result for error in errors) == 1
+    assert all(error.__cause__ is fn.result for error in errors if error is not fn.result)
+
+
+def test_waiters_time_out_and_run_their_own_call(registry):
+    flight = SingleFlight("test", make_counter(registry), timeout=0.01)
+    fn = Blocking()
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        leader = pool.submit(flight.do, (1,), fn)
+        assert fn.started.wait(5)
+        assert flight.do((1,), lambda: "own") == "own"
+        fn.release.set()
+        assert leader.result() == "value"
+    assert calls(registry, "timeout") == 1
+
+
+def test_invalidate_detaches_calls_in_flight(registry):
+    flight = SingleFlight("test", make_counter(registry), timeout=5)
+    fn = Blocking("before write")
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        leader = pool.submit(flight.do, (1, "a"), fn)
+        assert fn.started.wait(5)
+        flight.invalidate(1)
+        assert flight.do((1, "a"), lambda: "after write") == "after write"
+        fn.release.set()
+        assert leader.result() == "before write"
+
+
+def test_async_calls_share_one_result(registry):
+    flight = AsyncSingleFlight("test", make_counter(registry), timeout=5)
+    runs = []
+
+    async def fetch():
+        runs.append(1)
+        await asyncio.sleep(0.05)
+        return "value"
+
+    async def run():
+        return await asyncio.gather(*(flight.do((1,), fetch) for _ in range(5)))
+
+    assert asyncio.run(run()) == ["value"] * 5
+    assert len(runs) == 1
+    assert calls(registry, "coalesced") == 4
+
+
+def test_reads_after_a_write_are_not_served_a_coalesced_result(monkeypatch):
+    client = TestClient(main.app)
+    user_id = client.post("/users/", json={"name": "Writer"}).json()["id"]
+    token = client.post("/token", data={"username": "Writer", "password": "x"}).json()
+    headers = {"Authorization": f"Bearer {token['access_token']}"}
+    payload = {"title": "Shared", "growth_rate": 1.0, "user_id": user_id}
+    opp_id = client.post("/opportunities/", json=payload, headers=headers).json()["id"]
+
+    original = main.read_opportunity_conditional
+    started = threading.Event()
+    release = threading.Event()
+
+    def slow_read(*args):
+        result = original(*args)
+        if not started.is_set():
+            started.set()
+            assert release.wait(5)
+        return result
+
+    monkeypatch.setattr(main, "read_opportunity_conditional", slow_read)
+    labels = {"flight": "opportunity", "result": "coalesced"}
+    coalesced = main.PROMETHEUS_REGISTRY.get_sample_value("single_flight_calls_total", labels) or 0
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        stale = pool.submit(client.get, f"/opportunities/{opp_id}")
+        assert started.wait(5)
+        follower = pool.submit(client.get, f"/opportunities/{opp_id}")
+        time.sleep(0.1)
+        assert client.patch(f"/opportunities/{opp_id}", json={"growth_rate": 2.0}).status_code == 200
+        fresh = client.get(f"/opportunities/{opp_id}")
+        release.set()
+        assert stale.result().json()["growth_rate"] == 1.0
+        assert follower.result().json()["growth_rate"] == 1.0
+    assert fresh.json()["growth_rate"] == 2.0
+    assert main.PROMETHEUS_REGISTRY.get_sample_value("single_flight_calls_total", labels) == coalesced + 1
+
+
+def test_shared_opportunity_reads_are_plain_dicts():
+    client = TestClient(main.app)
+    user_id = client.post("/users/", json={"name": "Owner"}).json()["id"]
+    token = client.post("/token", data={"username": "Owner", "password": "x"}).json()
+    headers = {"Authorization": f"Bearer {token['access_token']}"}
+    payload = {"title": "Detached", "user_id": user_id}
+    opp_id = client.post("/opportunities/", json=payload, headers=headers).json()["id"]
+
+    with SessionLocal() as db:
+        opportunity, _, _ = main.read_opportunity_conditional(db, opp_id, None, None)
+    assert opportunity == client.get(f"/opportunities/{opp_id}").json()
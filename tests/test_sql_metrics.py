@@ -0,0 +1,87 @@
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+import logging
+
+from fastapi.testclient import TestClient
+from database import Base, engine
+import main
+import sql_metrics
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def setup_db():
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    yield
+    Base.metadata.drop_all(bind=engine)
+
+
+def _observed(name, path, method="GET"):
+    value = main.PROMETHEUS_REGISTRY.get_sample_value(name, {"method": method, "path": path})
+    return value or 0.0
+
+
+def test_server_timing_and_histograms_per_route():
+    client = TestClient(main.app)
+    opp_path = "/opportunities/{opportunity_id}"
+    count_before = _observed("request_db_queries_count", opp_path)
+    sum_before = _observed("request_db_queries_sum", opp_path)
+
+    response = client.get("/opportunities/42")
+    assert response.status_code == 404
+    assert response.headers["Server-Timing"].startswith("db;dur=")
+    assert response.headers["Server-Timing"].endswith('desc="1 query"')
+    assert _observed("request_db_queries_count", opp_path) == count_before + 1
+    assert _observed("request_db_queries_sum", opp_path) == sum_before + 1
+    assert _observed("request_db_seconds_count", opp_path) >= 1
+
+    assert "Server-Timing" not in client.get("/healthcheck").headers
+
+
+def test_strict_mode_fails_requests_over_budget(monkeypatch):
+    client = TestClient(main.app)
+    client.post("/users/", json={"name": "Budget"})
+    monkeypatch.setattr(main.read_users, "query_budget", 0)
+
+    with pytest.raises(sql_metrics.QueryBudgetExceeded, match="ran 1 SQL statements, budget is 0"):
+        client.get("/users/")
+
+
+def test_budget_overrun_is_logged_when_not_strict(monkeypatch, caplog):
+    client = TestClient(main.app)
+    monkeypatch.setattr(sql_metrics, "strict", False)
+    monkeypatch.setattr(main.read_users, "query_budget", 0)
+
+    with caplog.at_level(logging.WARNING, logger="uvicorn"):
+        assert client.get("/users/").status_code == 200
+    assert "/users/ ran 1 SQL statements, budget is 0" in caplog.text
+
+
+def test_strict_mode_fails_before_the_response_starts(monkeypatch):
+    client = TestClient(main.app, raise_server_exceptions=False)
+    monkeypatch.setattr(main.read_users, "query_budget", 0)
+
+    response = client.get("/users/")
+    assert response.status_code == 500
+    assert response.text == "Internal Server Error"
+
+
+def test_statements_while_streaming_are_logged_even_when_strict(monkeypatch, caplog):
+    client = TestClient(main.app)
+    user_id = client.post("/users/", json={"name": "Streamer"}).json()["id"]
+    token = client.post("/token", data={"username": "Streamer", "password": "x"}).json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+    client.post("/opportunities/", json={"title": "Streamed", "user_id": user_id}, headers=headers)
+    # The token is cached, so the only statement is the export query, which
+    # runs as the body is sent.
+    monkeypatch.setattr(main.export_opportunities, "query_budget", 0, raising=False)
+
+    with caplog.at_level(logging.WARNING, logger="uvicorn"):
+        response = client.get("/opportunities/export", headers=headers)
+    assert response.status_code == 200
+    assert "Streamed" in response.text
+    assert "/opportunities/export ran 1 SQL statements, budget is 0" in caplog.text
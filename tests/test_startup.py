@@ -0,0 +1,55 @@
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+
+from fastapi.testclient import TestClient
+from sqlalchemy import inspect
+
+from database import Base, engine
+import main
+import prompt_batch
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def empty_db():
+    Base.metadata.drop_all(bind=engine)
+    engine.dispose()
+    yield
+    Base.metadata.drop_all(bind=engine)
+
+
+def test_lifespan_syncs_schema_and_warms_pool():
+    assert not inspect(engine).has_table("opportunities")
+    engine.dispose()
+
+    with TestClient(main.app) as client:
+        assert engine.pool.checkedin() == main.DB_POOL_WARM_CONNECTIONS
+        assert inspect(engine).has_table("portfolio_stats")
+        assert client.get("/opportunities/1").status_code == 404
+
+
+def test_schema_sync_can_be_skipped(monkeypatch):
+    monkeypatch.setattr(main, "SKIP_SCHEMA_SYNC", True)
+    with TestClient(main.app):
+        assert not inspect(engine).has_table("opportunities")
+
+
+def test_shutdown_stops_render_pool(monkeypatch):
+    calls = []
+    monkeypatch.setattr(prompt_batch, "shutdown_pool", lambda: calls.append(True))
+    with TestClient(main.app):
+        assert calls == []
+    assert calls == [True]
+
+
+def test_importing_main_does_not_load_the_batch_renderer():
+    code = "import sys, main; print('prompt_batch' in sys.modules, 'multiprocessing' in sys.modules)"
+    env = {**os.environ, "DATABASE_URL": "sqlite://"}
+    output = subprocess.run(
+        [sys.executable, "-c", code], env=env, cwd=ROOT, check=True, capture_output=True, text=True,
+    ).stdout
+    assert output.split() == ["False", "False"]
@@ -0,0 +1,184 @@
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+import threading
+
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.exc import StaleDataError
+from database import Base, SessionLocal, engine
+from main import app
+import models
+import portfolio_stats
+import pytest
+import sql_metrics
+
+
+@pytest.fixture(autouse=True)
+def setup_db():
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    yield
+    Base.metadata.drop_all(bind=engine)
+
+
+def create_user_and_token(client, username="user"):
+    user_resp = client.post("/users/", json={"name": username})
+    user_id = user_resp.json()["id"]
+    token_resp = client.post(
+        "/token", data={"username": username, "password": "password"}
+    )
+    token = token_resp.json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+    return headers, user_id
+
+
+def create(client, headers, user_id, title, tam=None, growth=None):
+    payload = {"title": title, "user_id": user_id, "tam_estimate": tam, "growth_rate": growth}
+    return client.post("/opportunities/", json=payload, headers=headers).json()["id"]
+
+
+def assert_consistent():
+    with engine.connect() as conn:
+        assert portfolio_stats.check(conn) == []
+
+
+def test_stats_follow_creates_updates_and_deletes():
+    client = TestClient(app)
+    headers, alice = create_user_and_token(client, "Alice")
+    _, bob = create_user_and_token(client, "Bob")
+    first = create(client, headers, alice, "A1", tam=100, growth=0.5)
+    create(client, headers, alice, "A2", tam=50, growth=12)
+    create(client, headers, bob, "B1", tam=10)
+
+    stats = client.get("/opportunities/stats", headers=headers).json()
+    assert stats["opportunities"] == 3
+    assert stats["tam_total"] == 160
+    assert stats["by_user"] == [
+        {"user_id": alice, "opportunities": 2, "tam_total": 150},
+        {"user_id": bob, "opportunities": 1, "tam_total": 10},
+    ]
+    counts = {bucket["min"]: bucket["opportunities"] for bucket in stats["growth_distribution"]}
+    assert counts[0] == 1 and counts[10] == 1
+    assert stats["growth_unknown"] == 1
+    assert_consistent()
+
+    client.patch(f"/opportunities/{first}", json={"tam_estimate": 300, "growth_rate": 60})
+    stats = client.get("/opportunities/stats", headers=headers).json()
+    assert stats["by_user"][0] == {"user_id": alice, "opportunities": 2, "tam_total": 350}
+    counts = {bucket["min"]: bucket["opportunities"] for bucket in stats["growth_distribution"]}
+    assert counts[0] == 0 and counts[50] == 1
+    assert_consistent()
+
+    client.delete(f"/opportunities/{first}")
+    stats = client.get("/opportunities/stats", headers=headers).json()
+    assert stats["opportunities"] == 2
+    assert stats["tam_total"] == 60
+    assert stats["growth_distribution"][-2]["opportunities"] == 0
+    assert_consistent()
+
+
+def test_bulk_inserts_are_counted():
+    client = TestClient(app)
+    headers, user_id = create_user_and_token(client, "Bulk")
+    rows = [{"title": f"Bulk {i}", "user_id": user_id, "tam_estimate": 10, "growth_rate": i} for i in range(6)]
+    rows.append({"title": "Bulk 0", "user_id": user_id})
+    resp = client.post("/opportunities/bulk", json=rows, headers=headers)
+    assert len(resp.json()["created"]) == 6
+
+    stats = client.get("/opportunities/stats", headers=headers).json()
+    assert stats["opportunities"] == 6
+    assert stats["tam_total"] == 60
+    assert_consistent()
+
+
+def test_check_detects_drift_and_rebuild_repairs_it():
+    client = TestClient(app)
+    headers, user_id = create_user_and_token(client, "Drift")
+    create(client, headers, user_id, "Tracked", tam=5, growth=3)
+    with engine.begin() as conn:
+        conn.execute(models.Opportunity.__table__.update().values(tam_estimate=7))
+
+    with engine.begin() as conn:
+        differences = portfolio_stats.check(conn)
+        assert [(d["expected"], d["actual"]) for d in differences] == [((1, 7.0), (1, 5.0))]
+        portfolio_stats.rebuild(conn)
+    assert_consistent()
+    assert client.get("/opportunities/stats", headers=headers).json()["tam_total"] == 7
+
+
+def test_ensure_fills_empty_stats_for_existing_rows():
+    client = TestClient(app)
+    headers, user_id = create_user_and_token(client, "Legacy")
+    create(client, headers, user_id, "Old", tam=3)
+    with engine.begin() as conn:
+        conn.execute(models.PortfolioStat.__table__.delete())
+
+    portfolio_stats.ensure(engine)
+
+    assert client.get("/opportunities/stats", headers=headers).json()["opportunities"] == 1
+
+
+def write_before_next_flush(tam):
+    """Have another connection change every opportunity just before the next flush."""
+
+    def run():
+        with engine.begin() as conn:
+            table = models.Opportunity.__table__
+            conn.execute(table.update().values(tam_estimate=tam, version=table.c.version + 1))
+            portfolio_stats.rebuild(conn)
+
+    def write(session, flush_context, instances):
+        # On its own thread, so its statements don't count against the request.
+        thread = threading.Thread(target=run)
+        thread.start()
+        thread.join()
+
+    event.listen(Session, "before_flush", write, once=True)
+
+
+def test_concurrent_writes_to_the_same_row_do_not_drift():
+    client = TestClient(app)
+    headers, user_id = create_user_and_token(client, "Racer")
+    opp_id = create(client, headers, user_id, "Contended", tam=100, growth=1)
+
+    # A session that read the row before a request changed it cannot write it.
+    with SessionLocal() as db:
+        stale = db.get(models.Opportunity, opp_id)
+        assert client.patch(f"/opportunities/{opp_id}", json={"tam_estimate": 200}).status_code == 200
+        stale.tam_estimate = 150
+        with pytest.raises(StaleDataError):
+            db.commit()
+    assert_consistent()
+
+    write_before_next_flush(50)
+    resp = client.patch(f"/opportunities/{opp_id}", json={"tam_estimate": 300})
+    assert resp.status_code == 409
+    assert_consistent()
+
+    write_before_next_flush(60)
+    assert client.delete(f"/opportunities/{opp_id}").status_code == 409
+    assert_consistent()
+    assert client.get("/opportunities/stats", headers=headers).json()["tam_total"] == 60
+
+
+def test_stats_without_upserts(monkeypatch):
+    # Dialects without ON CONFLICT, such as MySQL, update then insert, which
+    # takes more statements than the budgets allow for.
+    monkeypatch.setattr(portfolio_stats, "UPSERT_DIALECTS", ())
+    monkeypatch.setattr(sql_metrics, "strict", False)
+    client = TestClient(app)
+    headers, user_id = create_user_and_token(client, "Portable")
+    first = create(client, headers, user_id, "P1", tam=10, growth=1)
+    create(client, headers, user_id, "P2", tam=20, growth=1)
+    client.patch(f"/opportunities/{first}", json={"growth_rate": 30})
+    assert_consistent()
+
+    client.delete(f"/opportunities/{first}")
+    stats = client.get("/opportunities/stats", headers=headers).json()
+    assert stats["opportunities"] == 1
+    assert stats["tam_total"] == 20
+    assert_consistent()
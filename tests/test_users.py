@@ -0,0 +1,122 @@
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+from fastapi.testclient import TestClient
+from database import Base, engine
+from main import app
+import user_listing
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def setup_db():
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    yield
+    Base.metadata.drop_all(bind=engine)
+
+
+def create_user_and_token(client, username="user"):
+    user_resp = client.post("/users/", json={"name": username})
+    user_id = user_resp.json()["id"]
+    token_resp = client.post(
+        "/token", data={"username": username, "password": "password"}
+    )
+    token = token_resp.json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+    return headers, user_id
+
+
+def seed(client):
+    headers, alice = create_user_and_token(client, "Alice")
+    _, bob = create_user_and_token(client, "Bob")
+    _, carol = create_user_and_token(client, "Carol")
+    for i in range(4):
+        payload = {"title": f"Alice {i}", "tam_estimate": 100.0, "user_id": alice}
+        assert client.post("/opportunities/", json=payload, headers=headers).status_code == 200
+    payload = {"title": "Bob 0", "user_id": bob}
+    assert client.post("/opportunities/", json=payload, headers=headers).status_code == 200
+    return alice, bob, carol
+
+
+def query_count(response):
+    return int(response.headers["Server-Timing"].rsplit('desc="', 1)[1].split()[0])
+
+
+def test_plain_listing_is_unchanged():
+    client = TestClient(app)
+    seed(client)
+    resp = client.get("/users/")
+    assert resp.json() == [
+        {"id": 1, "name": "Alice"},
+        {"id": 2, "name": "Bob"},
+        {"id": 3, "name": "Carol"},
+    ]
+    assert client.get("/users/?skip=1&limit=1").json() == [{"id": 2, "name": "Bob"}]
+
+
+def test_include_opportunities_caps_each_user():
+    client = TestClient(app)
+    alice, bob, carol = seed(client)
+
+    resp = client.get("/users/?include=opportunities&opportunity_limit=3")
+    assert resp.status_code == 200
+    assert query_count(resp) == 2
+    users = resp.json()
+    assert [u["id"] for u in users] == [alice, bob, carol]
+    assert [o["title"] for o in users[0]["opportunities"]] == ["Alice 0", "Alice 1", "Alice 2"]
+    assert users[0]["has_more_opportunities"] is True
+    assert users[1]["opportunities"] == [{
+        "id": 5,
+        "title": "Bob 0",
+        "market_description": None,
+        "tam_estimate": None,
+        "growth_rate": None,
+        "consumer_insight": None,
+        "hypothesis": None,
+        "user_id": bob,
+    }]
+    assert users[1]["has_more_opportunities"] is False
+    assert users[2]["opportunities"] == []
+
+    page = client.get("/users/?include=opportunities&skip=1&limit=1").json()
+    assert [u["name"] for u in page] == ["Bob"]
+    assert client.get("/users/?include=opportunities&skip=5").json() == []
+
+
+def test_include_counts():
+    client = TestClient(app)
+    alice, bob, carol = seed(client)
+
+    resp = client.get("/users/?include=counts")
+    assert query_count(resp) == 1
+    assert resp.json() == [
+        {"id": alice, "name": "Alice", "opportunity_count": 4, "tam_total": 400.0},
+        {"id": bob, "name": "Bob", "opportunity_count": 1, "tam_total": 0.0},
+        {"id": carol, "name": "Carol", "opportunity_count": 0, "tam_total": 0.0},
+    ]
+    assert client.get("/users/?include=owners").status_code == 422
+
+
+def test_listing_is_unbounded_by_default_and_documents_every_shape():
+    client = TestClient(app)
+    for i in range(101):
+        client.post("/users/", json={"name": f"User {i}"})
+    assert len(client.get("/users/").json()) == 101
+    assert client.get("/users/?limit=1001").status_code == 422
+
+    operation = client.get("/openapi.json").json()["paths"]["/users/"]["get"]
+    limit = next(param for param in operation["parameters"] if param["name"] == "limit")
+    assert "default" not in limit["schema"]
+    schema = operation["responses"]["200"]["content"]["application/json"]["schema"]
+    items = {option["items"]["$ref"].rsplit("/", 1)[1] for option in schema["anyOf"]}
+    assert items == {"UserSchema", "UserWithOpportunities", "UserWithCounts"}
+
+
+def test_listings_are_validated_against_their_shape(monkeypatch):
+    client = TestClient(app, raise_server_exceptions=False)
+    seed(client)
+    monkeypatch.setattr(user_listing, "with_counts", lambda db, skip, limit: [{"id": 1, "name": "Alice"}])
+    assert client.get("/users/?include=counts").status_code == 500
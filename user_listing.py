@@ -0,0 +1,99 @@
+"""Users with their opportunities or opportunity counts for ``GET /users/``.
+
+Both variants run a fixed number of statements however many users are on the
+page. Embedded opportunities come from a single query that numbers each
+user's opportunities with ``row_number()`` over the ``(user_id, id)`` index
+and keeps the first ``opportunity_limit`` of them, so one user with thousands
+of opportunities cannot blow up the response; the rest can be paged through
+with ``GET /opportunities/?user_id=...``. Counts and TAM totals are summed
+from the ``portfolio_stats`` summary table instead of scanning
+``opportunities``.
+"""
+
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from fieldsets import FIELDS
+import models
+
+
+def _users(skip: int, limit: Optional[int]):
+    return (
+        select(models.User.id, models.User.name)
+        .order_by(models.User.id)
+        .offset(skip)
+        .limit(limit)
+    )
+
+
+def plain(db: Session, skip: int, limit: Optional[int]) -> List[Dict[str, Any]]:
+    """Return one page of users, in one query."""
+    return [{"id": row.id, "name": row.name} for row in db.execute(_users(skip, limit))]
+
+
+def with_opportunities(
+    db: Session, skip: int, limit: Optional[int], opportunity_limit: int
+) -> List[Dict[str, Any]]:
+    """Return users with up to ``opportunity_limit`` opportunities each, in two queries.
+
+    ``has_more_opportunities`` is true for users with opportunities left out.
+    """
+    users = {
+        row.id: {"id": row.id, "name": row.name, "opportunities": [], "has_more_opportunities": False}
+        for row in db.execute(_users(skip, limit))
+    }
+    if not users:
+        return []
+
+    position = func.row_number().over(
+        partition_by=models.Opportunity.user_id, order_by=models.Opportunity.id
+    )
+    ranked = (
+        select(models.Opportunity.id, position.label("position"))
+        .where(models.Opportunity.user_id.in_(users))
+        .subquery()
+    )
+    columns = [getattr(models.Opportunity, name) for name in FIELDS]
+    rows = db.execute(
+        select(*columns)
+        .join(ranked, ranked.c.id == models.Opportunity.id)
+        .where(ranked.c.position <= opportunity_limit + 1)
+        .order_by(models.Opportunity.user_id, models.Opportunity.id)
+    )
+    for row in rows:
+        user = users[row.user_id]
+        if len(user["opportunities"]) < opportunity_limit:
+            user["opportunities"].append(dict(zip(FIELDS, row)))
+        else:
+            user["has_more_opportunities"] = True
+    return list(users.values())
+
+
+def with_counts(db: Session, skip: int, limit: Optional[int]) -> List[Dict[str, Any]]:
+    """Return users with their opportunity count and TAM total, in one query."""
+    stats = (
+        select(
+            models.PortfolioStat.user_id,
+            func.sum(models.PortfolioStat.opportunities).label("opportunities"),
+            func.sum(models.PortfolioStat.tam_total).label("tam_total"),
+        )
+        .group_by(models.PortfolioStat.user_id)
+        .subquery()
+    )
+    page = _users(skip, limit).subquery()
+    rows = db.execute(
+        select(
+            page.c.id,
+            page.c.name,
+            func.coalesce(stats.c.opportunities, 0),
+            func.coalesce(stats.c.tam_total, 0.0),
+        )
+        .outerjoin(stats, stats.c.user_id == page.c.id)
+        .order_by(page.c.id)
+    )
+    return [
+        {"id": user_id, "name": name, "opportunity_count": count, "tam_total": float(tam)}
+        for user_id, name, count, tam in rows
+    ]